@@ -0,0 +1,110 @@
+import numpy as np
+from fresnel_backend import getFresnelAIM_batch
+from performance_metrics import calculate_theta_res_smooth, calculate_fwhm
+
+
+def _intervals_to_refine(theta_deg, Rp, tol_theta, tol_fwhm):
+    """
+    Returns the indices i of the intervals [theta[i], theta[i+1]] that still
+    bracket the minimum or a half-maximum crossing more coarsely than the
+    requested tolerances.
+    """
+    widths = np.diff(theta_deg)
+    idx_min = np.argmin(Rp)
+    refine = set()
+
+    for i in (idx_min - 1, idx_min):
+        if 0 <= i < len(widths) and widths[i] > tol_theta:
+            refine.add(i)
+
+    half_max = (np.max(Rp) + np.min(Rp)) / 2
+    crossings = np.where(np.diff(np.sign(Rp - half_max)))[0]
+    for i in crossings:
+        if widths[i] > tol_fwhm:
+            refine.add(i)
+
+    return sorted(refine)
+
+
+def adaptive_reflectance_sweep(n, d, wavelength, theta_window=(40, 80),
+                               coarse_points=201, tol_theta=1e-3, tol_fwhm=1e-3,
+                               points_per_interval=3, max_iter=30):
+    """
+    Angular sweep that starts from a coarse grid and keeps subdividing only
+    the intervals around the reflectance minimum and the half-maximum
+    crossings until they are narrower than ``tol_theta`` / ``tol_fwhm``.
+
+    Parameters:
+        n (array): Refractive indices of the stack (substrate ... analyte).
+        d (array): Internal-layer thicknesses in meters.
+        wavelength (float): Wavelength in meters.
+        theta_window (tuple): Angular range in degrees.
+        coarse_points (int): Points in the initial uniform grid.
+        tol_theta (float): Target spacing (deg) around the minimum.
+        tol_fwhm (float): Target spacing (deg) around the half-max crossings.
+        points_per_interval (int): New points inserted per refined interval.
+        max_iter (int): Maximum number of refinement rounds.
+
+    Returns:
+        theta_deg (sorted, non-uniform), Rp, number of Fresnel evaluations.
+    """
+    theta_deg = np.linspace(theta_window[0], theta_window[1], coarse_points)
+    Rp = getFresnelAIM_batch(n, d, np.radians(theta_deg), wavelength)[2]
+
+    for _ in range(max_iter):
+        refine = _intervals_to_refine(theta_deg, Rp, tol_theta, tol_fwhm)
+        if not refine:
+            break
+
+        # Pontos novos de todos os intervalos avaliados numa única chamada
+        fractions = np.arange(1, points_per_interval + 1) / (points_per_interval + 1)
+        left = theta_deg[refine][:, None]
+        width = (theta_deg[np.array(refine) + 1] - theta_deg[refine])[:, None]
+        new_theta = (left + fractions * width).ravel()
+        new_Rp = getFresnelAIM_batch(n, d, np.radians(new_theta), wavelength)[2]
+
+        theta_deg = np.concatenate([theta_deg, new_theta])
+        Rp = np.concatenate([Rp, new_Rp])
+        order = np.argsort(theta_deg)
+        theta_deg, Rp = theta_deg[order], Rp[order]
+
+    return theta_deg, Rp, len(theta_deg)
+
+
+def adaptive_theta_res_and_fwhm(n, d, wavelength, theta_window=(40, 80), **kwargs):
+    """
+    Convenience wrapper: adaptive sweep followed by the usual metric
+    functions, which accept the non-uniform grid directly.
+
+    Returns:
+        theta_res (deg), fwhm (deg), number of Fresnel evaluations.
+    """
+    theta_deg, Rp, n_evals = adaptive_reflectance_sweep(n, d, wavelength, theta_window, **kwargs)
+    theta_res = calculate_theta_res_smooth(theta_deg, Rp)
+    fwhm = calculate_fwhm(Rp, theta_deg)
+    return theta_res, fwhm, n_evals
+
+
+def run_adaptive_metrics(substrate, metal, analytes, materials, lambda0,
+                         d_cr, metal_thicknesses_nm, theta_window=(40, 80), **kwargs):
+    """
+    Metric-only sweep with adaptive sampling: fills results["theta_res"] and
+    results["fwhm"][(metal, analyte)] for every thickness without the dense
+    uniform angular grid (theta_res/fwhm layout of run_reflectance_simulation).
+    """
+    results = {"theta_res": {}, "fwhm": {}, "substrate": substrate}
+    for analyte in analytes:
+        n = np.array([
+            materials[substrate],
+            materials["Cr"],
+            materials[metal],
+            materials[analyte]
+        ], dtype=complex)
+        metrics = [
+            adaptive_theta_res_and_fwhm(n, np.array([d_cr, d_metal_nm * 1e-9]), lambda0,
+                                        theta_window, **kwargs)[:2]
+            for d_metal_nm in metal_thicknesses_nm
+        ]
+        results["theta_res"][(metal, analyte)] = [t for t, _ in metrics]
+        results["fwhm"][(metal, analyte)] = [f for _, f in metrics]
+    return results
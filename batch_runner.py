@@ -0,0 +1,299 @@
+"""
+Non-interactive batch entry point.
+
+    python batch_runner.py sweeps.json [--workers 8]
+
+Reads a JSON, TOML or YAML sweep specification and runs every entry in
+one process (shared imports, Fresnel backend, worker pool and result
+cache) without prompting or opening windows. ``wavelength_nm`` other than
+850 takes the material indices from material_database at that
+wavelength. Example (JSON):
+
+    {
+      "defaults": {"metals": ["Ag", "Au", "Cu"], "wavelength_nm": 850},
+      "runs": [
+        {"name": "topas", "substrates": ["TOPAS"],
+         "metal_thickness_nm": {"start": 45, "stop": 55, "step": 1},
+         "analytes": {"analyte_01": 1.3492, "analyte_02": 1.3481},
+         "outputs": {"dir": "outputs/batch/topas", "csv": true, "figures": true,
+                     "formats": ["png"], "rasterize": false, "max_points": 1000}}
+      ]
+    }
+
+``theta_res_method`` selects how the resonance angle is obtained:
+"grid" (default) computes the full reflectance curves; "adaptive" samples
+only around the dip (adaptive_sampling) and returns theta_res and FWHM;
+"solver" solves each structure directly with resonance_solver.find_theta_res
+and "continuation" follows the thickness axis with track_theta_res. The
+last three skip the curves; the last two give no FWHM (chi/Q are NaN).
+
+``outputs.export`` ("npz", "hdf5" or "parquet") also writes the curves,
+metric columns and run metadata of each run to ``<dir>/results.<ext>``
+(results_export; reload with load_results).
+"""
+import argparse
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")  # nunca abrir janelas no modo batch
+warnings.filterwarnings("ignore", category=UserWarning, message=".*non-interactive.*")
+
+import numpy as np
+from optical_data import materials as base_materials
+from simulation_config import d_cr as default_d_cr, metal_thicknesses_nm as default_thicknesses
+from simulation_config import analytes as default_analytes
+from sweep_scheduler import run_sweep_parallel
+from results_store import ResultsStore
+from results_export import export_results, EXTENSIONS
+from resonance_solver import run_theta_res_only
+from adaptive_sampling import run_adaptive_metrics
+from material_database import get_material_database
+from result_cache import get_default_cache
+from calculate_figures import calculate_all_figures_of_merit
+from save_results import save_results_to_csv
+from merit_figures_plot import plot_figures_of_merit
+from render_pipeline import FigureRenderer
+from instrumentation import run_report, stage, collect_call, merge
+from simulation_config import report_dir as default_report_dir
+
+# Comprimento de onda em que a tabela de optical_data foi medida; nos
+# demais os índices vêm dos modelos de dispersão de material_database,
+# ancorados nessa tabela (contínuos em torno de 850 nm)
+REFERENCE_WAVELENGTH_NM = 850
+
+# Como obter theta_res: "grid" calcula as curvas completas (e o FWHM);
+# "adaptive" amostra só a região do vale (theta_res e FWHM, sem curvas);
+# "solver" resolve cada estrutura diretamente (find_theta_res) e
+# "continuation" segue o eixo de espessuras com track_theta_res, ambos sem curvas
+THETA_RES_METHODS = ("grid", "adaptive", "solver", "continuation")
+
+RUN_DEFAULTS = {
+    "substrates": ["TOPAS"],
+    "metals": ["Ag", "Au", "Cu"],
+    "metal_thickness_nm": list(default_thicknesses),
+    "d_cr_nm": default_d_cr * 1e9,
+    "analytes": dict(default_analytes),
+    "wavelength_nm": 850,
+    "theta_window_deg": [40, 80],
+    "theta_points": 4001,
+    "theta_res_method": "grid",
+    "outputs": {"csv": True, "figures": False, "formats": ["png", "eps"],
+                "rasterize": False, "max_points": None, "export": None},
+}
+
+
+def load_sweep_spec(path):
+    """Loads a sweep specification from a .json, .toml or .yaml/.yml file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        with open(path) as f:
+            return json.load(f)
+    if ext == ".toml":
+        import tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    if ext in {".yaml", ".yml"}:
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError("PyYAML is required for YAML sweep files (pip install pyyaml)") from e
+        with open(path) as f:
+            return yaml.safe_load(f)
+    raise ValueError(f"Unsupported sweep file format: {ext}")
+
+
+def _thickness_values(value):
+    if isinstance(value, dict):
+        step = value.get("step", 1)
+        return np.arange(value["start"], value["stop"] + step / 2, step)
+    return np.asarray(value, dtype=float)
+
+
+def expand_runs(spec):
+    """Merges ``defaults`` into every entry of ``runs`` and names unnamed runs."""
+    defaults = {**RUN_DEFAULTS, **spec.get("defaults", {})}
+    runs = []
+    for i, entry in enumerate(spec.get("runs", [])):
+        run = {**defaults, **entry}
+        run["outputs"] = {**RUN_DEFAULTS["outputs"], **defaults.get("outputs", {}), **entry.get("outputs", {})}
+        run.setdefault("name", f"run_{i + 1:03d}")
+        if run["theta_res_method"] not in THETA_RES_METHODS:
+            raise ValueError(f"{run['name']}: unknown theta_res_method '{run['theta_res_method']}' "
+                             f"(use one of {', '.join(THETA_RES_METHODS)})")
+        if run["outputs"]["export"] not in (None, *EXTENSIONS):
+            raise ValueError(f"{run['name']}: unknown outputs.export '{run['outputs']['export']}' "
+                             f"(use one of {', '.join(EXTENSIONS)})")
+        run["outputs"].setdefault("dir", os.path.join("outputs", "batch", run["name"]))
+        runs.append(run)
+    return runs
+
+
+def run_materials(run, analytes):
+    """
+    Refractive-index table for one run. The optical_data values are used at
+    their reference wavelength (850 nm); any other ``wavelength_nm`` takes
+    the substrate/Cr/metal indices from material_database at that
+    wavelength. Analyte indices are used as given.
+    """
+    wavelength_nm = run["wavelength_nm"]
+    if np.isclose(wavelength_nm, REFERENCE_WAVELENGTH_NM):
+        return {**base_materials, **analytes}
+
+    database = get_material_database()
+    needed = set(run["substrates"]) | set(run["metals"]) | {"Cr"}
+    missing = sorted(needed - set(database.models))
+    if missing:
+        raise ValueError(f"No dispersion model for {', '.join(missing)}; "
+                         f"wavelength_nm must be {REFERENCE_WAVELENGTH_NM} for these materials")
+    print(f"[INFO] Using dispersive indices at {wavelength_nm} nm (material_database).")
+    return {**database.materials_at(wavelength_nm * 1e-9), **analytes}
+
+
+def run_metrics_only(run, analytes, materials, thicknesses, lambda0, d_cr, pool):
+    """
+    theta_res for every substrate/metal/analyte/thickness without building
+    the reflectance curves, one pool job per substrate/metal pair. Returns
+    a ResultsStore without curves; FWHM is NaN when the method does not
+    provide it.
+    """
+    method = run["theta_res_method"]
+    window = tuple(run["theta_window_deg"])
+    futures = {}
+    for substrate in run["substrates"]:
+        for metal in run["metals"]:
+            if method == "adaptive":
+                futures[(substrate, metal)] = pool.submit(
+                    collect_call, run_adaptive_metrics, substrate, metal, list(analytes), materials, lambda0,
+                    d_cr, thicknesses, window
+                )
+            else:
+                futures[(substrate, metal)] = pool.submit(
+                    collect_call, run_theta_res_only, substrate, metal, list(analytes), materials, lambda0,
+                    d_cr, thicknesses, window, continuation=(method == "continuation")
+                )
+
+    store = ResultsStore(run["substrates"], run["metals"], list(analytes), thicknesses,
+                         lambda0=lambda0, d_cr=d_cr)
+    store.set_column("theta_res", np.nan)
+    store.set_column("fwhm", np.nan)
+    for (substrate, metal), future in futures.items():
+        res, stats = future.result()
+        merge(stats)
+        for key, theta_res in res["theta_res"].items():
+            labels = {"substrate": substrate, "metal": metal, "analyte": key[1]}
+            store.set_column("theta_res", theta_res, **labels)
+            if key in res.get("fwhm", {}):
+                store.set_column("fwhm", res["fwhm"][key], **labels)
+    return store
+
+
+def run_single(run, pool, renderer=None, cache=None):
+    """
+    Runs one expanded spec entry and writes its outputs. Figures are queued
+    on ``renderer`` when given (drawn inline otherwise); ``cache`` is shared
+    by all runs of a batch.
+    """
+    analytes = run["analytes"]
+    if not isinstance(analytes, dict):
+        analytes = {a: base_materials[a] for a in analytes}
+    materials = run_materials(run, analytes)
+
+    thicknesses = _thickness_values(run["metal_thickness_nm"])
+    theta_deg = np.linspace(run["theta_window_deg"][0], run["theta_window_deg"][1], run["theta_points"])
+    theta_rad = np.radians(theta_deg)
+    lambda0 = run["wavelength_nm"] * 1e-9
+    d_cr = run["d_cr_nm"] * 1e-9
+
+    if run["theta_res_method"] == "grid":
+        with stage("sweep"):
+            store = run_sweep_parallel(
+                run["substrates"], run["metals"], list(analytes), materials, lambda0,
+                theta_deg, theta_rad, d_cr, thicknesses,
+                theta_window=tuple(run["theta_window_deg"]), pool=pool, cache=cache
+            )
+    else:
+        with stage(f"metrics_only:{run['theta_res_method']}"):
+            store = run_metrics_only(run, analytes, materials, thicknesses, lambda0, d_cr, pool)
+
+    outputs = run["outputs"]
+    has_pair = {"analyte_01", "analyte_02"} <= set(analytes)
+    if has_pair:
+        with stage("figures_of_merit"):
+            calculate_all_figures_of_merit(store, materials)
+    if outputs.get("export"):
+        with stage("export"):
+            export_results(store, os.path.join(outputs["dir"], "results" + EXTENSIONS[outputs["export"]]),
+                           fmt=outputs["export"],
+                           metadata={"run": run["name"], "theta_res_method": run["theta_res_method"]})
+    for substrate in run["substrates"]:
+        results = store.substrate_results(substrate)
+        out_dir = os.path.join(outputs["dir"], substrate.lower())
+        os.makedirs(out_dir, exist_ok=True)
+
+        if outputs.get("csv", True):
+            with stage("csv"):
+                save_results_to_csv(results, thicknesses, analytes,
+                                    filename=os.path.join(out_dir, "results_spr.csv"))
+        if outputs.get("figures", False) and has_pair:
+            save_dir = os.path.join(out_dir, "figures_of_merit")
+            if renderer is None:
+                plot_figures_of_merit(results, thicknesses, save_dir=save_dir)
+            else:
+                renderer.submit(plot_figures_of_merit, results, thicknesses, save_dir=save_dir)
+
+    return store
+
+
+def run_batch(spec, workers=None, profile=False, report_dir=default_report_dir):
+    """
+    Runs every entry of a sweep specification (dict or file path) with one
+    shared process pool. Returns {run_name: ResultsStore}.
+
+    A run report (instrumentation.run_report: stage times, Fresnel and
+    cache counters, peak memory) is written to ``report_dir`` at the end;
+    ``profile`` adds a cProfile dump of the main process.
+    """
+    name = "batch"
+    if isinstance(spec, str):
+        name = f"batch_{os.path.splitext(os.path.basename(spec))[0]}"
+        spec = load_sweep_spec(spec)
+
+    runs = expand_runs(spec)
+    cache = get_default_cache()
+    batch_results = {}
+    renderers = {}
+    with run_report(name, report_dir, cache, profile, runs=[run["name"] for run in runs]):
+        try:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+                for i, run in enumerate(runs, 1):
+                    print(f"[INFO] Batch run {i}/{len(runs)}: {run['name']}")
+                    # Um renderizador por configuração de figuras; elas são
+                    # desenhadas em segundo plano enquanto as próximas runs calculam
+                    outputs = run["outputs"]
+                    options = (tuple(outputs["formats"]), outputs["rasterize"], outputs["max_points"])
+                    if options not in renderers:
+                        renderers[options] = FigureRenderer(formats=options[0], workers=1,
+                                                            rasterize=options[1], max_points=options[2])
+                    batch_results[run["name"]] = run_single(run, pool, renderers[options], cache)
+        finally:
+            for renderer in renderers.values():
+                renderer.close()
+    if cache:
+        cache.report()
+    return batch_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run SPR sweeps from a specification file.")
+    parser.add_argument("spec", help="Sweep specification (.json, .toml, .yaml)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--profile", action="store_true", help="Attach cProfile to the run report")
+    args = parser.parse_args()
+    run_batch(args.spec, workers=args.workers, profile=args.profile)
+
+
+if __name__ == "__main__":
+    main()
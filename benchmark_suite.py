@@ -0,0 +1,229 @@
+"""
+Benchmark suite for the simulation hot paths.
+
+    python benchmark_suite.py [--sizes small medium large] [--repeat 5]
+                              [--output bench.json] [--compare benchmark_baseline.json]
+
+Times the Fresnel kernel, a full run_reflectance_simulation sweep (no
+figures, no cache), per-curve calculate_theta_res_smooth and calculate_fwhm
+against the batched find_resonance_batch and calculate_curve_shape_batch,
+calculate_all_figures_of_merit and the CSV export on fixed grids, and
+writes the results (min/median per benchmark plus environment details and
+the git commit) as JSON. ``--compare`` prints the ratio to an earlier JSON
+and exits with status 1 when a benchmark is slower than ``--threshold``.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+from optical_data import materials
+from fresnel_utils import getFresnelAIM
+from fresnel_backend import getFresnelAIM_batch, BACKEND
+from parameter_grid import run_parameter_grid
+from reflectance_simulator import run_reflectance_simulation, calculate_curve_metrics_batch
+from performance_metrics import (calculate_theta_res_smooth, find_resonance_batch, calculate_fwhm,
+                                 calculate_curve_shape_batch)
+from results_store import ResultsStore
+from calculate_figures import calculate_all_figures_of_merit
+from save_results import save_results_to_csv
+from simulation_config import lambda0, d_cr, d_analyte, analytes
+
+# Grades fixas: espessuras x pontos angulares (3 metais, 2 analytes, PMMA)
+SIZES = {
+    "small": {"thicknesses": 3, "theta_points": 1001},
+    "medium": {"thicknesses": 11, "theta_points": 4001},
+    "large": {"thicknesses": 41, "theta_points": 16001},
+}
+SUBSTRATE = "PMMA"
+METALS = ["Ag", "Au", "Cu"]
+THETA_WINDOW = (40, 80)
+
+
+def time_call(func, repeat):
+    """Runs ``func`` once to warm up, then ``repeat`` times; returns the timings (s)."""
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def make_case(size):
+    """Inputs of one grid size: angles, thicknesses, curves and a ResultsStore."""
+    spec = SIZES[size]
+    theta_deg = np.linspace(THETA_WINDOW[0], THETA_WINDOW[1], spec["theta_points"])
+    thicknesses = np.linspace(40, 60, spec["thicknesses"])
+    grid = run_parameter_grid([SUBSTRATE], METALS, [d_cr], thicknesses, list(analytes),
+                              materials, lambda0, np.radians(theta_deg))
+    reflectance = grid["reflectance"][:, :, 0].transpose(0, 1, 3, 2, 4)  # (S, M, A, T, N)
+
+    store = ResultsStore([SUBSTRATE], METALS, list(analytes), thicknesses, theta_deg,
+                         reflectance, lambda0=lambda0, d_cr=d_cr)
+    for name, values in calculate_curve_metrics_batch(theta_deg, reflectance, THETA_WINDOW).items():
+        store.set_column(name, values)
+    return {"theta_deg": theta_deg, "thicknesses": thicknesses, "store": store,
+            "curves": reflectance.reshape(-1, len(theta_deg))}
+
+
+def benchmarks(case, tmp_dir):
+    """{name: (callable, work units)} for one grid size."""
+    theta_deg = case["theta_deg"]
+    theta_rad = np.radians(theta_deg)
+    thicknesses = case["thicknesses"]
+    curves = case["curves"]
+    store = case["store"]
+    n_stack = np.array([materials[SUBSTRATE], materials["Cr"], materials["Au"],
+                        analytes["analyte_01"]], dtype=complex)
+    d_batch = np.column_stack([np.full(len(thicknesses), d_cr), thicknesses * 1e-9])
+    substrate_results = store.substrate_results(SUBSTRATE)
+
+    def fresnel_loop():
+        # getFresnelAIM é escalar no ângulo: uma estrutura, uma chamada por ângulo
+        d = np.array([d_cr, thicknesses[0] * 1e-9])
+        for theta in theta_rad:
+            getFresnelAIM(n_stack, d, theta, lambda0)
+
+    def simulation_sweep():
+        for metal in METALS:
+            run_reflectance_simulation(SUBSTRATE, metal, analytes, materials, lambda0,
+                                       theta_deg, theta_rad, d_cr, d_analyte, thicknesses,
+                                       THETA_WINDOW, plot=False)
+
+    def theta_res_smooth():
+        for Rp in curves:
+            calculate_theta_res_smooth(theta_deg, Rp)
+
+    def resonance_batch():
+        find_resonance_batch(theta_deg, curves, THETA_WINDOW)
+
+    def curve_shape():
+        calculate_curve_shape_batch(theta_deg, curves)
+
+    def fwhm():
+        for Rp in curves:
+            calculate_fwhm(Rp, theta_deg)
+
+    def figures_of_merit():
+        calculate_all_figures_of_merit(store, materials)
+
+    def csv_export():
+        save_results_to_csv(substrate_results, thicknesses, analytes,
+                            filename=os.path.join(tmp_dir, "results_spr.csv"))
+
+    return {
+        "getFresnelAIM": (fresnel_loop, len(theta_rad)),
+        "getFresnelAIM_batch": (lambda: getFresnelAIM_batch(n_stack, d_batch, theta_rad, lambda0),
+                                len(thicknesses)),
+        "run_reflectance_simulation": (simulation_sweep, len(curves)),
+        "calculate_theta_res_smooth": (theta_res_smooth, len(curves)),
+        "find_resonance_batch": (resonance_batch, len(curves)),
+        "calculate_fwhm": (fwhm, len(curves)),
+        "calculate_curve_shape_batch": (curve_shape, len(curves)),
+        "calculate_all_figures_of_merit": (figures_of_merit, len(curves)),
+        "save_results_to_csv": (csv_export, len(curves)),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "fresnel_backend": BACKEND,
+    }
+
+
+def run_suite(sizes=("small", "medium"), repeat=5, only=None):
+    """
+    Runs the benchmarks for each size in ``sizes`` (optionally only the
+    names in ``only``) and returns the JSON-ready report.
+    """
+    report = {"environment": environment(), "repeat": repeat, "sizes": {}}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            print(f"[INFO] Benchmark size '{size}': {SIZES[size]}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                case = make_case(size)
+            entries = {}
+            for name, (func, units) in benchmarks(case, tmp_dir).items():
+                if only and name not in only:
+                    continue
+                # As funções do simulador imprimem progresso; fica fora da medição
+                with contextlib.redirect_stdout(io.StringIO()):
+                    timings = time_call(func, repeat)
+                entries[name] = {
+                    "min_s": min(timings),
+                    "median_s": float(np.median(timings)),
+                    "units": units,
+                    "us_per_unit": min(timings) / units * 1e6,
+                }
+                print(f"    {name:32s} {min(timings) * 1e3:10.2f} ms (min of {repeat})")
+            report["sizes"][size] = {**SIZES[size], "benchmarks": entries}
+    return report
+
+
+def compare_reports(report, baseline, threshold=1.2):
+    """
+    Prints current/baseline min-time ratios; returns the (size, name)
+    pairs slower than ``threshold``.
+    """
+    slower = []
+    for size, entry in report["sizes"].items():
+        base_entries = baseline.get("sizes", {}).get(size, {}).get("benchmarks", {})
+        for name, result in entry["benchmarks"].items():
+            if name not in base_entries:
+                continue
+            ratio = result["min_s"] / base_entries[name]["min_s"]
+            flag = "  <-- slower" if ratio > threshold else ""
+            print(f"    {size:6s} {name:32s} x{ratio:6.2f}{flag}")
+            if ratio > threshold:
+                slower.append((size, name))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SPR simulation hot paths.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="Benchmark names to run (default: all)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Slowdown ratio reported as a regression (default 1.2)")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.sizes, args.repeat, args.only)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Benchmark results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"[INFO] Compared with {args.compare} (commit {baseline['environment'].get('commit')}):")
+        slower = compare_reports(report, baseline, args.threshold)
+        if slower:
+            print(f"[WARNING] {len(slower)} benchmark(s) slower than x{args.threshold}.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,62 +1,102 @@
 from performance_metrics import (
-    calculate_theta_res_smooth,
-    calculate_fwhm,
     calculate_sensitivity_empirical,
     calculate_theoretical_sensitivity_precise,
     calculate_chi,
     calculate_q
 )
+from resonance_solver import solve_resonance_near, sensitivity_at_resonance
+from evanescent_field import evanescent_metrics
 import numpy as np
 
-def calculate_all_figures_of_merit(results, materials, metal):
-    substrate_index = materials[results["substrate"]].real
+PAIR = ("analyte_01", "analyte_02")  # negativo, positivo
 
-    for analyte in ["analyte_01", "analyte_02"]:
-        theta_res = results["theta_res"][(metal, analyte)]
-        fwhm = results["fwhm"][(metal, analyte)]
 
-        # --- Empirical Q
-        q_values = [calculate_q(t, f) for t, f in zip(theta_res, fwhm)]
-        results.setdefault("q_empirical", {})[(metal, analyte)] = q_values
+def calculate_all_figures_of_merit(store, materials, metals=None):
+    """
+    Adds the figure-of-merit columns to a results_store.ResultsStore, each
+    computed on whole (thickness) columns at once.
 
-        # --- Theoretical sensitivity, chi, Q
-        n_analyte = materials[analyte].real
+    Per analyte: q_empirical, sensitivity_theoretical, chi_theoretical and
+    q_theoretical; when the store carries lambda0/d_cr, the evanescent field
+    at theta_res (penetration_depth_nm, hy2_enhancement, e2_enhancement at
+    the metal/analyte interface), sensitivity_analytic and chi_analytic,
+    which need no second analyte. Only when the analyte_01/analyte_02 pair
+    was simulated: sensitivity_empirical (same value on both analytes) and
+    chi_empirical.
 
-        sensitivity_theoretical = [
-            calculate_theoretical_sensitivity_precise(
-                n_metal=materials[metal],
-                n_analyte=n_analyte,
-                n_substrate=substrate_index
-            )
-        ] * len(theta_res)  # valor fixo para todas as espessuras
+    Parameters:
+        store (ResultsStore): Results with "theta_res" and "fwhm" columns.
+        materials (dict): Refractive index table.
+        metals (list): Metals to process (default: all in the store).
+    """
+    metals = store.coords["metal"] if metals is None else metals
+    analytes = store.coords["analyte"]
+    has_pair = set(PAIR) <= set(analytes)
 
-        chi_theoretical = [calculate_chi(s, f) for s, f in zip(sensitivity_theoretical, fwhm)]
-        q_theoretical = [calculate_q(t, f) for t, f in zip(theta_res, fwhm)]
+    for substrate in store.coords["substrate"]:
+        substrate_index = materials[substrate].real
+        for metal in metals:
+            for analyte in analytes:
+                labels = {"substrate": substrate, "metal": metal, "analyte": analyte}
+                theta_res = store.column("theta_res", **labels)
+                fwhm = store.column("fwhm", **labels)
 
-        results.setdefault("sensitivity_theoretical", {})[(metal, analyte)] = sensitivity_theoretical
-        results.setdefault("chi_theoretical", {})[(metal, analyte)] = chi_theoretical
-        results.setdefault("q_theoretical", {})[(metal, analyte)] = q_theoretical
+                # --- Q empírico e teórico (mesmo θres da simulação)
+                q_values = calculate_q(theta_res, fwhm)
+                store.set_column("q_empirical", q_values, **labels)
+                store.set_column("q_theoretical", q_values, **labels)
 
-    # --- Sensibilidade empírica (Δθ / Δn) entre analyte_01 (negativo) e analyte_02 (positivo)
-    theta_neg = results["theta_res"][(metal, "analyte_01")]
-    theta_pos = results["theta_res"][(metal, "analyte_02")]
+                # --- Sensibilidade teórica: valor fixo para todas as espessuras
+                sensitivity_theoretical = calculate_theoretical_sensitivity_precise(
+                    n_metal=materials[metal],
+                    n_analyte=materials[analyte].real,
+                    n_substrate=substrate_index
+                )
+                store.set_column("sensitivity_theoretical", sensitivity_theoretical, **labels)
+                store.set_column("chi_theoretical", calculate_chi(sensitivity_theoretical, fwhm), **labels)
 
-    fwhm_neg = results["fwhm"][(metal, "analyte_01")]
-    fwhm_pos = results["fwhm"][(metal, "analyte_02")]
+                if "lambda0" not in store.attrs:
+                    continue
+                n = np.array([
+                    materials[substrate],
+                    materials["Cr"],
+                    materials[metal],
+                    materials[analyte]
+                ], dtype=complex)
 
-    n_neg = materials["analyte_01"].real
-    n_pos = materials["analyte_02"].real
+                # --- Campo evanescente em θres: todas as espessuras numa única chamada
+                d = np.column_stack([np.full(len(theta_res), store.attrs["d_cr"]),
+                                     np.asarray(store.coords["thickness"]) * 1e-9])
+                field = evanescent_metrics(n, d, np.radians(theta_res)[:, np.newaxis], store.attrs["lambda0"])
+                store.set_column("penetration_depth_nm", field["penetration_depth"][:, 0] * 1e9, **labels)
+                store.set_column("hy2_enhancement", field["hy2_enhancement"][:, 0], **labels)
+                store.set_column("e2_enhancement", field["e2_enhancement"][:, 0], **labels)
 
-    sensitivity_empirical = [
-        calculate_sensitivity_empirical(tp, tn, n_pos, n_neg)
-        for tp, tn in zip(theta_pos, theta_neg)
-    ]
+                # --- Sensibilidade analítica dθres/dn (um único solve por curva, sem o par);
+                # a diferenciação implícita é feita para todas as espessuras numa chamada
+                roots = [
+                    solve_resonance_near(n, d_row, store.attrs["lambda0"], t)[0]
+                    for d_row, t in zip(d, theta_res)
+                ]
+                sensitivity_analytic = sensitivity_at_resonance(n, d, store.attrs["lambda0"], roots)
+                store.set_column("sensitivity_analytic", sensitivity_analytic, **labels)
+                store.set_column("chi_analytic", calculate_chi(sensitivity_analytic, fwhm), **labels)
 
-    results.setdefault("sensitivity_empirical", {})[metal] = sensitivity_empirical
+            if not has_pair:
+                continue
 
-    # --- χ empíricos para cada analyte usando mesma sensibilidade empírica
-    chi_empirical_pos = [calculate_chi(s, f) for s, f in zip(sensitivity_empirical, fwhm_pos)]
-    chi_empirical_neg = [calculate_chi(s, f) for s, f in zip(sensitivity_empirical, fwhm_neg)]
+            # --- Sensibilidade empírica (Δθ / Δn) entre analyte_01 (negativo) e analyte_02 (positivo)
+            labels = {"substrate": substrate, "metal": metal}
+            sensitivity_empirical = calculate_sensitivity_empirical(
+                store.column("theta_res", analyte="analyte_02", **labels),
+                store.column("theta_res", analyte="analyte_01", **labels),
+                materials["analyte_02"].real,
+                materials["analyte_01"].real
+            )
 
-    results.setdefault("chi_empirical", {})[(metal, "analyte_02")] = chi_empirical_pos
-    results.setdefault("chi_empirical", {})[(metal, "analyte_01")] = chi_empirical_neg
+            # --- χ empíricos para cada analyte usando mesma sensibilidade empírica
+            for analyte in PAIR:
+                store.set_column("sensitivity_empirical", sensitivity_empirical, analyte=analyte, **labels)
+                store.set_column("chi_empirical", calculate_chi(
+                    sensitivity_empirical, store.column("fwhm", analyte=analyte, **labels)
+                ), analyte=analyte, **labels)
@@ -2,17 +2,7 @@ import os
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.interpolate import CubicSpline
-from matplotlib.font_manager import FontProperties
-from plot_style import apply_plot_style
-from plot_utils import save_figure
-
-# Font
-try:
-    font_path = "/usr/share/fonts/truetype/msttcorefonts/Times_New_Roman.ttf"
-    TNR = FontProperties(fname=font_path) if os.path.exists(font_path) else None
-except Exception:
-    TNR = None
-    print("[WARNING] Times New Roman not found. Using default font.")
+from plot_templates import get_template
 
 # MATLAB-like colors
 color_palette = [
@@ -27,7 +17,6 @@ name_map = {
 
 
 def plot_figures_of_merit(results, metal_thicknesses_nm, save_dir="outputs/figures_of_merit"):
-    apply_plot_style()
     os.makedirs(save_dir, exist_ok=True)
 
     metrics = [
@@ -58,7 +47,9 @@ def plot_figures_of_merit(results, metal_thicknesses_nm, save_dir="outputs/figur
             continue
 
         has_valid_data = False
-        plt.figure(figsize=(8, 5))
+        ylabel, xlabel = titles[metric]
+        template = get_template("merit", ylabel=ylabel)
+        ax = template.ax
 
         # Suporte a diferentes chaves (com ou sem analyte)
         keys = sorted(metric_data.keys())
@@ -82,39 +73,21 @@ def plot_figures_of_merit(results, metal_thicknesses_nm, save_dir="outputs/figur
                 label = str(key)
 
             color = color_palette[idx % len(color_palette)]
-            plt.plot(x, y, 'ko', markersize=5, markerfacecolor='black')
+            ax.plot(x, y, 'ko', markersize=5, markerfacecolor='black')
 
             if len(x) >= 4 and not np.any(np.isnan(y)):
                 spline = CubicSpline(x, y)
                 x_fine = np.linspace(min(x), max(x), 500)
                 y_smooth = spline(x_fine)
-                plt.plot(x_fine, y_smooth, linewidth=1.5, label=label, color=color)
+                template.plot_curve(x_fine, y_smooth, linewidth=1.5, label=label, color=color)
             else:
-                plt.plot(x, y, 'k--', linewidth=1.0, label=label)
+                ax.plot(x, y, 'k--', linewidth=1.0, label=label)
 
         if has_valid_data:
-            ylabel, xlabel = titles[metric]
-
-            if TNR:
-                plt.xlabel(xlabel, fontsize=14, fontproperties=TNR)
-                plt.ylabel(ylabel, fontsize=14, fontproperties=TNR)
-                plt.xticks(fontsize=12, fontproperties=TNR)
-                plt.yticks(fontsize=12, fontproperties=TNR)
-                plt.legend(fontsize=10, loc="best", prop=TNR)
-            else:
-                plt.xlabel(xlabel, fontsize=14)
-                plt.ylabel(ylabel, fontsize=14)
-                plt.xticks(fontsize=12)
-                plt.yticks(fontsize=12)
-                plt.legend(fontsize=10, loc="best")
-
-            plt.title("")  # sem título no topo
-            plt.grid(True)
-            plt.tight_layout()
+            template.legend(fontsize=10, loc="best")
 
             fname = os.path.join(save_dir, metric)
-            save_figure(fname)
+            template.save(fname)
             plt.show()
-            plt.close()
         else:
             print(f"[INFO] Skipping plot for {metric}: no valid data to display.")
@@ -0,0 +1,120 @@
+"""
+Transfer-matrix backend selection.
+
+When Numba is installed the Fresnel functions below run a compiled kernel
+that fuses the whole 2x2 product into complex scalar loops (no temporary
+arrays) and spreads the (stack, angle) pairs over all cores. Otherwise they
+fall back to the NumPy implementation in fresnel_utils with the same
+signature and results.
+"""
+import cmath
+import numpy as np
+from scipy.constants import pi
+from fresnel_utils import getFresnelAIM_batch as _getFresnelAIM_batch_numpy
+from instrumentation import stage, count
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+BACKEND = "numba" if NUMBA_AVAILABLE else "numpy"
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _transfer_matrix_kernel(n, d, sin_theta, k0, real_incident, r_out, t_out, Rp_out):
+        S, L = n.shape
+        A = sin_theta.shape[0]
+        for idx in prange(S * A):
+            s = idx // A
+            a = idx % A
+
+            n_in = n[s, 0].real + 0j if real_incident else n[s, 0]
+            kx = n_in * sin_theta[a]
+            kx2 = kx * kx
+
+            n0_2 = n[s, 0] * n[s, 0]
+            q_in = cmath.sqrt(n0_2 - kx2) / n0_2
+            nL_2 = n[s, L - 1] * n[s, L - 1]
+            q_out = cmath.sqrt(nL_2 - kx2) / nL_2
+
+            m00 = 1.0 + 0j
+            m01 = 0j
+            m10 = 0j
+            m11 = 1.0 + 0j
+            for k in range(1, L - 1):
+                nk_2 = n[s, k] * n[s, k]
+                eps = cmath.sqrt(nk_2 - kx2)
+                q = eps / nk_2
+                beta = k0[s] * d[s, k - 1] * eps
+                cos_b = cmath.cos(beta)
+                sin_b = cmath.sin(beta)
+                a01 = -1j / q * sin_b
+                a10 = -1j * q * sin_b
+                m00, m01 = m00 * cos_b + m01 * a10, m00 * a01 + m01 * cos_b
+                m10, m11 = m10 * cos_b + m11 * a10, m10 * a01 + m11 * cos_b
+
+            A_ = (m00 + m01 * q_out) * q_in
+            B_ = m10 + m11 * q_out
+            r = (A_ - B_) / (A_ + B_)
+            r_out[s, a] = r
+            t_out[s, a] = 2 * q_in / (A_ + B_)
+            Rp_out[s, a] = r.real * r.real + r.imag * r.imag
+
+
+def _run_compiled(n, d, theta, wavelength, real_incident):
+    n = np.asarray(n, dtype=complex)
+    d = np.asarray(d, dtype=float)
+    theta = np.asarray(theta, dtype=float)
+
+    # Achata os eixos de lote para (S, L) / (S, L-2)
+    batch_shape = np.broadcast_shapes(n.shape[:-1], d.shape[:-1], np.shape(wavelength))
+    n_flat = np.ascontiguousarray(np.broadcast_to(n, batch_shape + n.shape[-1:])).reshape(-1, n.shape[-1])
+    d_flat = np.ascontiguousarray(np.broadcast_to(d, batch_shape + d.shape[-1:])).reshape(-1, d.shape[-1])
+    sin_theta = np.ascontiguousarray(np.sin(theta).ravel())
+    k0 = np.ascontiguousarray(np.broadcast_to(2 * pi / np.asarray(wavelength, dtype=float),
+                                              batch_shape)).ravel()
+
+    S, A = n_flat.shape[0], sin_theta.shape[0]
+    r = np.empty((S, A), dtype=complex)
+    t = np.empty((S, A), dtype=complex)
+    Rp = np.empty((S, A))
+    _transfer_matrix_kernel(n_flat, d_flat, sin_theta, k0, real_incident, r, t, Rp)
+
+    out_shape = batch_shape + theta.shape
+    return r.reshape(out_shape), t.reshape(out_shape), Rp.reshape(out_shape)
+
+
+def getFresnelAIM_batch(n, d, theta, wavelength, real_incident=False):
+    """
+    Drop-in replacement for fresnel_utils.getFresnelAIM_batch that uses the
+    compiled kernel when available. ``d`` holds internal-layer thicknesses.
+    """
+    with stage("fresnel"):
+        if NUMBA_AVAILABLE:
+            r, t, Rp = _run_compiled(n, d, np.atleast_1d(theta), wavelength, real_incident)
+        else:
+            r, t, Rp = _getFresnelAIM_batch_numpy(n, d, np.atleast_1d(theta), wavelength, real_incident)
+    count("fresnel_calls")
+    count("fresnel_points", Rp.size)
+    return r, t, Rp
+
+
+def getFresnelWIM_TM_batch(n, d, theta, wavelength):
+    """
+    Vectorized getFresnelWIM_TM (tangential wavevector from Re(n[0])).
+    Accepts an array of angles and returns r, t, Rp of shape (..., A).
+    """
+    return getFresnelAIM_batch(n, d, theta, wavelength, real_incident=True)
+
+
+def getReflectivity_batch(n, d, theta, wavelength):
+    """
+    Vectorized counterpart of the Abeles getReflectivity used for the
+    evanescent-field study (full-length ``d``). Returns (Rp, r).
+    """
+    d = np.asarray(d, dtype=float)[..., 1:-1]
+    r, _, Rp = getFresnelAIM_batch(n, d, theta, wavelength)
+    return Rp, r
@@ -1,5 +1,6 @@
 import numpy as np
 from scipy.constants import pi
+from instrumentation import count
 
 def getFresnelAIM(n, d, theta, wavelength):
     mu = np.ones(len(n))
@@ -27,3 +28,302 @@ def getFresnelAIM(n, d, theta, wavelength):
     t = 2 * q[0] / den
     Rp = np.abs(r) ** 2
     return r, t, Rp
+
+def getFresnelAIM_batch(n, d, theta, wavelength, real_incident=False):
+    """
+    Angle-vectorized version of getFresnelAIM.
+
+    The transfer-matrix product is carried out element-wise on the four
+    entries of the 2x2 matrices, so the only Python loop left is the one
+    over the (few) internal layers.
+
+    Parameters:
+        n (array): Refractive indices with the layers on the last axis,
+            shape (L,) for a single stack or (..., L) for a batch of stacks.
+        d (array): Internal-layer thicknesses in meters, shape (L-2,) or
+            (..., L-2), broadcastable against the leading axes of ``n``.
+        theta (array): Incidence angles in radians, shape (A,).
+        wavelength (float | array): Wavelength in meters; an array must
+            broadcast against the leading (batch) axes of ``n``.
+        real_incident (bool): Use Re(n[0]) for the tangential wavevector,
+            as getFresnelWIM_TM does.
+
+    Returns:
+        r, t, Rp: arrays of shape (..., A).
+    """
+    n = np.asarray(n, dtype=complex)[..., np.newaxis, :]
+    d = np.asarray(d, dtype=float)[..., np.newaxis, :]
+    sin_theta = np.sin(np.asarray(theta, dtype=float))[:, np.newaxis]
+
+    k0 = 2 * pi / np.asarray(wavelength, dtype=float)[..., np.newaxis, np.newaxis]
+
+    n_in = n[..., :1].real if real_incident else n[..., :1]
+    epsilon = np.sqrt(n**2 - (n_in * sin_theta)**2)
+    beta = k0 * d * epsilon[..., 1:-1]
+    q = epsilon / n**2
+
+    shape = np.broadcast_shapes(q.shape[:-1], beta.shape[:-1])
+    m00 = np.ones(shape, dtype=complex)
+    m01 = np.zeros(shape, dtype=complex)
+    m10 = np.zeros(shape, dtype=complex)
+    m11 = np.ones(shape, dtype=complex)
+
+    for k in range(1, n.shape[-1] - 1):
+        cos_b = np.cos(beta[..., k-1])
+        sin_b = np.sin(beta[..., k-1])
+        a01 = -1j / q[..., k] * sin_b
+        a10 = -1j * q[..., k] * sin_b
+        m00, m01 = m00 * cos_b + m01 * a10, m00 * a01 + m01 * cos_b
+        m10, m11 = m10 * cos_b + m11 * a10, m10 * a01 + m11 * cos_b
+
+    q_in = q[..., 0]
+    q_out = q[..., -1]
+    A = (m00 + m01 * q_out) * q_in
+    B = m10 + m11 * q_out
+    r = (A - B) / (A + B)
+    t = 2 * q_in / (A + B)
+    Rp = np.abs(r) ** 2
+    return r, t, Rp
+
+def getFresnelAIM_derivative(n, d, theta, wavelength):
+    """
+    Same transfer-matrix model as getFresnelAIM_batch, propagating the
+    analytic derivative with respect to the incidence angle alongside the
+    2x2 product.
+
+    Parameters:
+        n, d, theta, wavelength: as in getFresnelAIM_batch.
+
+    Returns:
+        r, dr_dtheta, Rp, dRp_dtheta: arrays of shape (..., A); derivatives
+        are per radian.
+    """
+    count("fresnel_derivative_calls")
+    n = np.asarray(n, dtype=complex)[..., np.newaxis, :]
+    d = np.asarray(d, dtype=float)[..., np.newaxis, :]
+    theta = np.asarray(theta, dtype=float)[:, np.newaxis]
+    k0 = 2 * pi / wavelength
+
+    n_in = n[..., :1]
+    kx2 = (n_in * np.sin(theta))**2
+    dkx2 = 2 * n_in**2 * np.sin(theta) * np.cos(theta)
+
+    epsilon = np.sqrt(n**2 - kx2)
+    depsilon = -dkx2 / (2 * epsilon)
+    q = epsilon / n**2
+    dq = depsilon / n**2
+    beta = k0 * d * epsilon[..., 1:-1]
+    dbeta = k0 * d * depsilon[..., 1:-1]
+
+    shape = np.broadcast_shapes(q.shape[:-1], beta.shape[:-1])
+    m00 = np.ones(shape, dtype=complex)
+    m01 = np.zeros(shape, dtype=complex)
+    m10 = np.zeros(shape, dtype=complex)
+    m11 = np.ones(shape, dtype=complex)
+    dm00 = np.zeros(shape, dtype=complex)
+    dm01 = np.zeros(shape, dtype=complex)
+    dm10 = np.zeros(shape, dtype=complex)
+    dm11 = np.zeros(shape, dtype=complex)
+
+    for k in range(1, n.shape[-1] - 1):
+        cos_b = np.cos(beta[..., k-1])
+        sin_b = np.sin(beta[..., k-1])
+        db = dbeta[..., k-1]
+        qk, dqk = q[..., k], dq[..., k]
+
+        a01 = -1j / qk * sin_b
+        a10 = -1j * qk * sin_b
+        dcos = -sin_b * db
+        da01 = -1j * (cos_b * db / qk - sin_b * dqk / qk**2)
+        da10 = -1j * (dqk * sin_b + qk * cos_b * db)
+
+        dm00, dm01 = (dm00 * cos_b + m00 * dcos + dm01 * a10 + m01 * da10,
+                      dm00 * a01 + m00 * da01 + dm01 * cos_b + m01 * dcos)
+        dm10, dm11 = (dm10 * cos_b + m10 * dcos + dm11 * a10 + m11 * da10,
+                      dm10 * a01 + m10 * da01 + dm11 * cos_b + m11 * dcos)
+        m00, m01 = m00 * cos_b + m01 * a10, m00 * a01 + m01 * cos_b
+        m10, m11 = m10 * cos_b + m11 * a10, m10 * a01 + m11 * cos_b
+
+    q_in, dq_in = q[..., 0], dq[..., 0]
+    q_out, dq_out = q[..., -1], dq[..., -1]
+    A = (m00 + m01 * q_out) * q_in
+    B = m10 + m11 * q_out
+    dA = (dm00 + dm01 * q_out + m01 * dq_out) * q_in + (m00 + m01 * q_out) * dq_in
+    dB = dm10 + dm11 * q_out + m11 * dq_out
+
+    r = (A - B) / (A + B)
+    dr = 2 * (B * dA - A * dB) / (A + B)**2
+    Rp = np.abs(r) ** 2
+    dRp = 2 * np.real(np.conj(r) * dr)
+    return r, dr, Rp, dRp
+
+def getFresnelAIM_tangent(n, d, theta, wavelength, dn=0, dd=0, dwavelength=0):
+    """
+    Forward-mode (directional) derivative of the transfer-matrix
+    reflectance with respect to the structure: the rate of change of Rp
+    when the indices, thicknesses and wavelength move along (dn, dd,
+    dwavelength). Stacking several directions on a leading batch axis
+    gives a Jacobian in one call, e.g. one direction per layer thickness.
+
+    Parameters:
+        n, d, theta, wavelength: as in getFresnelAIM_batch (scalar
+            wavelength, or one per batch entry).
+        dn (array): Index direction, broadcastable against ``n``.
+        dd (array): Thickness direction in meters, broadcastable against ``d``.
+        dwavelength (float | array): Wavelength direction in meters.
+
+    Returns:
+        Rp, dRp: arrays of shape (..., A).
+    """
+    count("fresnel_tangent_calls")
+    n, dn = np.broadcast_arrays(np.asarray(n, dtype=complex), np.asarray(dn, dtype=complex))
+    d, dd = np.broadcast_arrays(np.asarray(d, dtype=float), np.asarray(dd, dtype=float))
+    n, dn = n[..., np.newaxis, :], dn[..., np.newaxis, :]
+    d, dd = d[..., np.newaxis, :], dd[..., np.newaxis, :]
+    sin_theta = np.sin(np.asarray(theta, dtype=float))[:, np.newaxis]
+    wavelength = np.asarray(wavelength, dtype=float)[..., np.newaxis, np.newaxis]
+    k0 = 2 * pi / wavelength
+    dk0 = -k0 * np.asarray(dwavelength, dtype=float)[..., np.newaxis, np.newaxis] / wavelength
+
+    n_in, dn_in = n[..., :1], dn[..., :1]
+    kx2 = (n_in * sin_theta)**2
+    dkx2 = 2 * n_in * dn_in * sin_theta**2
+
+    epsilon = np.sqrt(n**2 - kx2)
+    depsilon = (2 * n * dn - dkx2) / (2 * epsilon)
+    q = epsilon / n**2
+    dq = depsilon / n**2 - 2 * epsilon * dn / n**3
+    beta = k0 * d * epsilon[..., 1:-1]
+    dbeta = (dk0 * d + k0 * dd) * epsilon[..., 1:-1] + k0 * d * depsilon[..., 1:-1]
+
+    shape = np.broadcast_shapes(q.shape[:-1], beta.shape[:-1])
+    m00 = np.ones(shape, dtype=complex)
+    m01 = np.zeros(shape, dtype=complex)
+    m10 = np.zeros(shape, dtype=complex)
+    m11 = np.ones(shape, dtype=complex)
+    dm00 = np.zeros(shape, dtype=complex)
+    dm01 = np.zeros(shape, dtype=complex)
+    dm10 = np.zeros(shape, dtype=complex)
+    dm11 = np.zeros(shape, dtype=complex)
+
+    # Mesma recursão de getFresnelAIM_derivative, com dq e dbeta da direção dada
+    for k in range(1, n.shape[-1] - 1):
+        cos_b = np.cos(beta[..., k-1])
+        sin_b = np.sin(beta[..., k-1])
+        db = dbeta[..., k-1]
+        qk, dqk = q[..., k], dq[..., k]
+
+        a01 = -1j / qk * sin_b
+        a10 = -1j * qk * sin_b
+        dcos = -sin_b * db
+        da01 = -1j * (cos_b * db / qk - sin_b * dqk / qk**2)
+        da10 = -1j * (dqk * sin_b + qk * cos_b * db)
+
+        dm00, dm01 = (dm00 * cos_b + m00 * dcos + dm01 * a10 + m01 * da10,
+                      dm00 * a01 + m00 * da01 + dm01 * cos_b + m01 * dcos)
+        dm10, dm11 = (dm10 * cos_b + m10 * dcos + dm11 * a10 + m11 * da10,
+                      dm10 * a01 + m10 * da01 + dm11 * cos_b + m11 * dcos)
+        m00, m01 = m00 * cos_b + m01 * a10, m00 * a01 + m01 * cos_b
+        m10, m11 = m10 * cos_b + m11 * a10, m10 * a01 + m11 * cos_b
+
+    q_in, dq_in = q[..., 0], dq[..., 0]
+    q_out, dq_out = q[..., -1], dq[..., -1]
+    A = (m00 + m01 * q_out) * q_in
+    B = m10 + m11 * q_out
+    dA = (dm00 + dm01 * q_out + m01 * dq_out) * q_in + (m00 + m01 * q_out) * dq_in
+    dB = dm10 + dm11 * q_out + m11 * dq_out
+
+    r = (A - B) / (A + B)
+    dr = 2 * (B * dA - A * dB) / (A + B)**2
+    Rp = np.abs(r) ** 2
+    dRp = 2 * np.real(np.conj(r) * dr)
+    return Rp, dRp
+
+def _jet_add(x, y):
+    return tuple(xi + yi for xi, yi in zip(x, y))
+
+def _jet_scale(x, c):
+    return tuple(xi * c for xi in x)
+
+def _jet_mul(x, y):
+    # (valor, d/dθ, d/dv, d²/dθ², d²/dθdv) do produto
+    return (x[0] * y[0],
+            x[1] * y[0] + x[0] * y[1],
+            x[2] * y[0] + x[0] * y[2],
+            x[3] * y[0] + 2 * x[1] * y[1] + x[0] * y[3],
+            x[4] * y[0] + x[1] * y[2] + x[2] * y[1] + x[0] * y[4])
+
+def _jet_apply(x, f0, f1, f2):
+    # Regra da cadeia de segunda ordem com f(x), f'(x), f''(x) já avaliados
+    return (f0,
+            f1 * x[1],
+            f1 * x[2],
+            f2 * x[1]**2 + f1 * x[3],
+            f2 * x[1] * x[2] + f1 * x[4])
+
+def getFresnelAIM_curvature(n, d, theta, wavelength, dn=0, dd=0, dwavelength=0):
+    """
+    Second-order forward mode of the transfer-matrix reflectance: besides
+    dRp/dtheta it returns the angular curvature d2Rp/dtheta2 and the mixed
+    derivative d2Rp/(dtheta dv) along a structure direction v = (dn, dd,
+    dwavelength), as in getFresnelAIM_tangent. These are the two partials of
+    g = dRp/dtheta needed to differentiate the resonance condition g = 0.
+
+    Parameters:
+        n, d, wavelength, dn, dd, dwavelength: as in getFresnelAIM_tangent.
+        theta (array): Incidence angles in radians, shape (A,) or
+            broadcastable against the leading axes of ``n`` as (..., A).
+
+    Returns:
+        Rp, dRp_dtheta, d2Rp_dtheta2, d2Rp_dtheta_dv: arrays of shape
+        (..., A); angular derivatives are per radian.
+    """
+    count("fresnel_curvature_calls")
+    n, dn = np.broadcast_arrays(np.asarray(n, dtype=complex), np.asarray(dn, dtype=complex))
+    d, dd = np.broadcast_arrays(np.asarray(d, dtype=float), np.asarray(dd, dtype=float))
+    n, dn = n[..., np.newaxis, :], dn[..., np.newaxis, :]
+    d, dd = d[..., np.newaxis, :], dd[..., np.newaxis, :]
+    theta = np.asarray(theta, dtype=float)[..., np.newaxis]
+    wavelength = np.asarray(wavelength, dtype=float)[..., np.newaxis, np.newaxis]
+    k0 = 2 * pi / wavelength
+    dk0 = -k0 * np.asarray(dwavelength, dtype=float)[..., np.newaxis, np.newaxis] / wavelength
+
+    # Cada grandeza é um jato (valor, ∂θ, ∂v, ∂θ², ∂θ∂v)
+    sin_theta = (np.sin(theta), np.cos(theta), 0, -np.sin(theta), 0)
+    n_jet = (n, 0, dn, 0, 0)
+    kx = _jet_mul((n[..., :1], 0, dn[..., :1], 0, 0), sin_theta)
+    eps2 = np.broadcast_arrays(*_jet_add(_jet_mul(n_jet, n_jet), _jet_scale(_jet_mul(kx, kx), -1)))
+    epsilon = np.sqrt(eps2[0])
+    epsilon = _jet_apply(eps2, epsilon, 1 / (2 * epsilon), -1 / (4 * epsilon**3))
+    q = _jet_mul(epsilon, _jet_apply(n_jet, 1 / n**2, -2 / n**3, 6 / n**4))
+    beta = _jet_mul(_jet_mul((k0, 0, dk0, 0, 0), (d, 0, dd, 0, 0)),
+                    tuple(e[..., 1:-1] for e in epsilon))
+
+    shape = np.broadcast_shapes(q[0].shape[:-1], beta[0].shape[:-1])
+    one = (np.ones(shape, dtype=complex), 0, 0, 0, 0)
+    zero = (np.zeros(shape, dtype=complex), 0, 0, 0, 0)
+    m00, m01, m10, m11 = one, zero, zero, one
+
+    # Mesma recursão 2x2 de getFresnelAIM_batch, em aritmética de jatos
+    for k in range(1, n.shape[-1] - 1):
+        b = tuple(e[..., k-1] for e in beta)
+        qk = tuple(e[..., k] for e in q)
+        cos_b = _jet_apply(b, np.cos(b[0]), -np.sin(b[0]), -np.cos(b[0]))
+        sin_b = _jet_apply(b, np.sin(b[0]), np.cos(b[0]), -np.sin(b[0]))
+        a01 = _jet_scale(_jet_mul(sin_b, _jet_apply(qk, 1 / qk[0], -1 / qk[0]**2, 2 / qk[0]**3)), -1j)
+        a10 = _jet_scale(_jet_mul(qk, sin_b), -1j)
+
+        m00, m01 = (_jet_add(_jet_mul(m00, cos_b), _jet_mul(m01, a10)),
+                    _jet_add(_jet_mul(m00, a01), _jet_mul(m01, cos_b)))
+        m10, m11 = (_jet_add(_jet_mul(m10, cos_b), _jet_mul(m11, a10)),
+                    _jet_add(_jet_mul(m10, a01), _jet_mul(m11, cos_b)))
+
+    q_in = tuple(e[..., 0] for e in q)
+    q_out = tuple(e[..., -1] for e in q)
+    A = _jet_mul(_jet_add(m00, _jet_mul(m01, q_out)), q_in)
+    B = _jet_add(m10, _jet_mul(m11, q_out))
+    den = _jet_add(A, B)
+    r = _jet_mul(_jet_add(A, _jet_scale(B, -1)), _jet_apply(den, 1 / den[0], -1 / den[0]**2, 2 / den[0]**3))
+
+    Rp = _jet_mul(r, tuple(np.conj(e) for e in r))
+    return tuple(np.real(e) for e in (Rp[0], Rp[1], Rp[3], Rp[4]))
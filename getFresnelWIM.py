@@ -1,5 +1,6 @@
 import numpy as np
 from scipy.constants import pi
+from fresnel_backend import getFresnelWIM_TM_batch
 
 def getFresnelWIM_TM(n, d, theta, wavelength):
     """
@@ -7,7 +8,7 @@ def getFresnelWIM_TM(n, d, theta, wavelength):
 
     Parâmetros:
     - n: array com índices de refração (complexos)
-    - d: array com espessuras das camadas (em metros)
+    - d: array com espessuras das camadas internas (em metros), como em getFresnelAIM
     - theta: ângulo de incidência (em rad)
     - wavelength: comprimento de onda (em metros)
 
@@ -18,15 +19,15 @@ def getFresnelWIM_TM(n, d, theta, wavelength):
     """
     mu = np.ones(len(n))  # permeabilidade relativa (μ ≈ 1)
     epsilon = np.sqrt(n**2 - (np.real(n[0]) * np.sin(theta))**2)
-    beta = (2 * pi / wavelength) * d * epsilon
+    beta = (2 * pi / wavelength) * np.array(d) * epsilon[1:-1]
     q = epsilon / n**2  # modo TM
 
     M_tot = np.array([[1, 0], [0, 1]], dtype=complex)
 
     for k in range(1, len(n) - 1):
         M_k = np.array([
-            [np.cos(beta[k]), -1j / q[k] * np.sin(beta[k])],
-            [-1j * q[k] * np.sin(beta[k]), np.cos(beta[k])]
+            [np.cos(beta[k-1]), -1j / q[k] * np.sin(beta[k-1])],
+            [-1j * q[k] * np.sin(beta[k-1]), np.cos(beta[k-1])]
         ])
         M_tot = M_tot @ M_k
 
@@ -38,3 +39,22 @@ def getFresnelWIM_TM(n, d, theta, wavelength):
     Rp = np.abs(r)**2
 
     return r, t, Rp
+
+
+def getFresnelWIM_batch(n, d, theta, wavelength):
+    """
+    Refletância TM em função do comprimento de onda, para um ângulo fixo,
+    numa única chamada vetorizada.
+
+    Parâmetros:
+    - n: índices de refração por comprimento de onda, shape (..., W, L)
+    - d: espessuras das camadas internas (em metros), shape (..., L-2)
+    - theta: ângulo de incidência fixo (em rad)
+    - wavelength: comprimentos de onda (em metros), shape (W,)
+
+    Retorna:
+    - r, t, Rp com shape (..., W)
+    """
+    d = np.asarray(d, dtype=float)[..., np.newaxis, :]
+    r, t, Rp = getFresnelWIM_TM_batch(n, d, np.atleast_1d(theta), wavelength)
+    return r[..., 0], t[..., 0], Rp[..., 0]
@@ -0,0 +1,170 @@
+"""
+Run instrumentation: stage timers, event counters (Fresnel calls, figures,
+cache hits), peak memory and an optional cProfile dump, summarized as JSON
+at the end of every mode or batch run.
+
+Timers and counters are module-level and cheap enough to stay on. Work done
+in pool workers is recorded there and sent back with the result
+(``collect_call``), then folded into the parent's totals with ``merge``.
+Stage seconds are therefore summed over processes and include any stages
+nested inside them, so they can add up to more than the wall time.
+
+    with run_report("mode_1", cache=cache):
+        with stage("sweep"):
+            ...
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_REPORT_DIR = "outputs/reports"
+
+_stages = defaultdict(lambda: [0, 0.0])  # nome -> [chamadas, segundos]
+_counters = defaultdict(int)
+
+
+@contextmanager
+def stage(name):
+    """Times the enclosed block under ``name`` (accumulated over calls)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = _stages[name]
+        entry[0] += 1
+        entry[1] += time.perf_counter() - start
+
+
+def count(name, n=1):
+    """Adds ``n`` to the counter ``name``."""
+    _counters[name] += n
+
+
+def reset():
+    _stages.clear()
+    _counters.clear()
+
+
+def snapshot():
+    """Current totals: {"stages": {name: [calls, s]}, "counters": {name: n}}."""
+    return {"stages": {k: list(v) for k, v in _stages.items()}, "counters": dict(_counters)}
+
+
+def _difference(after, before):
+    stages = {}
+    for name, (calls, seconds) in after["stages"].items():
+        calls0, seconds0 = before["stages"].get(name, (0, 0.0))
+        if calls > calls0:
+            stages[name] = [calls - calls0, seconds - seconds0]
+    counters = {name: n - before["counters"].get(name, 0) for name, n in after["counters"].items()
+                if n != before["counters"].get(name, 0)}
+    return {"stages": stages, "counters": counters}
+
+
+def merge(stats):
+    """Adds a snapshot (e.g. returned by collect_call in a worker) to the totals."""
+    for name, (calls, seconds) in stats["stages"].items():
+        entry = _stages[name]
+        entry[0] += calls
+        entry[1] += seconds
+    for name, n in stats["counters"].items():
+        _counters[name] += n
+
+
+def collect_call(func, *args, **kwargs):
+    """
+    Runs ``func`` (typically in a pool worker) and returns
+    (result, stats recorded during the call) for ``merge`` in the parent.
+    """
+    before = snapshot()
+    result = func(*args, **kwargs)
+    return result, _difference(snapshot(), before)
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process and of its finished children (MB)."""
+    if resource is None:
+        return {"self": None, "children": None}
+    # ru_maxrss: KB no Linux, bytes no macOS
+    scale = 1024**2 if os.uname().sysname == "Darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+def summary(name, wall_s, **extra):
+    """Machine-readable summary of the totals recorded so far."""
+    stages = {k: {"calls": v[0], "seconds": round(v[1], 6)}
+              for k, v in sorted(_stages.items(), key=lambda item: -item[1][1])}
+    report = {
+        "run": name,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "wall_s": round(wall_s, 6),
+        "stages": stages,
+        "counters": dict(sorted(_counters.items())),
+        "peak_memory_mb": peak_memory_mb(),
+    }
+    report.update(extra)
+    return report
+
+
+@contextmanager
+def run_report(name, report_dir=DEFAULT_REPORT_DIR, cache=None, profile=False, **extra):
+    """
+    Instruments one run: resets the totals, optionally profiles the calling
+    process with cProfile, and on exit writes ``<report_dir>/<name>_<time>.json``
+    (plus ``.prof`` and a top-30 ``.txt`` when profiling). Pool workers are
+    not profiled; their stage times come back through collect_call.
+
+    Parameters:
+        name (str): Run label (file prefix).
+        report_dir (str): Output folder (None: print only, write nothing).
+        cache (ReflectanceCache): Cache whose hits/misses are reported.
+        profile (bool): Attach cProfile to the run.
+        **extra: JSON-serializable values added to the summary.
+    """
+    reset()
+    hits0, misses0 = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    profiler = cProfile.Profile() if profile else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall_s = time.perf_counter() - start
+        if cache is not None:
+            count("cache_hits", cache.hits - hits0)
+            count("cache_misses", cache.misses - misses0)
+        report = summary(name, wall_s, **extra)
+
+        top = sorted(report["stages"].items(), key=lambda item: -item[1]["seconds"])[:4]
+        print(f"[INFO] {name}: {wall_s:.2f} s total; " +
+              ", ".join(f"{k} {v['seconds']:.2f} s" for k, v in top))
+        if report_dir is not None:
+            os.makedirs(report_dir, exist_ok=True)
+            base = os.path.join(report_dir, f"{name}_{datetime.now():%Y%m%d_%H%M%S}")
+            if profiler is not None:
+                profiler.dump_stats(f"{base}.prof")
+                text = io.StringIO()
+                pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(30)
+                with open(f"{base}.txt", "w") as f:
+                    f.write(text.getvalue())
+                report["profile"] = f"{base}.prof"
+            with open(f"{base}.json", "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"[INFO] Run report saved to: {base}.json")
@@ -0,0 +1,296 @@
+"""
+Inverse design of the sensing stack: metal thickness, Cr thickness and
+wavelength are tuned continuously with a gradient-based optimizer
+(scipy L-BFGS-B) to maximize chi, Q or the minimum-reflectance-weighted
+sensitivity; the substrate and metal are chosen by optimizing every pair.
+
+One design evaluation is a single batched curve over the angular window
+(theta_res and dip shape from the batched extractors) plus a handful of
+analytic-derivative calls. The gradient comes from getFresnelAIM_tangent
+(dRp along each design variable) and implicit differentiation of the
+resonance and half-maximum conditions:
+
+    dtheta_res/dp = -(dg/dp) / (dg/dtheta),      g = dRp/dtheta
+    dtheta_±/dp   = (dh/dp - dRp/dp) / (dRp/dtheta),   h = (Rmax + Rmin) / 2
+    dRmin/dp      = dRp/dp at theta_res
+
+The sensitivity S = dtheta_res/dn_analyte is itself a derivative
+(resonance_solver.calculate_sensitivity_analytic); its gradient is taken
+with central differences of S. Indices come from material_database at the
+design wavelength (analytes constant), so the objective is continuous in
+the wavelength; the models are anchored to optical_data at 850 nm.
+"""
+import numpy as np
+from scipy.optimize import minimize
+from fresnel_backend import getFresnelAIM_batch
+from fresnel_utils import getFresnelAIM_derivative, getFresnelAIM_tangent
+from material_database import get_material_database
+from performance_metrics import find_resonance_batch, calculate_curve_shape_batch, RES_OK
+from resonance_solver import calculate_sensitivity_analytic
+from instrumentation import stage, count
+from simulation_config import lambda0, d_cr, analytes, theta_deg as default_theta_deg
+
+VARIABLES = ("metal_thickness_nm", "cr_thickness_nm", "wavelength_nm")
+DEFAULT_BOUNDS = {
+    "metal_thickness_nm": (30.0, 70.0),
+    "cr_thickness_nm": (0.0, 5.0),
+    "wavelength_nm": (700.0, 1000.0),
+}
+DEFAULT_START = {
+    "metal_thickness_nm": 50.0,
+    "cr_thickness_nm": d_cr * 1e9,
+    "wavelength_nm": lambda0 * 1e9,
+}
+OBJECTIVES = ("chi", "q", "weighted_sensitivity")
+
+# Passos das diferenças centrais de S (nas unidades de cada variável)
+SENSITIVITY_STEPS = {"metal_thickness_nm": 0.05, "cr_thickness_nm": 0.01, "wavelength_nm": 0.2}
+
+
+def build_design_stack(substrate, metal, n_analyte, design, database=None):
+    """
+    Substrate/Cr/metal/analyte stack of one design.
+
+    Parameters:
+        substrate, metal (str): Keys of the material database.
+        n_analyte (complex): Analyte index (non-dispersive).
+        design (dict): Values of every entry of VARIABLES.
+        database (MaterialDatabase): Default: the shared database.
+
+    Returns:
+        n, d (m), wavelength (m), dn/dwavelength (per m, zero for the analyte).
+    """
+    database = database or get_material_database()
+    wavelength = design["wavelength_nm"] * 1e-9
+    names = [substrate, "Cr", metal]
+    h = 0.5e-9
+    n = np.array([*(database.index(name, wavelength) for name in names), n_analyte], dtype=complex)
+    dn_dlambda = np.array([*((database.index(name, wavelength + h) - database.index(name, wavelength - h))
+                             / (2 * h) for name in names), 0], dtype=complex)
+    d = np.array([design["cr_thickness_nm"], design["metal_thickness_nm"]]) * 1e-9
+    return n, d, wavelength, dn_dlambda
+
+
+def evaluate_design(substrate, metal, design, n_analyte=None, theta_deg=None,
+                    theta_window=(40, 80), gradient=True, database=None):
+    """
+    Figures of merit of one design and, with ``gradient``, their
+    derivatives with respect to every entry of VARIABLES.
+
+    Parameters:
+        substrate, metal (str): Keys of the material database.
+        design (dict): Values of every entry of VARIABLES.
+        n_analyte (complex): Analyte index (default: analyte_01).
+        theta_deg (array): Angular grid of the curve (default: simulation_config).
+        theta_window (tuple): Window for theta_res (deg).
+        gradient (bool): Also return {"gradient": {metric: array over VARIABLES}}.
+
+    Returns:
+        dict with theta_res (deg), fwhm (deg), r_min, sensitivity (deg/RIU),
+        chi, q, weighted_sensitivity (S * (1 - r_min)), status (RES_*
+        flags) and valid. Metrics are NaN when the dip is not resolved.
+    """
+    count("design_evaluations")
+    n_analyte = analytes["analyte_01"] if n_analyte is None else n_analyte
+    theta_deg = default_theta_deg if theta_deg is None else np.asarray(theta_deg)
+    n, d, wavelength, dn_dlambda = build_design_stack(substrate, metal, n_analyte, design, database)
+
+    Rp = getFresnelAIM_batch(n, d, np.radians(theta_deg), wavelength)[2]
+    theta_res, R_res, status = find_resonance_batch(theta_deg, Rp, theta_window)
+    shape = calculate_curve_shape_batch(theta_deg, Rp, theta_res, R_res)
+    theta_res, fwhm, r_min = float(theta_res), float(shape["fwhm"]), float(shape["r_min"])
+
+    metrics = {"theta_res": theta_res, "fwhm": fwhm, "r_min": r_min, "status": int(status),
+               "valid": int(status) == RES_OK and np.isfinite(fwhm) and fwhm > 0}
+    if not metrics["valid"]:
+        nan = np.full(len(VARIABLES), np.nan)
+        metrics.update({name: np.nan for name in ("sensitivity",) + OBJECTIVES})
+        if gradient:
+            metrics["gradient"] = {name: nan for name in ("theta_res", "fwhm", "r_min", "sensitivity") + OBJECTIVES}
+        return metrics
+
+    S = float(np.real(calculate_sensitivity_analytic(n, d, wavelength, theta_res=theta_res,
+                                                     theta_window=theta_window)))
+    metrics.update({"sensitivity": S, "chi": S / fwhm, "q": theta_res / fwhm,
+                    "weighted_sensitivity": S * (1 - r_min)})
+    if not gradient:
+        return metrics
+
+    # Ângulos das duas bordas da meia altura e do máximo da curva
+    asymmetry = float(shape["asymmetry"])
+    theta_left = theta_res - fwhm * (1 - asymmetry) / 2
+    theta_right = theta_res + fwhm * (1 + asymmetry) / 2
+    theta_max = theta_deg[np.argmax(Rp)]
+    grads = _resonance_gradients(n, d, wavelength, dn_dlambda, theta_res, theta_left, theta_right,
+                                 theta_max, float(shape["slope_left"]), float(shape["slope_right"]))
+    grads["sensitivity"] = _sensitivity_gradient(substrate, metal, n_analyte, design, theta_res,
+                                                 theta_window, database)
+
+    dS, dF, dR = grads["sensitivity"], grads["fwhm"], grads["r_min"]
+    grads["chi"] = (dS * fwhm - S * dF) / fwhm**2
+    grads["q"] = (grads["theta_res"] * fwhm - theta_res * dF) / fwhm**2
+    grads["weighted_sensitivity"] = dS * (1 - r_min) - S * dR
+    metrics["gradient"] = grads
+    return metrics
+
+
+def _resonance_gradients(n, d, wavelength, dn_dlambda, theta_res, theta_left, theta_right,
+                         theta_max, slope_left, slope_right, h_theta_deg=1e-4):
+    # Uma direção por variável (por nm): espessura do metal, do Cr e λ
+    dn = np.zeros((len(VARIABLES), len(n)), dtype=complex)
+    dn[2] = dn_dlambda * 1e-9
+    dd = np.zeros((len(VARIABLES), len(d)))
+    dd[0, 1] = dd[1, 0] = 1e-9
+    dwavelength = np.array([0.0, 0.0, 1e-9])
+
+    angles = np.radians([theta_res - h_theta_deg, theta_res + h_theta_deg, theta_res,
+                         theta_left, theta_right, theta_max])
+    dRp = getFresnelAIM_tangent(n, d, angles, wavelength, dn, dd, dwavelength)[1]  # (V, 6)
+
+    # g = dRp/dθ (por grau) e suas derivadas em θ e em cada variável
+    g = getFresnelAIM_derivative(n, d, angles[:2], wavelength)[3] * (np.pi / 180)
+    dg_dtheta = (g[1] - g[0]) / (2 * h_theta_deg)
+    dg_dp = (dRp[:, 1] - dRp[:, 0]) / (2 * h_theta_deg)
+    d_theta_res = -dg_dp / dg_dtheta
+
+    d_r_min = dRp[:, 2]
+    d_half = (dRp[:, 5] + d_r_min) / 2
+    d_left = (d_half - dRp[:, 3]) / slope_left
+    d_right = (d_half - dRp[:, 4]) / slope_right
+    return {"theta_res": d_theta_res, "fwhm": d_right - d_left, "r_min": d_r_min}
+
+
+def _sensitivity_gradient(substrate, metal, n_analyte, design, theta_res, theta_window, database):
+    grad = np.empty(len(VARIABLES))
+    for i, name in enumerate(VARIABLES):
+        step = SENSITIVITY_STEPS[name]
+        values = []
+        for sign in (-1, 1):
+            n, d, wavelength, _ = build_design_stack(substrate, metal, n_analyte,
+                                                     {**design, name: design[name] + sign * step}, database)
+            values.append(np.real(calculate_sensitivity_analytic(n, d, wavelength, theta_res=theta_res,
+                                                                 theta_window=theta_window)))
+        grad[i] = (values[1] - values[0]) / (2 * step)
+    return grad
+
+
+def optimize_design(substrate, metal, objective="chi", variables=VARIABLES, bounds=None,
+                    start=None, max_r_min=None, n_analyte=None, theta_deg=None,
+                    theta_window=(40, 80), max_iterations=50, tol=1e-9, database=None):
+    """
+    Maximizes ``objective`` over the continuous design variables of one
+    substrate/metal pair with the analytic gradient of evaluate_design:
+    L-BFGS-B within ``bounds``, or SLSQP when ``max_r_min`` adds a dip
+    depth constraint (chi and Q alone favour thick, shallow dips).
+
+    Parameters:
+        substrate, metal (str): Keys of the material database.
+        objective (str): "chi", "q" or "weighted_sensitivity".
+        variables (tuple): Free variables (subset of VARIABLES); the others
+            stay at their ``start`` value.
+        bounds (dict): {variable: (low, high)} (default: DEFAULT_BOUNDS).
+        start (dict): Starting design (default: DEFAULT_START).
+        max_r_min (float): Upper limit on the minimum reflectance.
+        n_analyte, theta_deg, theta_window: as in evaluate_design.
+        max_iterations (int): Optimizer iteration limit.
+        tol (float): Relative objective tolerance (scipy ``ftol``).
+
+    Returns:
+        dict with substrate, metal, objective, design, value, metrics (the
+        evaluate_design output at the optimum, without the gradient),
+        start_value, iterations, evaluations (design evaluations, each one
+        curve plus its gradient), success and message. The design is the
+        best valid (and feasible) point evaluated, even if the optimizer
+        stopped abnormally, e.g. against the edge of the angular window.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective} (use one of {', '.join(OBJECTIVES)})")
+    unknown = set(variables) - set(VARIABLES)
+    if unknown:
+        raise ValueError(f"Unknown design variables: {', '.join(sorted(unknown))}")
+    bounds = {**DEFAULT_BOUNDS, **(bounds or {})}
+    start = {**DEFAULT_START, **(start or {})}
+    free = [VARIABLES.index(name) for name in variables]
+    # O otimizador trabalha em [0, 1] por variável (nm e λ têm escalas muito diferentes)
+    low = np.array([bounds[name][0] for name in variables], dtype=float)
+    span = np.array([bounds[name][1] for name in variables], dtype=float) - low
+
+    def design_of(u):
+        return {**start, **dict(zip(variables, map(float, low + np.asarray(u) * span)))}
+
+    # Último ponto avaliado (objetivo e restrição pedem o mesmo x) e melhor ponto válido
+    last = {"x": None, "metrics": None}
+    best = {"value": -np.inf, "x": None}
+    calls = [0]
+
+    def evaluate(x):
+        if last["x"] is None or not np.array_equal(last["x"], x):
+            calls[0] += 1
+            metrics = evaluate_design(substrate, metal, design_of(x), n_analyte, theta_deg,
+                                      theta_window, gradient=True, database=database)
+            last.update(x=np.array(x), metrics=metrics)
+            # Tolerância da restrição no ponto ótimo (SLSQP para sobre a borda)
+            feasible = max_r_min is None or metrics["r_min"] <= max_r_min + 1e-6
+            if metrics["valid"] and feasible and metrics[objective] > best["value"]:
+                best.update(value=metrics[objective], x=np.array(x))
+        return last["metrics"]
+
+    def negative_objective(x):
+        metrics = evaluate(x)
+        if not metrics["valid"]:
+            # Sem ressonância resolvida: pior que qualquer projeto válido
+            return 0.0, np.zeros(len(free))
+        return -metrics[objective], -metrics["gradient"][objective][free] * span
+
+    def depth_margin(x):
+        metrics = evaluate(x)
+        return max_r_min - metrics["r_min"] if metrics["valid"] else -1.0
+
+    def depth_margin_gradient(x):
+        metrics = evaluate(x)
+        return -metrics["gradient"]["r_min"][free] * span if metrics["valid"] else np.zeros(len(free))
+
+    x0 = (np.array([start[name] for name in variables], dtype=float) - low) / span
+    options = {"maxiter": max_iterations, "ftol": tol}
+    box = [(0.0, 1.0)] * len(variables)
+    with stage(f"inverse_design:{objective}"):
+        start_value = evaluate(x0)[objective]
+        if max_r_min is None:
+            result = minimize(negative_objective, x0, jac=True, method="L-BFGS-B", bounds=box,
+                              options=options)
+        else:
+            result = minimize(negative_objective, x0, jac=True, method="SLSQP", bounds=box,
+                              constraints=[{"type": "ineq", "fun": depth_margin,
+                                            "jac": depth_margin_gradient}],
+                              options=options)
+    design = design_of(best["x"] if best["x"] is not None else result.x)
+    metrics = evaluate_design(substrate, metal, design, n_analyte, theta_deg, theta_window,
+                              gradient=False, database=database)
+    return {
+        "substrate": substrate,
+        "metal": metal,
+        "objective": objective,
+        "design": design,
+        "value": metrics[objective],
+        "metrics": metrics,
+        "start_value": start_value,
+        "iterations": result.nit,
+        "evaluations": calls[0],
+        "success": bool(result.success),
+        "message": str(result.message),
+    }
+
+
+def optimize_structures(substrates, metals, objective="chi", **kwargs):
+    """
+    Runs optimize_design for every substrate/metal pair (the discrete part
+    of the design) and returns the results sorted from best to worst.
+    """
+    results = []
+    for substrate in substrates:
+        for metal in metals:
+            result = optimize_design(substrate, metal, objective, **kwargs)
+            results.append(result)
+            print(f"[INFO] {substrate}/{metal}: {objective} {result['start_value']:.4g} -> "
+                  f"{result['value']:.4g} in {result['evaluations']} evaluations")
+    return sorted(results, key=lambda r: -np.nan_to_num(r["value"], nan=-np.inf))
@@ -1,4 +1,8 @@
 from modes_aim import run_mode_1, run_mode_2, run_mode_3
+from modes_wim import run_mode_4
+from modes_design import run_mode_5
+from modes_analysis import run_mode_6, run_mode_7
+from modes_sensorgram import run_mode_8
 from plot_sensitive_structure import plot_figures_of_merit_comparative
 
 
@@ -7,8 +11,13 @@ def main():
     print("1 - Analyze a specific material")
     print("2 - Plot 22 reflectance curves per metal (final report requirement)")
     print("3 - Plot sensitive structure (TOPAS + d=55nm) for 3 metals (6 analytes)")
+    print("4 - Wavelength interrogation (WIM) for Ag, Au, Cu")
+    print("5 - Inverse design: optimize metal/Cr thickness and wavelength")
+    print("6 - Fabrication tolerance: Monte Carlo over thickness and index scatter")
+    print("7 - Global sensitivity: Sobol indices of thickness, indices and wavelength")
+    print("8 - Real-time sensorgram: track θres / Δn from streamed reflectance frames")
 
-    mode = input("Mode (1, 2, 3 ): ").strip()
+    mode = input("Mode (1, 2, 3, 4, 5, 6, 7, 8): ").strip()
 
     if mode == "1":
         run_mode_1()
@@ -16,6 +25,16 @@ def main():
         run_mode_2()
     elif mode == "3":
         run_mode_3()
+    elif mode == "4":
+        run_mode_4()
+    elif mode == "5":
+        run_mode_5()
+    elif mode == "6":
+        run_mode_6()
+    elif mode == "7":
+        run_mode_7()
+    elif mode == "8":
+        run_mode_8()
     else:
         print("Invalid option. Exiting program.")
 
@@ -0,0 +1,221 @@
+import numpy as np
+from optical_data import materials as materials_850nm
+
+HC_EV_NM = 1239.841984  # h*c em eV·nm
+
+# Modelos de dispersão por material (comprimento de onda em metros na API).
+#
+# Polímeros: Sellmeier de um termo (lambda em µm). PMMA e PC seguem
+# Sultanova et al. (2009); para o TOPAS o coeficiente B foi ajustado para
+# reproduzir o índice de 850 nm usado em optical_data.
+# Metais: Drude-Lorentz de Rakić et al., Appl. Opt. 37, 5271 (1998),
+# parâmetros em eV: (f, omega_j, gamma_j) por oscilador.
+# "anchor": (λ, n) corrige o modelo para passar por n em λ (anchor_index);
+# com os valores de optical_data em 850 nm os caminhos de um só comprimento
+# de onda e os dispersivos coincidem nesse ponto (os filmes finos de Cr e
+# dos metais diferem bastante dos dados de Rakić).
+REFERENCE_WAVELENGTH = 850e-9  # metros
+
+MATERIAL_MODELS = {
+    "PMMA": {"model": "sellmeier", "B": [1.1819], "C": [0.011313],
+             "anchor": (REFERENCE_WAVELENGTH, materials_850nm["PMMA"])},
+    "PC": {"model": "sellmeier", "B": [1.4182], "C": [0.021304],
+           "anchor": (REFERENCE_WAVELENGTH, materials_850nm["PC"])},
+    "TOPAS": {"model": "sellmeier", "B": [1.3884], "C": [0.0148],
+              "anchor": (REFERENCE_WAVELENGTH, materials_850nm["TOPAS"])},
+
+    "Ag": {"model": "drude_lorentz", "wp": 9.01, "f0": 0.845, "gamma0": 0.048,
+           "oscillators": [(0.065, 0.816, 3.886), (0.124, 4.481, 0.452), (0.011, 8.185, 0.065),
+                           (0.840, 9.083, 0.916), (5.646, 20.29, 2.419)],
+           "anchor": (REFERENCE_WAVELENGTH, materials_850nm["Ag"])},
+    "Au": {"model": "drude_lorentz", "wp": 9.03, "f0": 0.760, "gamma0": 0.053,
+           "oscillators": [(0.024, 0.415, 0.241), (0.010, 0.830, 0.345), (0.071, 2.969, 0.870),
+                           (0.601, 4.304, 2.494), (4.384, 13.32, 2.214)],
+           "anchor": (REFERENCE_WAVELENGTH, materials_850nm["Au"])},
+    "Cu": {"model": "drude_lorentz", "wp": 10.83, "f0": 0.575, "gamma0": 0.030,
+           "oscillators": [(0.061, 0.291, 0.378), (0.104, 2.957, 1.056), (0.723, 5.300, 3.213),
+                           (0.638, 11.18, 4.305)],
+           "anchor": (REFERENCE_WAVELENGTH, materials_850nm["Cu"])},
+    "Cr": {"model": "drude_lorentz", "wp": 10.75, "f0": 0.168, "gamma0": 0.047,
+           "oscillators": [(0.151, 0.121, 3.175), (0.150, 0.543, 1.305), (1.149, 1.970, 2.676),
+                           (0.825, 8.775, 1.335)],
+           "anchor": (REFERENCE_WAVELENGTH, materials_850nm["Cr"])},
+}
+
+TABLE_RANGE = (300e-9, 2000e-9)  # metros
+TABLE_POINTS = 34001             # passo de 0.05 nm
+INDEX_BLOCK = 16384              # comprimentos de onda por bloco em index()
+
+
+def sellmeier_index(wavelengths, B, C):
+    """n(λ) from n² = 1 + Σ B·λ²/(λ² − C), λ in µm for the coefficients."""
+    lam2 = (np.asarray(wavelengths, dtype=float) * 1e6) ** 2
+    n2 = 1 + sum(b * lam2 / (lam2 - c) for b, c in zip(B, C))
+    return np.sqrt(n2 + 0j)
+
+
+def drude_index(wavelengths, wp, gamma, eps_inf=1.0):
+    """Drude metal: ε = ε∞ − ωp² / (ω² + iγω), energies in eV."""
+    w = HC_EV_NM / (np.asarray(wavelengths, dtype=float) * 1e9)
+    eps = eps_inf - wp**2 / (w**2 + 1j * gamma * w)
+    return np.sqrt(eps)
+
+
+def drude_lorentz_index(wavelengths, wp, f0, gamma0, oscillators):
+    """
+    Drude-Lorentz metal (Rakić form):
+    ε = 1 − f0·ωp² / (ω(ω + iΓ0)) + Σ fj·ωp² / (ωj² − ω² − iωΓj), energies in eV.
+    """
+    w = HC_EV_NM / (np.asarray(wavelengths, dtype=float) * 1e9)
+    eps = 1 - f0 * wp**2 / (w * (w + 1j * gamma0))
+    for f, wj, gj in oscillators:
+        eps = eps + f * wp**2 / (wj**2 - w**2 - 1j * w * gj)
+    return np.sqrt(eps)
+
+
+def tabulated_index(wavelengths, table_wavelengths, n, k):
+    """Linear interpolation of measured n and k (wavelengths in meters)."""
+    return (np.interp(wavelengths, table_wavelengths, n)
+            + 1j * np.interp(wavelengths, table_wavelengths, k))
+
+
+def anchor_index(values, model_at_anchor, anchor):
+    """
+    Makes a dispersion model pass through a reference index: Re(ε) is
+    shifted by a constant (background permittivity) and Im(ε) scaled by a
+    constant (loss), so absorption keeps its sign and spectral shape.
+
+    Parameters:
+        values (array): Model indices to correct.
+        model_at_anchor (complex): Model index at the anchor wavelength.
+        anchor (complex): Reference index at the anchor wavelength.
+
+    Returns:
+        Corrected complex indices, equal to ``anchor`` at the anchor wavelength.
+    """
+    eps = np.asarray(values, dtype=complex) ** 2
+    eps_model, eps_anchor = complex(model_at_anchor) ** 2, complex(anchor) ** 2
+    loss_scale = eps_anchor.imag / eps_model.imag if eps_model.imag != 0 else 1.0
+    return np.sqrt((eps.real + eps_anchor.real - eps_model.real) + 1j * loss_scale * eps.imag)
+
+
+MODEL_FUNCTIONS = {
+    "sellmeier": lambda lam, p: sellmeier_index(lam, p["B"], p["C"]),
+    "drude": lambda lam, p: drude_index(lam, p["wp"], p["gamma"], p.get("eps_inf", 1.0)),
+    "drude_lorentz": lambda lam, p: drude_lorentz_index(lam, p["wp"], p["f0"], p["gamma0"], p["oscillators"]),
+    "tabulated": lambda lam, p: tabulated_index(lam, p["wavelengths"], p["n"], p["k"]),
+}
+
+
+class MaterialDatabase:
+    """
+    Dispersive refractive indices evaluated from dense precomputed tables.
+
+    Each material's model is sampled once, on first use, on a uniform grid
+    over TABLE_RANGE; afterwards n(λ) for any wavelength array is a direct
+    index computation plus linear interpolation.
+    """
+
+    def __init__(self, models=None, table_range=TABLE_RANGE, table_points=TABLE_POINTS):
+        self.models = dict(MATERIAL_MODELS if models is None else models)
+        self.lam_min, self.lam_max = table_range
+        self.table_points = table_points
+        self.step = (self.lam_max - self.lam_min) / (table_points - 1)
+        self._tables = {}
+
+    def register(self, name, model):
+        """Adds or replaces a material model (see MATERIAL_MODELS for the format)."""
+        self.models[name] = model
+        self._tables.pop(name, None)
+
+    def register_tabulated(self, name, path_or_wavelengths, n=None, k=None):
+        """
+        Registers measured data, either from arrays (wavelengths in meters)
+        or from a CSV file with columns wavelength_nm, n, k.
+        """
+        if n is None:
+            data = np.loadtxt(path_or_wavelengths, delimiter=",", skiprows=1)
+            wavelengths, n, k = data[:, 0] * 1e-9, data[:, 1], data[:, 2]
+        else:
+            wavelengths = np.asarray(path_or_wavelengths, dtype=float)
+        order = np.argsort(wavelengths)
+        self.register(name, {"model": "tabulated", "wavelengths": wavelengths[order],
+                             "n": np.asarray(n)[order], "k": np.asarray(k)[order]})
+
+    def _table(self, name):
+        table = self._tables.get(name)
+        if table is None:
+            model = self.models[name]
+            grid = np.linspace(self.lam_min, self.lam_max, self.table_points)
+            evaluate = MODEL_FUNCTIONS[model["model"]]
+            values = evaluate(grid, model).astype(complex)
+            if "anchor" in model:
+                values = anchor_index(values, evaluate(np.array(model["anchor"][0]), model), model["anchor"][1])
+            table = (values, np.diff(values))
+            self._tables[name] = table
+        return table
+
+    def index(self, name, wavelengths):
+        """Complex refractive index of ``name`` at ``wavelengths`` (meters)."""
+        wavelengths = np.asarray(wavelengths, dtype=float)
+        if wavelengths.size and (wavelengths.min() < self.lam_min or wavelengths.max() > self.lam_max):
+            raise ValueError(f"Wavelength outside the tabulated range "
+                             f"{self.lam_min * 1e9:.0f}-{self.lam_max * 1e9:.0f} nm")
+        values, slopes = self._table(name)
+
+        # Interpolação por blocos que cabem na cache, com buffers reutilizados:
+        # posição fracionária na grelha uniforme -> índice inteiro -> v + t·slope
+        flat = wavelengths.ravel()
+        result = np.empty(flat.shape, dtype=complex)
+        pos = np.empty(min(INDEX_BLOCK, flat.size))
+        i = np.empty(pos.shape, dtype=np.intp)
+        start_values = np.empty(pos.shape, dtype=complex)
+        for start in range(0, flat.size, INDEX_BLOCK):
+            stop = min(start + INDEX_BLOCK, flat.size)
+            p, ip, v, out = pos[:stop - start], i[:stop - start], start_values[:stop - start], result[start:stop]
+            np.subtract(flat[start:stop], self.lam_min, out=p)
+            p *= 1 / self.step
+            ip[...] = p
+            np.minimum(ip, self.table_points - 2, out=ip)
+            p -= ip
+            np.take(slopes, ip, out=out)
+            out *= p
+            np.take(values, ip, out=v)
+            out += v
+        return result.reshape(wavelengths.shape) if wavelengths.ndim else result[0]
+
+    def index_function(self, name):
+        """Callable n(wavelength) for use in wim_simulator's materials dict."""
+        return lambda wavelengths: self.index(name, wavelengths)
+
+    def as_materials(self, constants=None):
+        """
+        Materials dict with a callable per dispersive material, plus constant
+        entries (analytes by default) taken from optical_data.
+        """
+        if constants is None:
+            constants = {k: v for k, v in materials_850nm.items() if k.startswith("analyte")}
+        dispersive = {name: self.index_function(name) for name in self.models}
+        return {**constants, **dispersive}
+
+    def materials_at(self, wavelength, constants=None):
+        """
+        Materials dict of constant complex indices at a single wavelength
+        (meters), for the angular (AIM) code paths. Non-dispersive entries
+        (analytes by default) are taken from optical_data unchanged.
+        """
+        if constants is None:
+            constants = {k: v for k, v in materials_850nm.items() if k.startswith("analyte")}
+        dispersive = {name: complex(self.index(name, wavelength)) for name in self.models}
+        return {**constants, **dispersive}
+
+
+_default_database = None
+
+
+def get_material_database():
+    """Shared lazily-built database with the default models."""
+    global _default_database
+    if _default_database is None:
+        _default_database = MaterialDatabase()
+    return _default_database
@@ -2,16 +2,7 @@ import os
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.interpolate import CubicSpline
-from matplotlib.font_manager import FontProperties
-from plot_utils import save_figure
-
-# Font config
-try:
-    font_path = "/usr/share/fonts/truetype/msttcorefonts/Times_New_Roman.ttf"
-    TNR = FontProperties(fname=font_path) if os.path.exists(font_path) else None
-except Exception:
-    TNR = None
-    print("[WARNING] Times New Roman not found. Using default font.")
+from plot_templates import get_template
 
 # Color palette (MATLAB-like)
 color_palette = [
@@ -51,7 +42,9 @@ def plot_figures_of_merit(results, metal_thicknesses_nm, save_dir="outputs/figur
             continue
 
         has_valid_data = False
-        plt.figure(figsize=(8, 5))
+        ylabel, xlabel = titles[metric]
+        template = get_template("merit", ylabel=ylabel)
+        ax = template.ax
 
         for idx, metal in enumerate(["Ag", "Au", "Cu"]):
             key = (metal, "analyte_02")  # analyte_02 = positivo
@@ -70,44 +63,26 @@ def plot_figures_of_merit(results, metal_thicknesses_nm, save_dir="outputs/figur
             color = color_palette[idx % len(color_palette)]
 
             # Pontos pretos sobrepostos
-            plt.plot(x, y, 'ko', markersize=5, markerfacecolor='black', zorder=3)
+            ax.plot(x, y, 'ko', markersize=5, markerfacecolor='black', zorder=3)
 
             # Curva suavizada com interpolação
             if len(x) >= 4 and not np.any(np.isnan(y)):
                 spline = CubicSpline(x, y)
                 x_fine = np.linspace(min(x), max(x), 500)
                 y_smooth = spline(x_fine)
-                plt.plot(x_fine, y_smooth, linewidth=1.5, color=color, label=label, zorder=1.5)
+                template.plot_curve(x_fine, y_smooth, linewidth=1.5, color=color, label=label)
             else:
                 # Curva fallback (sem interpolação)
-                plt.plot(x, y, 'k--', linewidth=1.0, label=label, zorder=1.5)
+                ax.plot(x, y, 'k--', linewidth=1.0, label=label, zorder=1.5)
 
         if has_valid_data:
-            ylabel, xlabel = titles[metric]
-
             # Remove duplicações da legenda
-            handles, labels = plt.gca().get_legend_handles_labels()
+            handles, labels = ax.get_legend_handles_labels()
             by_label = dict(zip(labels, handles))
-
-            if TNR:
-                plt.xlabel(xlabel, fontsize=14, fontproperties=TNR)
-                plt.ylabel(ylabel, fontsize=14, fontproperties=TNR)
-                plt.xticks(fontsize=12, fontproperties=TNR)
-                plt.yticks(fontsize=12, fontproperties=TNR)
-                plt.legend(by_label.values(), by_label.keys(), fontsize=10, loc="best", prop=TNR)
-            else:
-                plt.xlabel(xlabel, fontsize=14)
-                plt.ylabel(ylabel, fontsize=14)
-                plt.xticks(fontsize=12)
-                plt.yticks(fontsize=12)
-                plt.legend(by_label.values(), by_label.keys(), fontsize=10, loc="best")
-
-            plt.grid(True)
-            plt.tight_layout()
+            template.legend(by_label.values(), by_label.keys(), fontsize=10, loc="best")
 
             fname = os.path.join(save_dir, metric)
-            save_figure(fname)
+            template.save(fname)
             plt.show()
-            plt.close()
         else:
             print(f"[INFO] Skipping plot for {metric}: no valid data to display.")
@@ -1,6 +1,7 @@
 from user_input import select_materials
 from fresnel_utils import getFresnelAIM
-from reflectance_simulator import run_reflectance_simulation
+from reflectance_simulator import plot_reflectance_family, name_map
+from sweep_scheduler import run_sweep_parallel
 from calculate_figures import calculate_all_figures_of_merit
 from merit_figures_plot import plot_figures_of_merit
 from save_results import save_results_to_csv
@@ -9,11 +10,53 @@ from plot_sensitive_structure import plot_figures_of_merit_comparative
 from plot_style import apply_plot_style
 from plot_sensitive_structure import plot_angular_response_for_sensitive_structure_and_export_csv
 from optical_data import materials
+from result_cache import get_default_cache
+from render_pipeline import FigureRenderer
+from results_export import export_results, EXTENSIONS
+from instrumentation import run_report, stage
 from simulation_config import (
     lambda0, theta_deg, theta_rad,
-    d_cr, d_analyte, metal_thicknesses_nm, analytes
+    d_cr, d_analyte, metal_thicknesses_nm, analytes,
+    display_figures, figure_formats, figure_rasterize, figure_max_points, sweep_workers,
+    results_export, report_dir, profile_runs
 )
 
+def simulate_metals(substrate, metals, analyte_names, renderer, cache=None):
+    """
+    Runs every metal/analyte/thickness of a mode as one scheduled sweep
+    (sweep_scheduler), queues the per-analyte reflectance figures on
+    ``renderer`` and adds the figure-of-merit columns. With
+    simulation_config.results_export set, the curves and metrics are also
+    written to outputs/results/.
+
+    Returns:
+        results_store.ResultsStore for ``substrate``.
+    """
+    with stage("sweep"):
+        store = run_sweep_parallel(
+            [substrate], metals, analyte_names, materials, lambda0,
+            theta_deg, theta_rad, d_cr, metal_thicknesses_nm,
+            workers=sweep_workers, cache=cache
+        )
+
+    for metal in metals:
+        for analyte in analyte_names:
+            label_analyte = name_map.get(analyte, analyte)
+            base = f"figures/reflectance_{substrate.lower()}_{metal.lower()}_{label_analyte.lower()}"
+            renderer.submit(plot_reflectance_family, theta_deg, store.curves(metal=metal, analyte=analyte)[0],
+                            store.column("theta_res", metal=metal, analyte=analyte)[0],
+                            metal_thicknesses_nm, base, show=renderer.display)
+    with stage("figures_of_merit"):
+        calculate_all_figures_of_merit(store, materials)
+
+    if results_export:
+        path = f"outputs/results/results_{substrate.lower()}{EXTENSIONS[results_export]}"
+        with stage("export"):
+            export_results(store, path, fmt=results_export)
+
+    return store
+
+
 def run_mode_1():
     """
     Mode 1: User selects a substrate; simulator compares Ag, Au, Cu
@@ -41,39 +84,20 @@ def run_mode_1():
         "analyte_02": analytes["analyte_02"]   # positive
     }
 
-    results = {
-        "theta_deg": theta_deg,
-        "substrate": substrate,
-        "theta_res": {},
-        "fwhm": {},
-        "reflectance": {},
-    }
-
-    for metal in ["Ag", "Au", "Cu"]:
-        res = run_reflectance_simulation(
-            substrate, metal, analyte,
-            materials, lambda0, theta_deg, theta_rad,
-            d_cr, d_analyte, metal_thicknesses_nm
-        )
+    cache = get_default_cache()
+    with run_report("mode_1", report_dir, cache, profile_runs, substrate=substrate):
+        with FigureRenderer(formats=figure_formats, display=display_figures,
+                            rasterize=figure_rasterize, max_points=figure_max_points) as renderer:
+            store = simulate_metals(substrate, ["Ag", "Au", "Cu"], list(analyte), renderer, cache)
+            results = store.substrate_results(substrate)
 
-        results["reflectance"].update(res["reflectance"])
-        results["theta_res"].update(res["theta_res"])
-        results["fwhm"].update(res["fwhm"])
+            renderer.submit(plot_figures_of_merit, results, metal_thicknesses_nm)
 
-        calculate_all_figures_of_merit(res, materials, metal)
-
-        for key in [
-            "sensitivity_theoretical", "chi_theoretical", "q_theoretical"
-        ]:
-            if key in res:
-                if key not in results:
-                    results[key] = {}
-                results[key].update(res[key])
-
-    plot_figures_of_merit(results, metal_thicknesses_nm)
-    
-    # ⚠️ Corrigido: passa o dicionário de analytes corretamente
-    save_results_to_csv(results, metal_thicknesses_nm, analyte)
+            # ⚠️ Corrigido: passa o dicionário de analytes corretamente
+            with stage("csv"):
+                save_results_to_csv(results, metal_thicknesses_nm, analyte)
+    if cache:
+        cache.report()
 
 
 def run_mode_2():
@@ -86,75 +110,43 @@ def run_mode_2():
 
     analytes_22 = ["analyte_01", "analyte_02"]
 
-    results = {
-        "theta_deg": theta_deg,
-        "substrate": substrate,
-        "theta_res": {},
-        "fwhm": {},
-        "reflectance": {},
-        "sensitivity": {},
-        "chi": {},
-        "Q": {},
-    }
+    cache = get_default_cache()
+    with run_report("mode_2", report_dir, cache, profile_runs, substrate=substrate):
+        with FigureRenderer(formats=figure_formats, display=display_figures,
+                            rasterize=figure_rasterize, max_points=figure_max_points) as renderer:
+            store = simulate_metals(substrate, ["Ag", "Au", "Cu"], analytes_22, renderer, cache)
+            results = store.substrate_results(substrate)
 
-    for metal in ["Ag", "Au", "Cu"]:
-        res = run_reflectance_simulation(
-            substrate, metal, analytes_22,
-            materials, lambda0, theta_deg, theta_rad,
-            d_cr, d_analyte, metal_thicknesses_nm
-        )
-
-        results["reflectance"].update(res["reflectance"])
-        results["theta_res"].update(res["theta_res"])
-        results["fwhm"].update(res["fwhm"])
-
-        calculate_all_figures_of_merit(res, materials, metal)
-
-        for key in ["sensitivity_empirical", "chi_empirical", "q_empirical",
-                    "sensitivity_theoretical", "chi_theoretical", "q_theoretical"]:
-            if key in res:
-                if key not in results:
-                    results[key] = {}
-                results[key].update(res[key])
-
-    plot_reflectance_22_curves(results, metal_thicknesses_nm, figures=results)
+            renderer.submit(plot_reflectance_22_curves, results, metal_thicknesses_nm, figures=results)
+    if cache:
+        cache.report()
 
 
 def run_mode_3():
     print("\n[MODE 3] Plotting sensitive structures (TOPAS + d=55nm) for Ag, Au, Cu")
 
     substrate = "TOPAS"
-    analytes_22 = ["analyte_01", "analyte_02"]
+    # Só o analyte positivo: a sensibilidade analítica dispensa o segundo varrimento
+    analytes_22 = ["analyte_02"]
     metals = ["Ag", "Au", "Cu"]
 
-    results = {
-        "theta_deg": theta_deg,
-        "substrate": substrate,
-        "theta_res": {},
-        "fwhm": {},
-        "reflectance": {},
-    }
-
-    for metal in metals:
-        res = run_reflectance_simulation(
-            substrate, metal, analytes_22,
-            materials, lambda0, theta_deg, theta_rad,
-            d_cr, d_analyte, metal_thicknesses_nm
-        )
-
-        results["reflectance"].update(res["reflectance"])
-        results["theta_res"].update(res["theta_res"])
-        results["fwhm"].update(res["fwhm"])
-
-        calculate_all_figures_of_merit(res, materials, metal)
-
-        for key in [
-            "sensitivity_empirical", "chi_empirical", "q_empirical",
-            "sensitivity_theoretical", "chi_theoretical", "q_theoretical"
-        ]:
-            if key in res:
-                if key not in results:
-                    results[key] = {}
-                results[key].update(res[key])
-
-    plot_figures_of_merit_comparative(results, metal_thicknesses_nm, save_dir="outputs/sensitive_structure")
+    cache = get_default_cache()
+    with run_report("mode_3", report_dir, cache, profile_runs, substrate=substrate):
+        with FigureRenderer(formats=figure_formats, display=display_figures,
+                            rasterize=figure_rasterize, max_points=figure_max_points) as renderer:
+            store = simulate_metals(substrate, metals, analytes_22, renderer, cache)
+
+            # Uma tabela por metal (analyte_02 = positivo), no formato do gráfico comparativo
+            columns = {"theta_res": "theta_res", "fwhm": "fwhm",
+                       "sensitivity_analytic": "sensitivity_analytic",
+                       "sensitivity_theoretical": "sensitivity_theoretical",
+                       "chi": "chi_analytic", "Q": "q_empirical"}
+            comparative = {
+                metal: {label: store.column(name, substrate=substrate, metal=metal, analyte="analyte_02")
+                        for label, name in columns.items()}
+                for metal in metals
+            }
+            renderer.submit(plot_figures_of_merit_comparative, comparative, metal_thicknesses_nm,
+                            save_dir="outputs/sensitive_structure")
+    if cache:
+        cache.report()
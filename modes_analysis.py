@@ -0,0 +1,206 @@
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from tolerance_analysis import run_tolerance_analysis, TOLERANCE_METRICS, METRIC_UNITS, PARAMETERS
+from sobol_analysis import run_sobol_analysis
+from plot_style import apply_plot_style
+from plot_utils import save_figure
+from render_pipeline import FigureRenderer
+from instrumentation import run_report, stage
+from simulation_config import (
+    fabrication_tolerances, tolerance_samples, tolerance_seed, sweep_workers,
+    sobol_ranges, sobol_base_samples, sobol_seed,
+    display_figures, figure_formats, figure_rasterize, figure_max_points,
+    report_dir, profile_runs
+)
+
+HISTOGRAM_LABELS = {
+    "theta_res": "θres (°)",
+    "fwhm": "FWHM (°)",
+    "sensitivity": "Sensitivity (°/RIU)",
+    "chi": "χ (1/RIU)",
+}
+
+
+def plot_tolerance_histograms(metrics, nominal_metrics, filename_base, show=False, bins=80):
+    """
+    Histograms of theta_res, FWHM, sensitivity and chi over the Monte Carlo
+    designs, with the nominal value marked.
+    """
+    fig, axes = plt.subplots(2, 2, figsize=(10, 7))
+    for ax, (name, label) in zip(axes.ravel(), HISTOGRAM_LABELS.items()):
+        values = metrics[name][np.isfinite(metrics[name])]
+        ax.hist(values, bins=bins, color="#1f77b4")
+        ax.axvline(nominal_metrics[name], color="k", linestyle="--", linewidth=1.2, label="nominal")
+        ax.set_xlabel(label)
+        ax.set_ylabel("Count")
+    axes[0, 0].legend(fontsize=9, loc="best")
+    fig.tight_layout()
+    save_figure(filename_base, fig=fig, show=show)
+
+
+def plot_sobol_indices(parameters, indices, filename_base, show=False, metrics=("theta_res", "chi")):
+    """
+    First-order and total Sobol indices (with their confidence intervals)
+    of every input, one panel per metric.
+    """
+    fig, axes = plt.subplots(1, len(metrics), figsize=(6 * len(metrics), 5), squeeze=False)
+    x = np.arange(len(parameters))
+    width = 0.38
+    for ax, name in zip(axes[0], metrics):
+        ix = indices[name]
+        for offset, key, label, color in ((-width / 2, "first", "First order", "#1f77b4"),
+                                          (width / 2, "total", "Total", "#d62728")):
+            ci = ix[f"{key}_ci"]
+            err = np.abs(np.vstack([ix[key] - ci[:, 0], ci[:, 1] - ix[key]]))
+            ax.bar(x + offset, ix[key], width, yerr=err, capsize=3, color=color, label=label)
+        ax.set_xticks(x)
+        ax.set_xticklabels(parameters, rotation=30, ha="right")
+        ax.set_ylim(0, 1.05)
+        ax.set_ylabel("Sobol index")
+        ax.set_title(HISTOGRAM_LABELS[name])
+    axes[0, 0].legend(fontsize=9, loc="best")
+    fig.tight_layout()
+    save_figure(filename_base, fig=fig, show=show)
+
+
+def run_mode_6():
+    print("\n[MODE 6] Fabrication tolerance (Monte Carlo)")
+
+    substrate = input("Select substrate (PMMA, PC, TOPAS): ").strip().upper()
+    if substrate not in {"PMMA", "PC", "TOPAS"}:
+        raise ValueError("Invalid substrate.")
+    metal = input("Select metal (Ag, Au, Cu): ").strip().capitalize()
+    if metal not in {"Ag", "Au", "Cu"}:
+        raise ValueError("Invalid metal.")
+
+    n_input = input(f"Number of samples [{tolerance_samples}]: ").strip()
+    try:
+        n_samples = int(n_input) if n_input else tolerance_samples
+    except ValueError:
+        print("[ERROR] Invalid number of samples.")
+        return
+
+    for name, (kind, width) in fabrication_tolerances.items():
+        print(f"[INFO] {name}: {kind} ({'±' if kind == 'uniform' else 'σ = '}{width})")
+
+    apply_plot_style()
+    save_dir = "outputs/tolerance"
+    os.makedirs(save_dir, exist_ok=True)
+    base = os.path.join(save_dir, f"tolerance_{substrate.lower()}_{metal.lower()}")
+    with run_report("mode_6", report_dir, profile=profile_runs, substrate=substrate, metal=metal,
+                    n_samples=n_samples, seed=tolerance_seed):
+        with stage("monte_carlo"):
+            result = run_tolerance_analysis(substrate, metal, n_samples, workers=sweep_workers)
+
+        if result["flagged"]:
+            print(f"[WARNING] {result['flagged']} of {n_samples} designs have a flagged theta_res "
+                  f"(dip at the window edge, too shallow or not finite); they are left out of the summary.")
+
+        rows = []
+        for name in TOLERANCE_METRICS:
+            stats = result["summary"][name]
+            rows.append({
+                "Metric": name,
+                "Unit": METRIC_UNITS[name],
+                "Nominal": result["nominal_metrics"][name],
+                "Mean": stats["mean"],
+                "Std": stats["std"],
+                "P2_5": stats["p2_5"],
+                "P50": stats["p50"],
+                "P97_5": stats["p97_5"],
+                "Min": stats["min"],
+                "Max": stats["max"],
+                "Valid_Samples": stats["n"],
+            })
+            print(f"[INFO] {name}: nominal {result['nominal_metrics'][name]:.4g}, "
+                  f"mean {stats['mean']:.4g} ± {stats['std']:.2g} {METRIC_UNITS[name]}")
+
+        with stage("csv"):
+            pd.DataFrame(rows).to_csv(f"{base}_summary.csv", index=False)
+            np.savez_compressed(
+                f"{base}_samples.npz", seed=result["seed"],
+                **{name: result["samples"][name] for name in PARAMETERS},
+                **result["metrics"]
+            )
+        print(f"[INFO] Results saved to: {base}_summary.csv and {base}_samples.npz")
+
+        with FigureRenderer(formats=figure_formats, display=display_figures,
+                            rasterize=figure_rasterize, max_points=figure_max_points) as renderer:
+            renderer.submit(plot_tolerance_histograms, result["metrics"], result["nominal_metrics"],
+                            f"{base}_histograms", show=renderer.display)
+
+
+def run_mode_7():
+    print("\n[MODE 7] Global sensitivity analysis (Sobol/Saltelli)")
+
+    substrate = input("Select substrate (PMMA, PC, TOPAS): ").strip().upper()
+    if substrate not in {"PMMA", "PC", "TOPAS"}:
+        raise ValueError("Invalid substrate.")
+    metal = input("Select metal (Ag, Au, Cu): ").strip().capitalize()
+    if metal not in {"Ag", "Au", "Cu"}:
+        raise ValueError("Invalid metal.")
+
+    n_input = input(f"Base samples N, ideally a power of two [{sobol_base_samples}]: ").strip()
+    try:
+        n_base = int(n_input) if n_input else sobol_base_samples
+    except ValueError:
+        print("[ERROR] Invalid number of samples.")
+        return
+
+    k = sum(1 for width in sobol_ranges.values() if width)
+    print(f"[INFO] {k} inputs (± {', '.join(f'{name} {width:g}' for name, width in sobol_ranges.items())}); "
+          f"{n_base * (2 * k + 2)} designs")
+
+    apply_plot_style()
+    save_dir = "outputs/sobol"
+    os.makedirs(save_dir, exist_ok=True)
+    base = os.path.join(save_dir, f"sobol_{substrate.lower()}_{metal.lower()}")
+    with run_report("mode_7", report_dir, profile=profile_runs, substrate=substrate, metal=metal,
+                    n_base=n_base, seed=sobol_seed):
+        with stage("sobol"):
+            result = run_sobol_analysis(substrate, metal, n_base, workers=sweep_workers)
+
+        if result["dropped"]:
+            print(f"[WARNING] {result['dropped']} of {n_base} base samples have a flagged theta_res "
+                  f"in one of their designs; they are left out of the indices.")
+
+        rows = []
+        for name in TOLERANCE_METRICS:
+            ix = result["indices"][name]
+            for i, parameter in enumerate(result["parameters"]):
+                rows.append({
+                    "Metric": name,
+                    "Parameter": parameter,
+                    "Low": result["bounds"][i, 0],
+                    "High": result["bounds"][i, 1],
+                    "S1": ix["first"][i],
+                    "S1_CI_Low": ix["first_ci"][i, 0],
+                    "S1_CI_High": ix["first_ci"][i, 1],
+                    "ST": ix["total"][i],
+                    "ST_CI_Low": ix["total_ci"][i, 0],
+                    "ST_CI_High": ix["total_ci"][i, 1],
+                    "Base_Samples_Used": ix["n"],
+                })
+
+        for name in ("theta_res", "chi"):
+            ix = result["indices"][name]
+            ranking = sorted(zip(result["parameters"], ix["total"]), key=lambda item: -item[1])
+            print(f"[INFO] {name}: " + ", ".join(f"{parameter} ST = {st:.3f}" for parameter, st in ranking))
+
+        with stage("csv"):
+            pd.DataFrame(rows).to_csv(f"{base}_indices.csv", index=False)
+            np.savez_compressed(
+                f"{base}_design.npz", seed=result["seed"],
+                parameters=np.array(result["parameters"]), bounds=result["bounds"],
+                **{name: result["samples"][name] for name in PARAMETERS},
+                **result["metrics"],
+                **{f"second_order_{name}": result["indices"][name]["second"] for name in TOLERANCE_METRICS}
+            )
+        print(f"[INFO] Results saved to: {base}_indices.csv and {base}_design.npz")
+
+        with FigureRenderer(formats=figure_formats, display=display_figures,
+                            rasterize=figure_rasterize, max_points=figure_max_points) as renderer:
+            renderer.submit(plot_sobol_indices, result["parameters"], result["indices"],
+                            f"{base}_indices", show=renderer.display)
@@ -0,0 +1,62 @@
+import os
+import pandas as pd
+from inverse_design import optimize_structures, OBJECTIVES, VARIABLES
+from instrumentation import run_report, stage
+from simulation_config import report_dir, profile_runs
+
+SUBSTRATES = ["PMMA", "PC", "TOPAS"]
+METALS = ["Ag", "Au", "Cu"]
+
+
+def run_mode_5():
+    print("\n[MODE 5] Inverse design of the sensing stack")
+    print(f"Design variables: {', '.join(VARIABLES)} (bounds in inverse_design.DEFAULT_BOUNDS)")
+
+    objective = input(f"Objective ({', '.join(OBJECTIVES)}) [chi]: ").strip().lower() or "chi"
+    if objective not in OBJECTIVES:
+        print("[ERROR] Invalid objective.")
+        return
+
+    # chi e Q sozinhos preferem vales rasos (metal espesso): limite de profundidade opcional
+    limit = input("Maximum reflectance at the dip, e.g. 0.05 (empty: no limit): ").strip()
+    try:
+        max_r_min = float(limit) if limit else None
+    except ValueError:
+        print("[ERROR] Invalid reflectance limit.")
+        return
+
+    save_dir = "outputs/inverse_design"
+    os.makedirs(save_dir, exist_ok=True)
+    with run_report("mode_5", report_dir, profile=profile_runs, objective=objective, max_r_min=max_r_min):
+        with stage("optimization"):
+            results = optimize_structures(SUBSTRATES, METALS, objective, max_r_min=max_r_min)
+
+        rows = []
+        for r in results:
+            m = r["metrics"]
+            rows.append({
+                "Substrate": r["substrate"],
+                "Metal": r["metal"],
+                "Metal_Thickness_nm": r["design"]["metal_thickness_nm"],
+                "Cr_Thickness_nm": r["design"]["cr_thickness_nm"],
+                "Wavelength_nm": r["design"]["wavelength_nm"],
+                "Theta_res_deg": m["theta_res"],
+                "FWHM_deg": m["fwhm"],
+                "R_min": m["r_min"],
+                "Sensitivity_deg_per_RIU": m["sensitivity"],
+                "Chi": m["chi"],
+                "Q": m["q"],
+                "Weighted_Sensitivity": m["weighted_sensitivity"],
+                "Start_Value": r["start_value"],
+                "Evaluations": r["evaluations"],
+                "Converged": r["success"],
+            })
+
+        best = results[0]
+        print(f"[INFO] Best {objective}: {best['value']:.4g} with {best['substrate']}/{best['metal']}, "
+              + ", ".join(f"{k} = {v:.2f}" for k, v in best["design"].items()))
+
+        csv_path = os.path.join(save_dir, f"designs_{objective}.csv")
+        with stage("csv"):
+            pd.DataFrame(rows).to_csv(csv_path, index=False)
+        print(f"[INFO] Results saved to: {csv_path}")
@@ -0,0 +1,120 @@
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from sensorgram import (
+    SensorgramTracker, calibration_curve, simulated_frames, file_frames, track_frames
+)
+from plot_style import apply_plot_style
+from plot_utils import save_figure
+from render_pipeline import FigureRenderer
+from instrumentation import run_report, stage
+from simulation_config import (
+    analytes, sensorgram_theta_deg, sensorgram_frames, sensorgram_frame_period_s,
+    sensorgram_noise, sensorgram_metal_nm, sensorgram_calibration_range,
+    display_figures, figure_formats, figure_rasterize, figure_max_points,
+    report_dir, profile_runs
+)
+
+
+def binding_series(n_frames, n_baseline, n_bound, tau_frames):
+    """
+    Analyte index of a simulated binding experiment: baseline, association
+    towards ``n_bound`` from 20 % of the run and dissociation from 70 %,
+    both exponential with time constant ``tau_frames``.
+    """
+    k = np.arange(n_frames)
+    on, off = int(0.2 * n_frames), int(0.7 * n_frames)
+    bound = 1 - np.exp(-np.clip(k - on, 0, None) / tau_frames)
+    bound_off = (1 - np.exp(-(off - on) / tau_frames)) * np.exp(-np.clip(k - off, 0, None) / tau_frames)
+    fraction = np.where(k < on, 0.0, np.where(k < off, bound, bound_off))
+    return n_baseline + (n_bound - n_baseline) * fraction
+
+
+def plot_sensorgram(sensorgram, n_true, filename_base, show=False):
+    """θres(t) and Δn(t) of a tracked run (true Δn overlaid for simulated runs)."""
+    fig, (ax_theta, ax_n) = plt.subplots(2, 1, figsize=(10, 7), sharex=True)
+    t = sensorgram["time"]
+    ax_theta.plot(t, sensorgram["theta_res"], color="#1f77b4", linewidth=0.8)
+    ax_theta.set_ylabel("θres (°)")
+    ax_n.plot(t, sensorgram["delta_n"], color="#1f77b4", linewidth=0.8, label="tracked")
+    if n_true is not None:
+        ax_n.plot(t, n_true - n_true[0], color="k", linestyle="--", linewidth=1.0, label="simulated")
+        ax_n.legend(fontsize=9, loc="best")
+    ax_n.set_ylabel("Δn (RIU)")
+    ax_n.set_xlabel("Time (s)")
+    fig.tight_layout()
+    save_figure(filename_base, fig=fig, show=show)
+
+
+def run_mode_8():
+    print("\n[MODE 8] Real-time sensorgram (streaming θres / Δn)")
+
+    substrate = input("Select substrate (PMMA, PC, TOPAS): ").strip().upper()
+    if substrate not in {"PMMA", "PC", "TOPAS"}:
+        raise ValueError("Invalid substrate.")
+    metal = input("Select metal (Ag, Au, Cu): ").strip().capitalize()
+    if metal not in {"Ag", "Au", "Cu"}:
+        raise ValueError("Invalid metal.")
+
+    n_pixels = len(sensorgram_theta_deg)
+    path = input(f"Raw frame file ({n_pixels} float64 per frame; empty: simulated binding run): ").strip()
+    if path and not os.path.isfile(path):
+        print(f"[ERROR] File not found: {path}")
+        return
+
+    apply_plot_style()
+    save_dir = "outputs/sensorgram"
+    os.makedirs(save_dir, exist_ok=True)
+    base = os.path.join(save_dir, f"sensorgram_{substrate.lower()}_{metal.lower()}")
+    with run_report("mode_8", report_dir, profile=profile_runs, substrate=substrate, metal=metal,
+                    source=path or "simulated"):
+        with stage("calibration"):
+            calibration = calibration_curve(substrate, metal, sensorgram_metal_nm, sensorgram_theta_deg,
+                                            sensorgram_calibration_range)
+
+        if path:
+            n_true = None
+            frames = file_frames(path, n_pixels)
+            capacity = max(1, os.path.getsize(path) // (8 * n_pixels))
+        else:
+            n_true = binding_series(sensorgram_frames, analytes["analyte_02"], analytes["analyte_01"],
+                                    tau_frames=0.05 * sensorgram_frames)
+            frames = simulated_frames(substrate, metal, n_true, sensorgram_metal_nm, sensorgram_theta_deg,
+                                      noise=sensorgram_noise)
+            capacity = sensorgram_frames
+
+        tracker = SensorgramTracker(sensorgram_theta_deg, calibration, capacity=capacity)
+        for _ in track_frames(frames, tracker, sensorgram_frame_period_s):
+            pass
+        sensorgram = tracker.sensorgram()
+        if n_true is not None:
+            n_true = n_true[:len(sensorgram["time"])]
+
+        latency = tracker.latency_summary()
+        print(f"[INFO] {tracker.frames} frames tracked; per-frame latency median {latency['median_us']:.0f} µs, "
+              f"p99 {latency['p99_us']:.0f} µs ({1e6 / latency['median_us']:.0f} frames/s)")
+        flagged = np.count_nonzero(sensorgram["status"])
+        if flagged:
+            print(f"[WARNING] {flagged} frames have a flagged theta_res (see the Status column).")
+        if n_true is not None:
+            error = sensorgram["n_analyte"] - n_true
+            print(f"[INFO] n_analyte error vs simulated: rms {np.sqrt(np.nanmean(error**2)):.2e} RIU")
+
+        with stage("csv"):
+            table = {
+                "Time_s": sensorgram["time"],
+                "Theta_res_deg": sensorgram["theta_res"],
+                "N_Analyte": sensorgram["n_analyte"],
+                "Delta_n": sensorgram["delta_n"],
+                "Status": sensorgram["status"],
+                "Latency_us": sensorgram["latency_s"] * 1e6,
+            }
+            if n_true is not None:
+                table["N_Analyte_Simulated"] = n_true
+            pd.DataFrame(table).to_csv(f"{base}.csv", index=False)
+        print(f"[INFO] Results saved to: {base}.csv")
+
+        with FigureRenderer(formats=figure_formats, display=display_figures,
+                            rasterize=figure_rasterize, max_points=figure_max_points) as renderer:
+            renderer.submit(plot_sensorgram, sensorgram, n_true, base, show=renderer.display)
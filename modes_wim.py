@@ -0,0 +1,91 @@
+import os
+import numpy as np
+import pandas as pd
+from wim_simulator import run_wim_simulation, calculate_wim_figures_of_merit
+from plot_style import apply_plot_style
+from plot_templates import get_template
+from material_database import get_material_database
+from render_pipeline import FigureRenderer
+from instrumentation import run_report, stage
+from simulation_config import (
+    theta_wim_deg, wavelengths_wim, d_cr, metal_thicknesses_nm, analytes,
+    display_figures, figure_formats, figure_rasterize, figure_max_points,
+    report_dir, profile_runs
+)
+
+GROUP_LABELS = {"analyte_01": "negative", "analyte_02": "positive"}
+GROUP_COLORS = {"analyte_01": "#1f77b4", "analyte_02": "#d62728"}
+
+
+def plot_wim_reflectance(results, metal, save_dir):
+    template = get_template("wim_reflectance")
+    ax = template.ax
+    wavelength_nm = results["wavelength_nm"]
+
+    for analyte in ["analyte_01", "analyte_02"]:
+        key = (metal, analyte)
+        for i, Rp in enumerate(results["reflectance"].get(key, [])):
+            template.plot_curve(wavelength_nm, Rp, color=GROUP_COLORS[analyte], linewidth=1.5,
+                                label=GROUP_LABELS[analyte] if i == 0 else None)
+            lambda_res = results["lambda_res"][key][i]
+            if not np.isnan(lambda_res):
+                ax.plot(lambda_res, np.interp(lambda_res, wavelength_nm, Rp),
+                        'ko', markersize=5, markerfacecolor='black', zorder=3)
+
+    template.legend(fontsize=10, loc="best")
+
+    fname = os.path.join(save_dir, f"wim_reflectance_{results['substrate'].lower()}_{metal.lower()}")
+    template.save(fname)
+
+
+def run_mode_4():
+    print("\n[MODE 4] Wavelength interrogation (WIM)")
+
+    substrate = input("Select substrate (PMMA, PC, TOPAS): ").strip().upper()
+    if substrate not in {"PMMA", "PC", "TOPAS"}:
+        raise ValueError("Invalid substrate.")
+
+    theta_default = theta_wim_deg[substrate]
+    theta_input = input(f"Incidence angle in degrees [{theta_default}]: ").strip()
+    theta = float(theta_input) if theta_input else theta_default
+    print(f"[INFO] WIM at θ = {theta}°")
+
+    apply_plot_style()
+    materials = get_material_database().as_materials()
+    save_dir = "outputs/wim"
+    os.makedirs(save_dir, exist_ok=True)
+    with run_report("mode_4", report_dir, profile=profile_runs, substrate=substrate, theta_deg=theta):
+        with FigureRenderer(formats=figure_formats, display=display_figures,
+                            rasterize=figure_rasterize, max_points=figure_max_points) as renderer:
+            rows = []
+
+            for metal in ["Ag", "Au", "Cu"]:
+                with stage("wim_simulation"):
+                    res = run_wim_simulation(substrate, metal, analytes, materials, theta,
+                                             wavelengths_wim, d_cr, metal_thicknesses_nm)
+                    calculate_wim_figures_of_merit(res, materials, metal)
+                renderer.submit(plot_wim_reflectance, res, metal, save_dir)
+
+                for analyte in analytes:
+                    key = (metal, analyte)
+                    for i, thickness in enumerate(metal_thicknesses_nm):
+                        rows.append({
+                            "Metal": metal,
+                            "Analyte": analyte,
+                            "Metal_Thickness_nm": thickness,
+                            "Lambda_res_nm": res["lambda_res"][key][i],
+                            "FWHM_nm": res["fwhm"][key][i],
+                            "Sensitivity_nm_per_RIU": res["sensitivity_empirical"][metal][i],
+                            "Chi_Empirical": res["chi_empirical"][key][i],
+                            "Q_Empirical": res["q_empirical"][key][i],
+                        })
+
+            if all(np.isnan(row["Lambda_res_nm"]) for row in rows):
+                print(f"[ERROR] No resonance inside the spectral window for {substrate} at θ = {theta}°; "
+                      f"choose another angle. No results written.")
+                return
+
+            csv_path = os.path.join(save_dir, f"results_wim_{substrate.lower()}.csv")
+            with stage("csv"):
+                pd.DataFrame(rows).to_csv(csv_path, index=False)
+            print(f"[INFO] Results saved to: {csv_path}")
@@ -0,0 +1,105 @@
+import numpy as np
+from fresnel_backend import getFresnelAIM_batch
+from result_cache import make_cache_key
+
+GRID_DIMS = ("substrate", "metal", "d_cr", "metal_thickness_nm", "analyte", "theta_deg")
+
+
+def _analyte_coords(analytes, materials):
+    """
+    Accepts a dict {name: index}, a list of names from ``materials`` or a
+    list of plain refractive indices and returns (labels, indices).
+    """
+    if isinstance(analytes, dict):
+        return list(analytes.keys()), [analytes[a] for a in analytes]
+
+    labels, values = [], []
+    for a in analytes:
+        if isinstance(a, str):
+            labels.append(a)
+            values.append(materials[a])
+        else:
+            labels.append(float(np.real(a)))
+            values.append(a)
+    return labels, values
+
+
+def run_parameter_grid(substrates, metals, d_cr_values, metal_thicknesses_nm,
+                       analytes, materials, lambda0, theta_rad, cache=None):
+    """
+    Evaluates the reflectance of every substrate/Cr/metal/analyte stack of
+    the Cartesian product in a single broadcast Fresnel computation.
+
+    Parameters:
+        substrates (list): Substrate names (keys of ``materials``).
+        metals (list): Metal names (keys of ``materials``).
+        d_cr_values (array): Cr adhesion-layer thicknesses in meters.
+        metal_thicknesses_nm (array): Metal thicknesses in nanometers.
+        analytes (dict | list): Analyte names or refractive indices.
+        materials (dict): Refractive index table (see optical_data).
+        lambda0 (float): Wavelength in meters.
+        theta_rad (array): Incidence angles in radians.
+        cache (ReflectanceCache): Optional on-disk cache for the curves.
+
+    Returns:
+        dict with keys:
+            "dims": names of the reflectance axes (GRID_DIMS),
+            "coords": {dim: labels along that axis},
+            "reflectance": Rp array of shape
+                (substrate, metal, d_cr, metal_thickness, analyte, angle).
+    """
+    substrates = list(substrates)
+    metals = list(metals)
+    d_cr_values = np.atleast_1d(np.asarray(d_cr_values, dtype=float))
+    metal_thicknesses_nm = np.atleast_1d(np.asarray(metal_thicknesses_nm, dtype=float))
+    analyte_labels, analyte_n = _analyte_coords(analytes, materials)
+
+    S, M, N = len(substrates), len(metals), len(analyte_labels)
+    C, T = len(d_cr_values), len(metal_thicknesses_nm)
+
+    # Índices: (S, M, 1, 1, N, 4) -- não dependem das espessuras
+    n = np.empty((S, M, 1, 1, N, 4), dtype=complex)
+    n[..., 0] = np.array([materials[s] for s in substrates])[:, None, None, None, None]
+    n[..., 1] = materials["Cr"]
+    n[..., 2] = np.array([materials[m] for m in metals])[None, :, None, None, None]
+    n[..., 3] = np.array(analyte_n, dtype=complex)[None, None, None, None, :]
+
+    # Espessuras: (1, 1, C, T, 1, 2)
+    d = np.empty((1, 1, C, T, 1, 2))
+    d[..., 0] = d_cr_values[:, None, None]
+    d[..., 1] = metal_thicknesses_nm[None, :, None] * 1e-9
+
+    if cache is None:
+        Rp = getFresnelAIM_batch(n, d, theta_rad, lambda0)[2]
+    else:
+        key = make_cache_key("grid", n, d, lambda0, theta_rad)
+        Rp = cache.cached(key, lambda: {"reflectance": getFresnelAIM_batch(n, d, theta_rad, lambda0)[2]})["reflectance"]
+
+    return {
+        "dims": GRID_DIMS,
+        "coords": {
+            "substrate": substrates,
+            "metal": metals,
+            "d_cr": d_cr_values,
+            "metal_thickness_nm": metal_thicknesses_nm,
+            "analyte": analyte_labels,
+            "theta_deg": np.degrees(theta_rad),
+        },
+        "reflectance": Rp,
+    }
+
+
+def select_grid(grid, **labels):
+    """
+    Label-based selection on a grid returned by run_parameter_grid, e.g.
+    ``select_grid(grid, substrate="TOPAS", metal="Au")``. Selected axes are
+    dropped; the result is a view of the reflectance array.
+    """
+    index = []
+    for dim in grid["dims"]:
+        if dim in labels:
+            coords = list(grid["coords"][dim])
+            index.append(coords.index(labels[dim]))
+        else:
+            index.append(slice(None))
+    return grid["reflectance"][tuple(index)]
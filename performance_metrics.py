@@ -1,3 +1,4 @@
+import math
 import numpy as np
 from scipy.interpolate import CubicSpline
 from scipy.optimize import minimize_scalar
@@ -35,23 +36,308 @@ def calculate_theta_res_smooth(theta_deg, Rp):
 
     return calculate_theta_res(Rp_sorted, theta_sorted)
 
+# Flags (bits) de find_resonance_batch
+RES_OK = 0
+RES_EDGE = 1        # mínimo a menos de half_width amostras da borda da janela
+RES_SHALLOW = 2     # vale com profundidade < min_depth do máximo (sem ressonância clara)
+RES_NOT_FINITE = 4  # curva com NaN/inf
+RES_FALLBACK = 8    # refinamento falhou; devolvido o mínimo da grade
+
+def polynomial_window_basis(x, centers, half_width):
+    """
+    Inverse Vandermonde matrices of the windows of 2*half_width+1 samples
+    of ``x`` around each of ``centers`` (positions normalized by the window
+    span), as used by the sub-grid refinement: the coefficients of a window
+    are ``basis[i] @ y[centers[i]-half_width : centers[i]+half_width+1]``.
+    Precomputing them once lets a stream of curves on the same grid skip the
+    solve (see sensorgram.SensorgramTracker).
+
+    Returns:
+        basis (len(centers), P, P) and span (len(centers),) in x units,
+        with P = 2*half_width + 1.
+    """
+    centers = np.asarray(centers)
+    window = centers[:, None] + np.arange(-half_width, half_width + 1)
+    u = x[window] - x[centers][:, None]
+    span = u[:, -1] - u[:, 0]
+    powers = np.arange(2 * half_width + 1)
+    return np.linalg.inv((u / span[:, None])[..., None] ** powers), span
+
+def polynomial_window_minimum(coeffs, half_width):
+    """
+    Minimum of each row of polynomial coefficients (normalized window
+    coordinates, lowest degree first) by Newton steps from the parabolic
+    vertex. Returns (position t in window spans, value, converged mask).
+    """
+    powers = np.arange(2 * half_width + 1)
+    d1 = coeffs[:, 1:] * powers[1:]
+    d2 = d1[:, 1:] * powers[1:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = -coeffs[:, 1] / (2 * coeffs[:, 2])
+        for _ in range(6):
+            slope = np.sum(d1 * t[:, None] ** powers[:-1], axis=1)
+            curvature = np.sum(d2 * t[:, None] ** powers[:-2], axis=1)
+            t = t - slope / curvature
+    ok = np.isfinite(t) & (np.abs(t) <= 1 / (2 * half_width)) & (curvature > 0)
+    t = np.where(ok, t, 0.0)
+    return t, np.sum(coeffs * t[:, None] ** powers, axis=1), ok
+
+def polynomial_window_minimum_1d(coeffs, half_width):
+    """
+    polynomial_window_minimum of a single window in plain Python floats:
+    without the per-call array overhead, for per-frame use (streaming).
+    Returns (t, value, converged).
+    """
+    c = [float(v) for v in coeffs]
+    d1 = [k * c[k] for k in range(1, len(c))]
+    d2 = [k * d1[k] for k in range(1, len(d1))]
+
+    def poly(p, t):
+        return sum(v * t ** k for k, v in enumerate(p))
+
+    if c[2] == 0:
+        return 0.0, c[0], False
+    t = -c[1] / (2 * c[2])
+    curvature = 0.0
+    for _ in range(6):
+        curvature = poly(d2, t)
+        if curvature == 0 or not math.isfinite(curvature):
+            return 0.0, c[0], False
+        t -= poly(d1, t) / curvature
+    ok = math.isfinite(t) and abs(t) <= 1 / (2 * half_width) and curvature > 0
+    t = t if ok else 0.0
+    return t, poly(c, t), ok
+
+def _local_polynomial_minimum(x, y, idx, half_width):
+    """
+    Sub-grid minimum of each row of ``y`` near column ``idx``: the degree
+    2*half_width polynomial through the 2*half_width+1 samples around idx,
+    minimized by Newton steps from the parabolic vertex. Returns (offset in
+    x units from x[idx], polynomial value there, converged mask).
+    """
+    rows = np.arange(len(y))[:, None]
+    window = idx[:, None] + np.arange(-half_width, half_width + 1)
+    u = x[window] - x[idx][:, None]
+    span = (u[:, -1] - u[:, 0])[:, None]
+    u = u / span
+    samples = y[rows, window]
+
+    powers = np.arange(2 * half_width + 1)
+    steps = np.diff(x)
+    if np.allclose(steps, steps[0]):
+        # Grade uniforme: a mesma matriz de Vandermonde para todas as curvas
+        coeffs = samples @ np.linalg.inv(u[0][:, None] ** powers).T
+    else:
+        coeffs = np.linalg.solve(u[..., None] ** powers, samples[..., None])[..., 0]
+
+    t, value, ok = polynomial_window_minimum(coeffs, half_width)
+    return t * span[:, 0], value, ok
+
+def find_resonance_batch(x, curves, window=None, half_width=3, min_depth=0.1):
+    """
+    Resonance (minimum) of many curves sampled on one shared grid, in a
+    single vectorized pass: argmin on the grid, then a local polynomial
+    refinement around it (see _local_polynomial_minimum). Replaces the
+    per-curve spline fit of calculate_theta_res_smooth for sweeps.
+
+    Parameters:
+        x (array): Shared grid (N,), ascending (angles in deg or wavelengths).
+        curves (array): Curves (..., N).
+        window (tuple): Only search x within (low, high).
+        half_width (int): Samples on each side used by the refinement.
+        min_depth (float): Dips shallower than this fraction of the curve
+            maximum are flagged RES_SHALLOW.
+
+    Returns:
+        x_res, R_res, status: arrays of shape (...); status holds RES_* bit
+        flags (RES_OK = 0). x_res/R_res are NaN for non-finite curves.
+    """
+    x = np.asarray(x, dtype=float)
+    curves = np.asarray(curves, dtype=float)
+    if window is not None:
+        # Fatia contígua (view): nenhuma cópia das curvas
+        lo, hi = np.searchsorted(x, window[0]), np.searchsorted(x, window[1], side="right")
+        x, curves = x[lo:hi], curves[..., lo:hi]
+    shape = curves.shape[:-1]
+    y = curves.reshape(-1, len(x))
+    n = len(x)
+
+    status = np.zeros(len(y), dtype=np.uint8)
+    finite = np.isfinite(y.sum(axis=1))
+    status[~finite] |= RES_NOT_FINITE
+    y_safe = y if finite.all() else np.where(finite[:, None], y, 0.0)
+
+    idx = np.argmin(y_safe, axis=1)
+    y_min, y_max = y_safe[np.arange(len(y)), idx], np.max(y_safe, axis=1)
+    status[(idx < half_width) | (idx > n - 1 - half_width)] |= RES_EDGE
+    status[y_max - y_min < min_depth * np.abs(y_max)] |= RES_SHALLOW
+
+    center = np.clip(idx, half_width, n - 1 - half_width)
+    offset, value, ok = _local_polynomial_minimum(x, y_safe, center, half_width)
+    refined = ok & (center == idx)
+    status[~refined & finite & ((status & RES_EDGE) == 0)] |= RES_FALLBACK
+
+    x_res = np.where(refined, x[center] + offset, x[idx])
+    R_res = np.where(refined, value, y_min)
+    x_res[~finite] = np.nan
+    R_res[~finite] = np.nan
+    status[~finite] = RES_NOT_FINITE
+    return x_res.reshape(shape), R_res.reshape(shape), status.reshape(shape)
+
+SHAPE_METRICS = ("fwhm", "r_min", "depth", "contrast", "asymmetry", "slope_left", "slope_right")
+
+def calculate_curve_shape_batch(x, curves, x_res=None, R_res=None, chunk_rows=512):
+    """
+    Dip shape of many curves sampled on one shared grid, in one vectorized
+    pass (in blocks of ``chunk_rows`` curves to bound memory). The half
+    maximum is (max + min) / 2 of each curve; the edges of the region below
+    it are interpolated between the samples that bracket them, so the
+    widths are not quantized to the grid step.
+
+    Parameters:
+        x (array): Shared grid (N,), ascending.
+        curves (array): Curves (..., N).
+        x_res, R_res (array): Sub-grid resonance position and minimum
+            (...), e.g. from find_resonance_batch (default: grid minimum).
+            R_res sets r_min and therefore the half maximum.
+        chunk_rows (int): Curves processed per block.
+
+    Returns:
+        dict of arrays of shape (...), keys SHAPE_METRICS:
+            fwhm: distance between the half-maximum crossings (NaN when
+                the dip is cut by either end of the grid);
+            r_min: minimum reflectance; depth: max - min;
+            contrast: depth / max;
+            asymmetry: (right - left half width) / fwhm, in [-1, 1];
+            slope_left, slope_right: dR/dx at the two crossings.
+    """
+    x = np.asarray(x, dtype=float)
+    curves = np.asarray(curves, dtype=float)
+    shape = curves.shape[:-1]
+    y_all = curves.reshape(-1, len(x))
+    if x_res is not None:
+        x_res = np.broadcast_to(np.asarray(x_res, dtype=float), shape).reshape(-1)
+    if R_res is not None:
+        R_res = np.broadcast_to(np.asarray(R_res, dtype=float), shape).reshape(-1)
+    out = {name: np.full(len(y_all), np.nan) for name in SHAPE_METRICS}
+
+    for start in range(0, len(y_all), chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        y = y_all[rows]
+        r = np.arange(len(y))
+        idx = np.argmin(y, axis=1)
+        y_min, y_max = y[r, idx], np.max(y, axis=1)
+        if R_res is not None:
+            # Mínimo refinado, exceto onde a extração falhou (NaN)
+            y_min = np.where(np.isnan(R_res[rows]), y_min, np.minimum(R_res[rows], y_min))
+        half = (y_max + y_min) / 2
+
+        # Primeira e última amostra abaixo da meia altura
+        below = y <= half[:, None]
+        first = np.argmax(below, axis=1) - 1
+        last = len(x) - 1 - np.argmax(below[:, ::-1], axis=1)
+        valid = (first >= 0) & (last <= len(x) - 2)
+        first, last = np.clip(first, 0, len(x) - 2), np.clip(last, 0, len(x) - 2)
+
+        x_left, slope_left = _half_max_crossing(x, y, first, half)
+        x_right, slope_right = _half_max_crossing(x, y, last, half)
+        fwhm = np.where(valid, x_right - x_left, np.nan)
+        center = x[idx] if x_res is None else x_res[rows]
+
+        out["fwhm"][rows] = fwhm
+        out["r_min"][rows] = y_min
+        out["depth"][rows] = y_max - y_min
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["contrast"][rows] = (y_max - y_min) / y_max
+            out["asymmetry"][rows] = ((x_right - center) - (center - x_left)) / fwhm
+        out["slope_left"][rows] = np.where(valid, slope_left, np.nan)
+        out["slope_right"][rows] = np.where(valid, slope_right, np.nan)
+
+    return {name: values.reshape(shape) for name, values in out.items()}
+
+def _half_max_crossing(x, y, j, level):
+    """
+    Where each row of ``y`` crosses ``level`` between samples j and j+1,
+    and dy/dx there: cubic through the 4 samples around the interval
+    (Newton form, any grid), solved by Newton steps from the linear
+    interpolation.
+    """
+    r = np.arange(len(y))[:, None]
+    k = np.clip(j - 1, 0, len(x) - 4)[:, None] + np.arange(4)
+    xs, c = x[k], y[r, k]
+    # Diferenças divididas: c[:, i] vira o coeficiente de ordem i
+    for order in range(1, 4):
+        c[:, order:] = (c[:, order:] - c[:, order - 1:-1]) / (xs[:, order:] - xs[:, :-order])
+
+    def cubic(t):
+        value, slope = c[:, 3], np.zeros(len(t))
+        for i in (2, 1, 0):
+            slope = slope * (t - xs[:, i]) + value
+            value = value * (t - xs[:, i]) + c[:, i]
+        return value, slope
+
+    x0, x1 = x[j], x[j + 1]
+    y0, y1 = y[r[:, 0], j], y[r[:, 0], j + 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = x0 + (level - y0) * (x1 - x0) / (y1 - y0)
+        for _ in range(2):
+            value, slope = cubic(t)
+            t = np.clip(t - (value - level) / slope, x0, x1)
+        slope = cubic(t)[1]
+    return t, slope
+
 def calculate_fwhm(Rp, theta_deg):
-    Rp_min = np.min(Rp)
-    Rp_max = np.max(Rp)
-    half_max = (Rp_max + Rp_min) / 2
-    crossing_indices = np.where(np.diff(np.sign(Rp - half_max)))[0]
+    """
+    FWHM of a single curve, same definition as calculate_curve_shape_batch
+    (half maximum (max + min) / 2, interpolated crossings, NaN when the dip
+    is cut by either end of the grid) without the other shape metrics.
+    """
+    x = np.asarray(theta_deg, dtype=float)
+    y = np.asarray(Rp, dtype=float)
+    half = (y.max() + y.min()) / 2
+    below = np.flatnonzero(y <= half)
+    first, last = below[0] - 1, below[-1]
+    if first < 0 or last > len(x) - 2:
+        return np.nan
+
+    return _half_max_crossing_1d(x, y, last, half) - _half_max_crossing_1d(x, y, first, half)
+
+def _half_max_crossing_1d(x, y, j, level):
+    # _half_max_crossing para uma única curva, em escalares Python (sem o
+    # custo fixo das operações numpy em vetores de 4 elementos)
+    k = min(max(int(j) - 1, 0), len(x) - 4)
+    xs, c = x[k:k + 4].tolist(), y[k:k + 4].tolist()
+    level = float(level)
+    x0, x1, y0, y1 = xs[j - k], xs[j - k + 1], c[j - k], c[j - k + 1]
+    for order in range(1, 4):
+        for i in range(3, order - 1, -1):
+            c[i] = (c[i] - c[i - 1]) / (xs[i] - xs[i - order])
+
+    if y1 == y0:
+        return np.nan
+    t = x0 + (level - y0) * (x1 - x0) / (y1 - y0)
+    for _ in range(2):
+        value, slope = c[3], 0.0
+        for i in (2, 1, 0):
+            slope = slope * (t - xs[i]) + value
+            value = value * (t - xs[i]) + c[i]
+        if slope == 0:
+            break
+        t = min(max(t - (value - level) / slope, x0), x1)
+    return t
 
-    if len(crossing_indices) >= 2:
-        theta1 = theta_deg[crossing_indices[0]]
-        theta2 = theta_deg[crossing_indices[-1]]
-        return abs(theta2 - theta1)
-    return np.nan
+def _ratio(numerator, fwhm):
+    # Divisão elemento a elemento; FWHM nulo, NaN ou ausente resulta em NaN
+    numerator, fwhm = np.broadcast_arrays(np.asarray(numerator, dtype=float),
+                                          np.asarray(fwhm, dtype=float))
+    valid = (fwhm != 0) & ~np.isnan(fwhm)
+    return np.divide(numerator, fwhm, out=np.full(fwhm.shape, np.nan), where=valid)[()]
 
 def calculate_q(theta_res, fwhm):
-    return theta_res / fwhm if fwhm and not np.isnan(fwhm) else np.nan
+    return _ratio(theta_res, fwhm)
 
 def calculate_chi(sensitivity, fwhm):
-    return sensitivity / fwhm if fwhm and not np.isnan(fwhm) else np.nan
+    return _ratio(sensitivity, fwhm)
 
 def calculate_sensitivity_empirical(theta_res_pos, theta_res_neg, n_pos, n_neg):
     delta_n = n_pos - n_neg
@@ -3,7 +3,7 @@ from matplotlib.font_manager import FontProperties
 import os
 import numpy as np
 import pandas as pd
-from fresnel_utils import getFresnelAIM
+from fresnel_utils import getFresnelAIM_batch
 from performance_metrics import calculate_theta_res_smooth
 from plot_utils import save_figure
 from plot_style import apply_plot_style
@@ -26,17 +26,21 @@ def plot_figures_of_merit_comparative(results_dict, thicknesses_nm, save_dir):
     apply_plot_style()
     os.makedirs(save_dir, exist_ok=True)
 
-    metrics = ["theta_res", "fwhm", "sensitivity_empirical", "sensitivity_theoretical", "chi", "Q"]
+    metrics = ["theta_res", "fwhm", "sensitivity_empirical", "sensitivity_analytic",
+               "sensitivity_theoretical", "chi", "Q"]
     ylabels = {
         "theta_res": "θres (°)",
         "fwhm": "FWHM (°)",
         "sensitivity_empirical": "Sensitivity (emp.) (°/RIU)",
+        "sensitivity_analytic": "Sensitivity (analytic) (°/RIU)",
         "sensitivity_theoretical": "Sensitivity (theor.) (°/RIU)",
         "chi": "χ (RIU⁻¹)",
         "Q": "Q (RIU⁻¹)"
     }
 
     for metric in metrics:
+        if metric not in results_dict["Ag"]:
+            continue
         plt.figure(figsize=(10, 6))
 
         for metal in ["Ag", "Au", "Cu"]:
@@ -79,7 +83,7 @@ def plot_figures_of_merit_comparative(results_dict, thicknesses_nm, save_dir):
 def plot_angular_response_for_sensitive_structure_and_export_csv(
     materials, lambda0, theta_deg, theta_rad,
     d_cr, d_analyte, substrate, metals,
-    save_dir="outputs/sensitive_structure"
+    save_dir="outputs/sensitive_structure", d_metal=55e-9
 ):
     apply_plot_style()
     os.makedirs(save_dir, exist_ok=True)
@@ -97,7 +101,6 @@ def plot_angular_response_for_sensitive_structure_and_export_csv(
         (n_analyte_positive + 0.001, "positive", "high")
     ]
 
-    d_metal = 55e-9
     all_data = []
 
     for metal in metals:
@@ -115,10 +118,7 @@ def plot_angular_response_for_sensitive_structure_and_export_csv(
             ])
             d = np.array([d_cr, d_metal])
 
-            Rp = np.array([
-                getFresnelAIM(n, d, theta, lambda0)[2]
-                for theta in theta_rad
-            ])
+            Rp = getFresnelAIM_batch(n, d, theta_rad, lambda0)[2]
 
             theta_res = calculate_theta_res_smooth(theta_deg, Rp)
             all_thetas[group].append(theta_res)
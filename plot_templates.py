@@ -0,0 +1,227 @@
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.font_manager import FontProperties
+from plot_style import apply_plot_style
+from plot_utils import save_figure
+
+# Font
+try:
+    font_path = "/usr/share/fonts/truetype/msttcorefonts/Times_New_Roman.ttf"
+    TNR = FontProperties(fname=font_path) if os.path.exists(font_path) else None
+except Exception:
+    TNR = None
+
+# Resolução usada para decimar as curvas: uma coluna por ponto tipográfico
+# (1/72 in). As linhas têm 1.5-1.8 pt de espessura, então detalhes menores
+# que 1 pt não aparecem nem no PNG de 300 dpi; o min/max mantém o vale exato
+DECIMATION_DPI = 72
+
+# Opções globais das figuras, aplicadas pelos workers de render_pipeline:
+# rasterize -> curvas rasterizadas em PDF/SVG (save_figure; EPS fica vetorial);
+# max_points -> teto de pontos por curva (None = largura do eixo em pontos,
+# duas amostras por coluna, ~1100 para as figuras de 10 in)
+FIGURE_OPTIONS = {"rasterize": False, "max_points": None}
+
+
+def set_figure_options(rasterize=None, max_points=None):
+    """Updates FIGURE_OPTIONS; arguments left as None keep their value."""
+    if rasterize is not None:
+        FIGURE_OPTIONS["rasterize"] = bool(rasterize)
+    if max_points is not None:
+        FIGURE_OPTIONS["max_points"] = int(max_points) if max_points > 0 else None
+
+
+# Um template por tipo de gráfico: a figura, os eixos, rótulos e fontes são
+# montados uma vez e reaproveitados entre as chamadas.
+TEMPLATE_SPECS = {
+    "reflectance": {"figsize": (10, 6), "xlabel": "Angle (°)", "ylabel": "Reflectance (a.u.)", "ylim": (0, 1)},
+    "wim_reflectance": {"figsize": (10, 6), "xlabel": "Wavelength (nm)", "ylabel": "Reflectance (a.u.)", "ylim": (0, 1)},
+    "merit": {"figsize": (8, 5), "xlabel": "Metal Thickness (nm)", "ylabel": ""},
+}
+
+_templates = {}
+
+
+def decimate_minmax(x, y, n_bins):
+    """
+    Min/max decimation: splits the curve into ``n_bins`` consecutive blocks
+    and keeps the lowest and highest sample of each, so extrema (the SPR dip
+    in particular) survive exactly. Curves with fewer than 2*n_bins points
+    are returned unchanged.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(y)
+    if n_bins < 1 or n <= 2 * n_bins:
+        return x, y
+
+    size = n // n_bins
+    m = (n // size) * size
+    blocks = y[:m].reshape(-1, size)
+    offsets = np.arange(0, m, size)
+    keep = [offsets + np.argmin(blocks, axis=1), offsets + np.argmax(blocks, axis=1), [0, n - 1]]
+    if m < n:
+        keep.append([m + np.argmin(y[m:]), m + np.argmax(y[m:])])
+    idx = np.unique(np.concatenate(keep))
+    return x[idx], y[idx]
+
+
+def decimate_lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling to ``n_out`` points
+    (Steinarsson, 2013). Keeps the visual shape with one point per bucket.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out < 3 or n <= n_out:
+        return x, y
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n)
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        # Área do triângulo (ponto anterior, candidato, média do próximo bucket)
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+
+def decimate_curve(x, y, n_pixels, xlim=None, method="minmax"):
+    """
+    Reduces a curve to what can be seen: samples outside ``xlim`` (keeping
+    one neighbour on each side so the line reaches the frame) are dropped,
+    then the rest is decimated to ``n_pixels`` columns.
+
+    Parameters:
+        x, y (array): Curve (x ascending).
+        n_pixels (int): Columns of the axes at the decimation resolution.
+        xlim (tuple): Visible x range, or None for the whole curve.
+        method (str): "minmax" (default, exact extrema) or "lttb".
+
+    Returns:
+        (x, y) decimated arrays.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if xlim is not None:
+        lo = max(np.searchsorted(x, xlim[0]) - 1, 0)
+        hi = min(np.searchsorted(x, xlim[1], side="right") + 1, len(x))
+        x, y = x[lo:hi], y[lo:hi]
+
+    if method == "lttb":
+        return decimate_lttb(x, y, 2 * n_pixels)
+    return decimate_minmax(x, y, n_pixels)
+
+
+class FigureTemplate:
+    """
+    Prepared Figure/Axes for one plot type.
+
+    The figure, labels, fonts and grid are built once; ``reset`` only removes
+    the data artists of the previous plot, so consecutive plots of the same
+    type skip the figure setup. Curves drawn with ``plot_curve`` are clipped
+    to the visible range and decimated to the axes' width.
+    """
+
+    def __init__(self, figsize, xlabel="", ylabel="", ylim=None, dpi=DECIMATION_DPI):
+        self.ylim = ylim
+        self.dpi = dpi
+        self.xlim = None
+        self.fig, self.ax = plt.subplots(figsize=figsize)
+
+        label_kwargs = {"fontsize": 14, "fontproperties": TNR} if TNR else {"fontsize": 14}
+        self._label_kwargs = label_kwargs
+        self.ax.set_xlabel(xlabel, **label_kwargs)
+        self.ax.set_ylabel(ylabel, **label_kwargs)
+        self.ax.tick_params(labelsize=12)
+        self.ax.grid(True)
+        self.reset()
+
+    @property
+    def alive(self):
+        return plt.fignum_exists(self.fig.number)
+
+    def reset(self, ylabel=None):
+        """Clears the previous plot while keeping the prepared layout."""
+        ax = self.ax
+        for artist in list(ax.lines) + list(ax.collections) + list(ax.texts) + list(ax.patches):
+            artist.remove()
+        legend = ax.get_legend()
+        if legend is not None:
+            legend.remove()
+        ax.set_title("")
+        if ylabel is not None:
+            ax.set_ylabel(ylabel, **self._label_kwargs)
+
+        ax.relim()
+        ax.autoscale(True)
+        self.xlim = None
+        if self.ylim is not None:
+            ax.set_ylim(*self.ylim)
+        plt.figure(self.fig.number)
+        return ax
+
+    def set_xlim(self, left, right):
+        """Fixes the visible x range (call before plot_curve to clip the data)."""
+        self.xlim = (left, right)
+        self.ax.set_xlim(left, right)
+
+    @property
+    def pixel_width(self):
+        """Width of the axes in columns of 1/DECIMATION_DPI inch (the decimation budget)."""
+        return max(int(self.ax.get_position().width * self.fig.get_figwidth() * self.dpi), 1)
+
+    def plot_curve(self, x, y, method="minmax", **kwargs):
+        """
+        Plots a dense curve decimated to the axes' width (pixel_width), or
+        to FIGURE_OPTIONS["max_points"] when set (min/max keeps two per column).
+        """
+        n_pixels = self.pixel_width
+        if FIGURE_OPTIONS["max_points"]:
+            n_pixels = max(FIGURE_OPTIONS["max_points"] // 2, 1)
+        xd, yd = decimate_curve(x, y, n_pixels, self.xlim, method)
+        kwargs.setdefault("zorder", 1.5)
+        return self.ax.plot(xd, yd, **kwargs)
+
+    def legend(self, *args, fontsize=10, loc="best"):
+        if TNR:
+            return self.ax.legend(*args, fontsize=fontsize, loc=loc, prop=TNR)
+        return self.ax.legend(*args, fontsize=fontsize, loc=loc)
+
+    def save(self, filename_base, **kwargs):
+        """
+        Saves through plot_utils.save_figure (same formats and DPI policy).
+        The layout is fitted by tight_layout, so the second tight-bbox pass
+        for vector formats is skipped unless requested.
+        """
+        kwargs.setdefault("tight_bbox", False)
+        kwargs.setdefault("rasterize", FIGURE_OPTIONS["rasterize"])
+        save_figure(filename_base, fig=self.fig, **kwargs)
+
+
+def get_template(name, ylabel=None):
+    """
+    Returns the shared template for a plot type in TEMPLATE_SPECS, reset
+    and ready to draw (``ylabel`` overrides the spec's y label). A closed
+    template figure is rebuilt transparently.
+    """
+    template = _templates.get(name)
+    if template is None or not template.alive:
+        if not _templates:
+            apply_plot_style()
+        template = FigureTemplate(**TEMPLATE_SPECS[name])
+        _templates[name] = template
+    template.reset(ylabel=ylabel)
+    return template
+
+
+def template_figure_numbers():
+    """Figure numbers owned by live templates (must not be closed by callers)."""
+    return {t.fig.number for t in _templates.values() if t.alive}
@@ -1,48 +1,125 @@
 # plot_utils.py
+import io
 import os
 import matplotlib.pyplot as plt
 import warnings
+from PIL import Image
+from instrumentation import stage, count
 
 # Suppress known EPS transparency warning
 warnings.filterwarnings("ignore", category=UserWarning, message=".*transparency.*")
 
-def save_figure(filename_base: str, dpi_eps: int = 600, dpi_png: int = 300, show: bool = False):
+# Formatos gravados por save_figure quando nenhum é pedido explicitamente
+DEFAULT_FORMATS = ("png", "eps")
+
+def set_default_formats(formats):
+    """
+    Sets the formats written by save_figure when ``formats`` is not given
+    (used by the render workers to apply a run-wide format set).
+    """
+    global DEFAULT_FORMATS
+    DEFAULT_FORMATS = tuple(formats)
+
+# Cores da paleta adaptativa dos PNG (8 bits, ~3x menores que RGBA e com o
+# fundo branco exato); None grava o RGBA do Agg sem quantização
+PNG_COLORS = 256
+
+def write_png(fig, path, dpi, colors=PNG_COLORS):
+    """
+    Writes ``fig`` as PNG. With ``colors`` the Agg image is rendered
+    without compression and saved with an adaptive palette of that many
+    colors (Pillow's max-coverage quantizer).
     """
-    Saves the current Matplotlib figure as both .eps and .png and optionally shows it.
+    if not colors:
+        fig.savefig(path, format="png", dpi=dpi)
+        return
+    # Imagem RGBA crua do Agg (mesmo tamanho que o PNG teria: bbox truncado)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="rgba", dpi=dpi)
+    width, height = (int(v) for v in fig.get_size_inches() * dpi)
+    image = Image.frombuffer("RGBA", (width, height), buffer.getbuffer(), "raw", "RGBA", 0, 1)
+    image.convert("RGB").quantize(colors, method=Image.Quantize.MAXCOVERAGE).save(path, format="png")
+
+def save_figure(filename_base: str, dpi_eps: int = 600, dpi_png: int = 300, show: bool = False,
+                formats=None, fig=None, rasterize: bool = False, tight_bbox: bool = True):
+    """
+    Saves the current Matplotlib figure (by default as .png and .eps) and optionally shows it.
 
     Parameters:
         filename_base (str): Full path without extension.
         dpi_eps (int): Resolution for EPS (default: 600).
         dpi_png (int): Resolution for PNG (default: 300).
         show (bool): Whether to display the plot after saving.
+        formats (iterable): Formats to write, e.g. ("png",) or ("png", "pdf");
+            defaults to DEFAULT_FORMATS.
+        fig (Figure): Figure to save (default: the current figure).
+        rasterize (bool): In PDF/SVG, rasterize the artists drawn below
+            zorder 2 (the curves) at dpi_png, keeping axes and text as vectors.
+            EPS is always written as vectors: the PS backend stores images
+            uncompressed, so a rasterized EPS is larger, not smaller.
+        tight_bbox (bool): Recompute a tight bounding box for vector formats
+            (an extra draw); unnecessary when the layout is already fitted.
     """
-    if not plt.get_fignums():
-        print("[WARNING] No active figure to save.")
-        return
+    formats = DEFAULT_FORMATS if formats is None else tuple(formats)
 
-    os.makedirs(os.path.dirname(filename_base), exist_ok=True)
+    if fig is None:
+        if not plt.get_fignums():
+            print("[WARNING] No active figure to save.")
+            return
+        fig = plt.gcf()
 
-    eps_path = f"{filename_base}.eps"
-    png_path = f"{filename_base}.png"
+    os.makedirs(os.path.dirname(filename_base) or ".", exist_ok=True)
 
     try:
-        plt.tight_layout()
+        fig.tight_layout()
     except Exception as e:
         print(f"[WARNING] Could not apply tight_layout(): {e}")
 
     # Save PNG (sem backend switch)
-    try:
-        plt.savefig(png_path, format="png", dpi=dpi_png)
-        print(f"[INFO] Saved: {png_path}")
-    except Exception as e:
-        print(f"[ERROR] Failed to save PNG: {e}")
+    if "png" in formats:
+        png_path = f"{filename_base}.png"
+        try:
+            with stage("save_figure:png"):
+                write_png(fig, png_path, dpi_png)
+            count("files_saved")
+            print(f"[INFO] Saved: {png_path}")
+        except Exception as e:
+            print(f"[ERROR] Failed to save PNG: {e}")
+
+    bbox = "tight" if tight_bbox else None
 
     # Save EPS
-    try:
-        plt.savefig(eps_path, format="eps", bbox_inches="tight", dpi=dpi_eps)
-        print(f"[INFO] Saved: {eps_path}")
-    except Exception as e:
-        print(f"[WARNING] Failed to save EPS (ignored): {e}")
+    if "eps" in formats:
+        eps_path = f"{filename_base}.eps"
+        try:
+            with stage("save_figure:eps"):
+                fig.savefig(eps_path, format="eps", bbox_inches=bbox, dpi=dpi_eps)
+            count("files_saved")
+            print(f"[INFO] Saved: {eps_path}")
+        except Exception as e:
+            print(f"[WARNING] Failed to save EPS (ignored): {e}")
+
+    # Outros formatos vetoriais/raster (pdf, svg, ...); só aqui a imagem
+    # rasterizada é comprimida
+    if rasterize:
+        for ax in fig.axes:
+            ax.set_rasterization_zorder(2)
+
+    for fmt in formats:
+        if fmt in ("png", "eps"):
+            continue
+        path = f"{filename_base}.{fmt}"
+        try:
+            with stage(f"save_figure:{fmt}"):
+                fig.savefig(path, format=fmt, bbox_inches=bbox, dpi=dpi_png)
+            count("files_saved")
+            print(f"[INFO] Saved: {path}")
+        except Exception as e:
+            print(f"[WARNING] Failed to save {fmt.upper()} (ignored): {e}")
+
+    if rasterize:
+        for ax in fig.axes:
+            ax.set_rasterization_zorder(None)
 
     # Optionally show
     if show:
@@ -1,19 +1,12 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import os
-from matplotlib.font_manager import FontProperties
-from fresnel_utils import getFresnelAIM
-from performance_metrics import calculate_theta_res_smooth, calculate_fwhm
+from parameter_grid import run_parameter_grid
+from result_cache import make_cache_key
+from performance_metrics import find_resonance_batch, calculate_curve_shape_batch, SHAPE_METRICS
 from plot_style import apply_plot_style
-from plot_utils import save_figure
-
-# Fonte
-try:
-    font_path = "/usr/share/fonts/truetype/msttcorefonts/Times_New_Roman.ttf"
-    TNR = FontProperties(fname=font_path) if os.path.exists(font_path) else None
-except Exception:
-    TNR = None
-    print("[WARNING] Times New Roman not found. Using default font.")
+from plot_templates import get_template
+from instrumentation import stage, count
 
 # Paleta MATLAB-like
 color_palette = [
@@ -31,92 +24,131 @@ def restrict_range(theta_deg, Rp, window=(40, 80)):
     mask = (theta_deg >= window[0]) & (theta_deg <= window[1])
     return theta_deg[mask], Rp[mask]
 
+# Métricas por curva devolvidas por calculate_curve_metrics_batch
+CURVE_METRICS = ("theta_res", "theta_res_status") + SHAPE_METRICS
+
+def calculate_curve_metrics_batch(theta_deg, curves, theta_window=(40, 80)):
+    """
+    theta_res (inside ``theta_window``) and dip shape of every curve in
+    ``curves`` (..., N) sampled on ``theta_deg``.
+
+    Returns:
+        dict of arrays of shape (...), keys CURVE_METRICS: "theta_res",
+        "theta_res_status" (performance_metrics.RES_* flags) and the
+        performance_metrics.SHAPE_METRICS (fwhm, r_min, depth, contrast,
+        asymmetry, slope_left, slope_right).
+    """
+    with stage("theta_res"):
+        theta_res, R_res, status = find_resonance_batch(theta_deg, curves, theta_window)
+    with stage("curve_shape"):
+        shape = calculate_curve_shape_batch(theta_deg, curves, theta_res, R_res)
+    count("theta_res_flagged", int(np.count_nonzero(status)))
+    return {"theta_res": theta_res, "theta_res_status": status, **shape}
+
+def calculate_curve_metrics(theta_deg, Rp, theta_window=(40, 80)):
+    metrics = calculate_curve_metrics_batch(theta_deg, np.asarray(Rp)[np.newaxis], theta_window)
+    return metrics["theta_res"][0], metrics["fwhm"][0]
+
+def plot_reflectance_family(theta_deg, reflectance_list, theta_res_list,
+                            metal_thicknesses_nm, filename_base, show=True):
+    """
+    Plots the reflectance curves of one substrate/metal/analyte for every
+    metal thickness, marks theta_res and saves the figure.
+    """
+    template = get_template("reflectance")
+    ax = template.ax
+
+    if len(theta_res_list):
+        theta_min = np.nanmin(theta_res_list)
+        theta_max = np.nanmax(theta_res_list)
+        if np.isfinite(theta_min):
+            template.set_xlim(theta_min - 1.5, theta_max + 1.5)
+
+    for i, d_metal_nm in enumerate(metal_thicknesses_nm):
+        Rp = reflectance_list[i]
+        theta_res = theta_res_list[i]
+
+        color = color_palette[i % len(color_palette)]
+        template.plot_curve(theta_deg, Rp, linewidth=1.5, color=color,
+                            label=f'{d_metal_nm} nm | θres ≈ {theta_res:.2f}°')
+
+        if not np.isnan(theta_res):
+            Rp_res = np.interp(theta_res, theta_deg, Rp)
+            ax.plot(theta_res, Rp_res, 'ko', markersize=5, markerfacecolor='black', zorder=3)
+
+    template.legend(fontsize=9, loc="best")
+    template.save(filename_base)
+    if show:
+        plt.show()
+
 def run_reflectance_simulation(substrate, metal, analytes, materials,
                                 lambda0, theta_deg, theta_rad,
                                 d_cr, d_analyte, metal_thicknesses_nm,
-                                theta_window=(40, 80)):
+                                theta_window=(40, 80), cache=None, renderer=None, show=True,
+                                plot=True):
+    """
+    Simulates one substrate/metal pair for all thicknesses and analytes.
+
+    Figures are drawn inline (and shown when ``show``) unless a
+    render_pipeline.FigureRenderer is given, in which case they are queued
+    on it and the call returns as soon as the numbers are ready. With
+    ``plot=False`` no figure is made (numbers only).
+    """
     apply_plot_style()
     results = {
         "theta_res": {},
         "fwhm": {},
         "substrate": substrate,
         "theta_deg": theta_deg,
-        "reflectance": {}
+        "reflectance": {},
+        "lambda0": lambda0,
+        "d_cr": d_cr,
+        "metal_thicknesses_nm": metal_thicknesses_nm
     }
 
-    os.makedirs("figures", exist_ok=True)
-
-    for analyte in analytes:
+    if plot:
+        os.makedirs("figures", exist_ok=True)
+
+    # Uma única avaliação para todas as espessuras e analytes
+    grid = run_parameter_grid([substrate], [metal], [d_cr], metal_thicknesses_nm,
+                              list(analytes), materials, lambda0, theta_rad, cache=cache)
+    Rp_grid = grid["reflectance"][0, 0, 0]
+
+    def compute_metrics():
+        return calculate_curve_metrics_batch(theta_deg, Rp_grid, theta_window)
+
+    if cache is None:
+        metrics = compute_metrics()
+    else:
+        key = make_cache_key(
+            "metrics",
+            [materials[substrate], materials["Cr"], materials[metal]],
+            [materials[a] for a in analytes],
+            d_cr, metal_thicknesses_nm, lambda0, theta_deg, theta_window
+        )
+        metrics = cache.cached(key, compute_metrics)
+
+    for j, analyte in enumerate(analytes):
         label_analyte = name_map.get(analyte, analyte)
         print(f"\nSimulating for {label_analyte}...")
 
-        plt.figure(figsize=(10, 6))
-        theta_res_list = []
-        fwhm_list = []
-        reflectance_list = []
-
-        for i, d_metal_nm in enumerate(metal_thicknesses_nm):
-            d_metal = d_metal_nm * 1e-9
-            d = np.array([d_cr, d_metal])
-            n = np.array([
-                materials[substrate],
-                materials["Cr"],
-                materials[metal],
-                materials[analyte]
-            ])
-
-            Rp = np.array([
-                getFresnelAIM(n, d, angle, lambda0)[2]
-                for angle in theta_rad
-            ])
-
-            # Janela angular + interpolação suave
-            theta_deg_windowed, Rp_windowed = restrict_range(theta_deg, Rp, theta_window)
-            theta_res = calculate_theta_res_smooth(theta_deg_windowed, Rp_windowed)
-            fwhm = calculate_fwhm(Rp, theta_deg)
-
-            theta_res_list.append(theta_res)
-            fwhm_list.append(fwhm)
-            reflectance_list.append(Rp)
-
-            color = color_palette[i % len(color_palette)]
-            plt.plot(theta_deg, Rp, linewidth=1.5, color=color,
-                     label=f'{d_metal_nm} nm | θres ≈ {theta_res:.2f}°',
-                     zorder=1.5)
-
-            if not np.isnan(theta_res):
-                Rp_res = np.interp(theta_res, theta_deg, Rp)
-                plt.plot(theta_res, Rp_res, 'ko', markersize=5, markerfacecolor='black', zorder=3)
+        theta_res_list = metrics["theta_res"][:, j].tolist()
+        fwhm_list = metrics["fwhm"][:, j].tolist()
+        reflectance_list = list(Rp_grid[:, j, :])
 
         results["theta_res"][(metal, analyte)] = theta_res_list
         results["fwhm"][(metal, analyte)] = fwhm_list
         results["reflectance"][(metal, analyte)] = reflectance_list
 
-        if TNR:
-            plt.xlabel("Angle (°)", fontsize=14, fontproperties=TNR)
-            plt.ylabel("Reflectance (a.u.)", fontsize=14, fontproperties=TNR)
-            plt.xticks(fontsize=12, fontproperties=TNR)
-            plt.yticks(fontsize=12, fontproperties=TNR)
-            plt.legend(fontsize=9, prop=TNR, loc="best")
-        else:
-            plt.xlabel("Angle (°)", fontsize=14)
-            plt.ylabel("Reflectance (a.u.)", fontsize=14)
-            plt.xticks(fontsize=12)
-            plt.yticks(fontsize=12)
-            plt.legend(fontsize=9, loc="best")
-
-        if theta_res_list:
-            theta_min = min(theta_res_list)
-            theta_max = max(theta_res_list)
-            plt.xlim(theta_min - 1.5, theta_max + 1.5)
-
-        plt.ylim(0, 1)
-        plt.grid(True)
-        plt.tight_layout()
-
         base = f"figures/reflectance_{substrate.lower()}_{metal.lower()}_{label_analyte.lower()}"
-        save_figure(base)
-        plt.show()
-        plt.close()
+        if not plot:
+            continue
+        if renderer is None:
+            plot_reflectance_family(theta_deg, reflectance_list, theta_res_list,
+                                    metal_thicknesses_nm, base, show=show)
+        else:
+            # Renderização desacoplada: a simulação segue sem esperar o matplotlib
+            renderer.submit(plot_reflectance_family, theta_deg, Rp_grid[:, j, :], theta_res_list,
+                            metal_thicknesses_nm, base, show=renderer.display)
 
     return results
@@ -0,0 +1,124 @@
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import stage, count, collect_call, merge
+
+
+def _init_render_worker(formats, options):
+    import matplotlib.pyplot as plt
+    from plot_style import apply_plot_style
+    from plot_utils import set_default_formats
+    from plot_templates import set_figure_options
+
+    plt.switch_backend("Agg")
+    warnings.filterwarnings("ignore", category=UserWarning, message=".*non-interactive.*")
+    set_default_formats(formats)
+    set_figure_options(**options)
+    apply_plot_style()
+
+
+def _render(func, args, kwargs):
+    import matplotlib.pyplot as plt
+    from plot_templates import template_figure_numbers
+
+    try:
+        with stage(f"figure:{func.__name__}"):
+            func(*args, **kwargs)
+        count("figure_jobs")
+    finally:
+        # Fecha o que o job criou, mas mantém os templates do worker para reuso
+        keep = template_figure_numbers()
+        for num in plt.get_fignums():
+            if num not in keep:
+                plt.close(num)
+
+
+class FigureRenderer:
+    """
+    Rendering stage decoupled from the simulation.
+
+    Plot jobs are plain functions plus the data they draw. With
+    ``display=False`` (the no-display policy) they run in a background
+    process pool on the Agg backend, so the caller never waits on
+    matplotlib; ``plt.show()`` inside a job is a no-op there. With
+    ``display=True`` jobs run inline in the calling process so their
+    windows can be shown.
+
+    Parameters:
+        formats (iterable): Formats written by save_figure, e.g. ("png",).
+        workers (int): Render processes (default: half the cores, at least 1).
+        display (bool): Show figures interactively instead of rendering in
+            the background.
+        rasterize (bool): Rasterize the curves in vector outputs (EPS/PDF/SVG).
+        max_points (int): Per-curve point budget for template plots
+            (None = decimate to the pixel width only).
+    """
+
+    def __init__(self, formats=("png", "eps"), workers=None, display=False,
+                 rasterize=False, max_points=None):
+        self.formats = tuple(formats)
+        self.display = display
+        self.options = {"rasterize": rasterize, "max_points": max_points}
+        self._futures = []
+        self._pool = None
+        if not display:
+            workers = workers or max(1, (os.cpu_count() or 2) // 2)
+            self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker,
+                                             initargs=(self.formats, self.options))
+
+    def submit(self, func, *args, **kwargs):
+        """Queues ``func(*args, **kwargs)``; the function must be importable."""
+        if self._pool is None:
+            import plot_utils
+            import plot_templates
+            previous = plot_utils.DEFAULT_FORMATS, dict(plot_templates.FIGURE_OPTIONS)
+            plot_utils.set_default_formats(self.formats)
+            plot_templates.set_figure_options(**self.options)
+            try:
+                with stage(f"figure:{func.__name__}"):
+                    func(*args, **kwargs)
+                count("figure_jobs")
+            finally:
+                plot_utils.set_default_formats(previous[0])
+                plot_templates.FIGURE_OPTIONS.update(previous[1])
+            return None
+
+        future = self._pool.submit(collect_call, _render, func, args, kwargs)
+        self._futures.append(future)
+        return future
+
+    def wait(self):
+        """
+        Blocks until every queued figure is written; re-raises job errors.
+        The render/save times of the jobs are added to the instrumentation.
+        """
+        futures, self._futures = self._futures, []
+        errors = []
+        with stage("render_wait"):
+            for future in futures:
+                try:
+                    merge(future.result()[1])
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            print(f"[WARNING] {len(errors)} figure(s) failed to render.")
+            raise errors[0]
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        return False
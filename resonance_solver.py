@@ -0,0 +1,287 @@
+import numpy as np
+from scipy.optimize import brentq, minimize_scalar
+from fresnel_backend import getFresnelAIM_batch
+from fresnel_utils import getFresnelAIM_derivative, getFresnelAIM_curvature
+
+
+def bracket_resonance(n, d, wavelength, theta_window=(40, 80), coarse_points=81):
+    """
+    Locates the reflectance dip with one coarse batched evaluation.
+
+    Returns:
+        (theta_left, theta_right) in degrees, bracketing the minimum.
+    """
+    theta_deg = np.linspace(theta_window[0], theta_window[1], coarse_points)
+    Rp = getFresnelAIM_batch(n, d, np.radians(theta_deg), wavelength)[2]
+    idx = np.argmin(Rp)
+    left = theta_deg[max(idx - 1, 0)]
+    right = theta_deg[min(idx + 1, coarse_points - 1)]
+    return left, right
+
+
+def refine_resonance(n, d, wavelength, bracket, xtol_deg=1e-6, use_derivative=True):
+    """
+    Converges on the minimum of Rp(theta) inside ``bracket`` (degrees) by
+    calling the Fresnel model on demand.
+
+    With ``use_derivative`` the root of the analytic dRp/dtheta is found with
+    Brent's method; if the bracket does not change the sign of the derivative
+    a bounded scalar minimization on Rp is used instead.
+
+    Returns:
+        theta_res (deg), number of Fresnel evaluations.
+    """
+    calls = [0]
+
+    def Rp_at(theta_deg):
+        calls[0] += 1
+        return getFresnelAIM_batch(n, d, np.radians([theta_deg]), wavelength)[2][..., 0]
+
+    def dRp_at(theta_deg):
+        calls[0] += 1
+        return getFresnelAIM_derivative(n, d, np.radians([theta_deg]), wavelength)[3][..., 0]
+
+    left, right = bracket
+    if use_derivative:
+        g_left, g_right = dRp_at(left), dRp_at(right)
+        if g_left < 0 < g_right:
+            theta_res = brentq(dRp_at, left, right, xtol=xtol_deg, rtol=4 * np.finfo(float).eps)
+            return theta_res, calls[0]
+
+    result = minimize_scalar(Rp_at, bounds=(left, right), method="bounded",
+                             options={"xatol": xtol_deg})
+    return result.x, calls[0]
+
+
+def find_theta_res(n, d, wavelength, theta_window=(40, 80), coarse_points=81,
+                   xtol_deg=1e-6, use_derivative=True, full_output=False):
+    """
+    Sweep-free resonance angle: coarse bracket of the dip followed by a
+    direct solve on the analytic reflectance, without building a curve.
+
+    Parameters:
+        n (array): Refractive indices of a single stack.
+        d (array): Internal-layer thicknesses in meters.
+        wavelength (float): Wavelength in meters.
+        theta_window (tuple): Search window in degrees.
+        coarse_points (int): Points of the bracketing grid (one batched call).
+        xtol_deg (float): Absolute tolerance on theta_res in degrees.
+        use_derivative (bool): Solve dRp/dtheta = 0 with the analytic derivative.
+        full_output (bool): Also return the number of Fresnel evaluations.
+
+    Returns:
+        theta_res in degrees (and evaluation count if ``full_output``).
+    """
+    bracket = bracket_resonance(n, d, wavelength, theta_window, coarse_points)
+    theta_res, calls = refine_resonance(n, d, wavelength, bracket, xtol_deg, use_derivative)
+    if full_output:
+        return theta_res, coarse_points + calls
+    return theta_res
+
+
+def run_theta_res_only(substrate, metal, analytes, materials, lambda0,
+                       d_cr, metal_thicknesses_nm, theta_window=(40, 80), continuation=False):
+    """
+    Metric-only counterpart of run_reflectance_simulation: fills
+    results["theta_res"][(metal, analyte)] using find_theta_res, without
+    materializing reflectance curves or figures. With ``continuation`` the
+    thickness axis is followed with track_theta_res instead (one full solve,
+    then warm-started local solves).
+    """
+    results = {"theta_res": {}, "substrate": substrate}
+    for analyte in analytes:
+        if continuation:
+            build_stack = make_stack_builder(materials, substrate, metal, analyte, lambda0,
+                                             d_cr, None, vary="metal_thickness_nm")
+            results["theta_res"][(metal, analyte)] = track_theta_res(
+                build_stack, metal_thicknesses_nm, theta_window
+            ).tolist()
+            continue
+
+        n = np.array([
+            materials[substrate],
+            materials["Cr"],
+            materials[metal],
+            materials[analyte]
+        ])
+        results["theta_res"][(metal, analyte)] = [
+            find_theta_res(n, np.array([d_cr, d_metal_nm * 1e-9]), lambda0, theta_window)
+            for d_metal_nm in metal_thicknesses_nm
+        ]
+    return results
+
+
+def _expand_bracket(dRp_at, guess, halfwidth, theta_window, max_expand=8):
+    """
+    Grows [guess - w, guess + w] until dRp/dtheta changes sign from negative
+    to positive across it. Returns None if that does not happen.
+    """
+    left, right = guess - halfwidth, guess + halfwidth
+    for _ in range(max_expand):
+        left = max(left, theta_window[0])
+        right = min(right, theta_window[1])
+        g_left, g_right = dRp_at(left), dRp_at(right)
+        if g_left < 0 < g_right:
+            return left, right
+        if g_left >= 0:
+            left -= 2 * halfwidth
+        if g_right <= 0:
+            right += 2 * halfwidth
+        halfwidth *= 2
+    return None
+
+
+def solve_resonance_near(n, d, wavelength, guess, halfwidth_deg=0.02,
+                         theta_window=(40, 80), xtol_deg=1e-6):
+    """
+    Solves dRp/dtheta = 0 starting from a guess of theta_res (degrees),
+    growing a local bracket around it. Falls back to find_theta_res over
+    the whole window if the dip cannot be bracketed.
+
+    Returns:
+        theta_res (deg), number of Fresnel evaluations.
+    """
+    calls = [0]
+
+    def dRp_at(theta_deg):
+        calls[0] += 1
+        return getFresnelAIM_derivative(n, d, np.radians([theta_deg]), wavelength)[3][..., 0]
+
+    bracket = _expand_bracket(dRp_at, guess, halfwidth_deg, theta_window)
+    if bracket is None:
+        theta_res, evaluations = find_theta_res(n, d, wavelength, theta_window,
+                                                xtol_deg=xtol_deg, full_output=True)
+        return theta_res, evaluations + calls[0]
+
+    theta_res = brentq(dRp_at, bracket[0], bracket[1], xtol=xtol_deg,
+                       rtol=4 * np.finfo(float).eps)
+    return theta_res, calls[0]
+
+
+def track_theta_res(build_stack, parameter_values, theta_window=(40, 80),
+                    halfwidth_deg=0.02, xtol_deg=1e-6, full_output=False):
+    """
+    Continuation tracking of theta_res along a 1-D sweep (metal thickness,
+    analyte index, wavelength, Cr thickness, ...).
+
+    The first point is solved with find_theta_res; every later point is
+    seeded with the previous theta_res plus a secant predictor from the last
+    two steps, so the root of dRp/dtheta is bracketed with a few evaluations.
+
+    Parameters:
+        build_stack (callable): value -> (n, d, wavelength).
+        parameter_values (array): Monotonic sweep values.
+        theta_window (tuple): Allowed angular range in degrees.
+        halfwidth_deg (float): Initial half-width of the local bracket.
+        xtol_deg (float): Absolute tolerance on theta_res in degrees.
+        full_output (bool): Also return Fresnel evaluations per step.
+
+    Returns:
+        array of theta_res (deg) (and evaluations per step if ``full_output``).
+    """
+    parameter_values = np.asarray(parameter_values, dtype=float)
+    theta_res = np.empty(len(parameter_values))
+    evaluations = np.zeros(len(parameter_values), dtype=int)
+
+    for i, value in enumerate(parameter_values):
+        n, d, wavelength = build_stack(value)
+
+        if i == 0:
+            theta_res[i], evaluations[i] = find_theta_res(n, d, wavelength, theta_window,
+                                                          xtol_deg=xtol_deg, full_output=True)
+            continue
+
+        guess = theta_res[i - 1]
+        if i > 1:
+            slope = (theta_res[i - 1] - theta_res[i - 2]) / (parameter_values[i - 1] - parameter_values[i - 2])
+            guess += slope * (value - parameter_values[i - 1])
+        theta_res[i], evaluations[i] = solve_resonance_near(n, d, wavelength, guess, halfwidth_deg,
+                                                            theta_window, xtol_deg)
+
+    if full_output:
+        return theta_res, evaluations
+    return theta_res
+
+
+def make_stack_builder(materials, substrate, metal, analyte, lambda0, d_cr, d_metal_nm,
+                       vary="metal_thickness_nm"):
+    """
+    Builds the ``build_stack`` callable for track_theta_res for the usual
+    substrate/Cr/metal/analyte structure, varying one of:
+    "metal_thickness_nm", "analyte_index", "wavelength" (m) or "d_cr" (m).
+    The optical constants stay those of ``materials``.
+    """
+    if vary not in {"metal_thickness_nm", "analyte_index", "wavelength", "d_cr"}:
+        raise ValueError(f"Unsupported sweep parameter: {vary}")
+
+    def build_stack(value):
+        n_analyte = value if vary == "analyte_index" else materials[analyte]
+        thickness_nm = value if vary == "metal_thickness_nm" else d_metal_nm
+        cr = value if vary == "d_cr" else d_cr
+        wavelength = value if vary == "wavelength" else lambda0
+        n = np.array([
+            materials[substrate],
+            materials["Cr"],
+            materials[metal],
+            n_analyte
+        ], dtype=complex)
+        return n, np.array([cr, thickness_nm * 1e-9]), wavelength
+
+    return build_stack
+
+
+def calculate_sensitivity_analytic(n, d, wavelength, theta_res=None, theta_window=(40, 80)):
+    """
+    dtheta_res/dn_analyte from a single resonance solve, by implicit
+    differentiation of g = dRp/dtheta = 0:
+
+        dtheta_res/dn = -(dg/dn) / (dg/dtheta)
+
+    Both partials of g (d2Rp/dtheta2 and d2Rp/dtheta dn) come exactly from
+    the second-order forward-mode kernel getFresnelAIM_curvature at the
+    root, so the result carries no angular-grid quantization and no
+    finite-difference step.
+
+    Parameters:
+        n (array): Refractive indices; the analyte is the last entry.
+        d (array): Internal-layer thicknesses in meters.
+        wavelength (float): Wavelength in meters.
+        theta_res (float): Optional seed for theta_res in degrees.
+        theta_window (tuple): Search window in degrees when no seed is given.
+
+    Returns:
+        Sensitivity in deg/RIU.
+    """
+    n = np.asarray(n, dtype=complex)
+    if theta_res is None:
+        theta_res = find_theta_res(n, d, wavelength, theta_window)
+    else:
+        theta_res = solve_resonance_near(n, d, wavelength, theta_res, theta_window=theta_window)[0]
+
+    return sensitivity_at_resonance(n, d, wavelength, theta_res)
+
+
+def sensitivity_at_resonance(n, d, wavelength, theta_res):
+    """
+    The implicit-differentiation step of calculate_sensitivity_analytic
+    for resonance angles that are already solved, batched: one curvature
+    call for many stacks.
+
+    Parameters:
+        n (array): Refractive indices (L,); the analyte is the last entry.
+        d (array): Internal-layer thicknesses in meters, (L-2,) or (..., L-2).
+        wavelength (float): Wavelength in meters.
+        theta_res (float | array): Roots of dRp/dtheta in degrees, one per
+            stack (broadcast against the leading axes of ``d``).
+
+    Returns:
+        Sensitivity in deg/RIU, shape of the broadcast stacks.
+    """
+    n = np.asarray(n, dtype=complex)
+    theta = np.radians(np.asarray(theta_res, dtype=float))[..., np.newaxis]
+
+    # Direção v: apenas o índice do analyte (última camada)
+    dn = np.zeros(n.shape[-1])
+    dn[-1] = 1.0
+    _, _, dg_dtheta, dg_dn = getFresnelAIM_curvature(n, d, theta, wavelength, dn=dn)
+    return np.degrees(-dg_dn[..., 0] / dg_dtheta[..., 0])
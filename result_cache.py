@@ -0,0 +1,147 @@
+import hashlib
+import os
+import zipfile
+import numpy as np
+
+CACHE_VERSION = "aim-tmm-3"  # mudar quando o modelo físico mudar
+DEFAULT_CACHE_DIR = os.environ.get("SPR_CACHE_DIR", ".spr_cache")
+DEFAULT_MAX_BYTES = 512 * 1024**2
+
+
+def make_cache_key(*parts):
+    """
+    Content hash of the simulation inputs. Arrays contribute dtype, shape
+    and raw bytes; other values their repr.
+    """
+    h = hashlib.sha256(CACHE_VERSION.encode())
+    for part in parts:
+        if isinstance(part, (np.ndarray, list, tuple)):
+            arr = np.ascontiguousarray(np.asarray(part))
+            h.update(str((arr.dtype.str, arr.shape)).encode())
+            h.update(arr.tobytes())
+        else:
+            h.update(repr(part).encode())
+        h.update(b"|")
+    return h.hexdigest()
+
+
+class ReflectanceCache:
+    """
+    On-disk cache of reflectance curves and derived metrics.
+
+    Entries are compressed .npz files named by the content hash of their
+    inputs (refractive-index stack, thicknesses, wavelength, angle grid).
+    The total size is capped; the least recently used entries (by file
+    modification time, refreshed on every hit) are evicted first.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """Returns the stored dict of arrays, or None on a miss."""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                entry = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+            # Entrada truncada/corrompida: conta como miss e é descartada
+            print(f"[WARNING] Discarding unreadable cache entry: {path}")
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return entry
+
+    def put(self, key, arrays):
+        """Stores a dict of arrays under ``key`` and enforces the size cap."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._evict()
+
+    def cached(self, key, compute):
+        """Returns the entry for ``key``, calling ``compute()`` on a miss."""
+        entry = self.get(key)
+        if entry is None:
+            entry = compute()
+            self.put(key, entry)
+        return entry
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue  # removido por outro processo
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            os.remove(path)
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+    def report(self):
+        s = self.stats()
+        print(f"[INFO] Cache: {s['hits']} hits, {s['misses']} misses, "
+              f"{s['entries']} entries ({s['bytes'] / 1024**2:.1f} MB) in {self.cache_dir}")
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """
+    Process-wide cache shared by the simulation modes. Disabled (returns
+    None) when the environment variable SPR_CACHE is set to "0".
+    """
+    global _default_cache
+    if os.environ.get("SPR_CACHE", "1") == "0":
+        return None
+    if _default_cache is None:
+        _default_cache = ReflectanceCache()
+    return _default_cache
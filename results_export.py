@@ -0,0 +1,285 @@
+"""
+Binary export of a results_store.ResultsStore: the full reflectance curves,
+every metric column and the run metadata in one file, so figures and
+downstream analysis can start from disk instead of re-simulating.
+
+Formats (chosen by ``fmt`` or the file extension):
+    "npz"     NumPy only (default). Members are stored uncompressed and the
+              curves are written in chunks; load_results memory-maps them
+              back. ``compress=True`` trades the memory map for a smaller
+              deflated file.
+    "hdf5"    h5py. Chunked, gzip-compressed datasets.
+    "parquet" pyarrow. One row per curve (labels, metrics and the curve as a
+              fixed-size list), written one row group per chunk.
+Compressed files are decompressed on load.
+"""
+import json
+import os
+import zipfile
+from datetime import datetime
+import numpy as np
+from results_store import ResultsStore, DIMS
+
+FORMAT_VERSION = 1
+FORMATS = {".npz": "npz", ".h5": "hdf5", ".hdf5": "hdf5", ".parquet": "parquet"}
+EXTENSIONS = {"npz": ".npz", "hdf5": ".h5", "parquet": ".parquet"}
+DEFAULT_CHUNK_CURVES = 256
+
+
+def _format_of(path, fmt):
+    if fmt is not None:
+        if fmt not in FORMATS.values():
+            raise ValueError(f"Unknown export format: {fmt} (use npz, hdf5 or parquet)")
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Cannot infer export format from extension {ext!r}")
+    return FORMATS[ext]
+
+
+def _metadata(store, metadata):
+    # Metadados da run = attrs do store + ``metadata``; voltam como store.attrs
+    attrs = {"created": datetime.now().isoformat(timespec="seconds"), **store.attrs, **(metadata or {})}
+    return {
+        "format_version": FORMAT_VERSION,
+        "dims": list(DIMS),
+        "substrate": store.coords["substrate"],
+        "metal": store.coords["metal"],
+        "analyte": store.coords["analyte"],
+        "columns": list(store.columns),
+        "attrs": {k: v.item() if isinstance(v, np.generic) else v for k, v in attrs.items()},
+    }
+
+
+def _curve_chunks(store, chunk_curves):
+    """Yields (start, stop, block) over the curves flattened to (S*M*A*T, N)."""
+    curves = store.reflectance.reshape(-1, store.reflectance.shape[-1])
+    for start in range(0, len(curves), chunk_curves):
+        stop = min(start + chunk_curves, len(curves))
+        yield start, stop, curves[start:stop]
+
+
+def export_results(store, path, fmt=None, metadata=None, compress=False,
+                   chunk_curves=DEFAULT_CHUNK_CURVES):
+    """
+    Writes ``store`` (curves, metric columns, coordinates and metadata).
+
+    Parameters:
+        store (ResultsStore): Results to export.
+        path (str): Output file; the extension selects the format when
+            ``fmt`` is None (.npz, .h5/.hdf5, .parquet).
+        fmt (str): "npz", "hdf5" or "parquet".
+        metadata (dict): Extra JSON-serializable run metadata, stored with
+            ``store.attrs`` (both come back as the loaded store's attrs).
+        compress (bool): Deflate the NPZ members (disables memory mapping).
+        chunk_curves (int): Curves written per chunk.
+
+    Returns:
+        The path written.
+    """
+    fmt = _format_of(path, fmt)
+    meta = _metadata(store, metadata)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    try:
+        if fmt == "npz":
+            _export_npz(store, tmp_path, meta, compress, chunk_curves)
+        elif fmt == "hdf5":
+            _export_hdf5(store, tmp_path, meta, chunk_curves)
+        else:
+            _export_parquet(store, tmp_path, meta, chunk_curves)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    print(f"[INFO] Results exported to: {path}")
+    return path
+
+
+def load_results(path, fmt=None, mmap=True):
+    """
+    Reads a file written by export_results back into a ResultsStore.
+
+    With ``mmap`` the curves of an uncompressed NPZ are a read-only
+    np.memmap: nothing is read until a curve is accessed.
+    """
+    fmt = _format_of(path, fmt)
+    if fmt == "npz":
+        return _load_npz(path, mmap)
+    if fmt == "hdf5":
+        return _load_hdf5(path)
+    return _load_parquet(path)
+
+
+def _build_store(meta, thickness, angle, reflectance, columns):
+    store = ResultsStore(meta["substrate"], meta["metal"], meta["analyte"], thickness, angle,
+                         reflectance, **meta["attrs"])
+    for name in meta["columns"]:
+        store.set_column(name, columns[name])
+    return store
+
+
+# --- NPZ ---------------------------------------------------------------------
+
+def _write_npy_member(zf, name, array, chunks=None):
+    # Cabeçalho .npy seguido dos dados, em blocos quando ``chunks`` é dado
+    array = np.asarray(array)
+    with zf.open(f"{name}.npy", "w", force_zip64=True) as f:
+        np.lib.format.write_array_header_2_0(f, np.lib.format.header_data_from_array_1_0(array))
+        if chunks is None:
+            f.write(np.ascontiguousarray(array).tobytes())
+        else:
+            for _, _, block in chunks:
+                f.write(np.ascontiguousarray(block).tobytes())
+
+
+def _export_npz(store, path, meta, compress, chunk_curves):
+    mode = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    with zipfile.ZipFile(path, "w", compression=mode, allowZip64=True) as zf:
+        _write_npy_member(zf, "metadata", np.array(json.dumps(meta)))
+        _write_npy_member(zf, "thickness", store.coords["thickness"])
+        if store.coords["angle"] is not None:
+            _write_npy_member(zf, "angle", store.coords["angle"])
+        for name, column in store.columns.items():
+            _write_npy_member(zf, f"column_{name}", column)
+        if store.reflectance is not None:
+            _write_npy_member(zf, "reflectance", store.reflectance,
+                              _curve_chunks(store, chunk_curves))
+
+
+def _memmap_member(path, zf, name):
+    """Memory-maps an uncompressed .npy member of a zip file, or None."""
+    info = zf.getinfo(f"{name}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(path, "rb") as f:
+        # Cabeçalho local do zip: 30 bytes + nome + campo extra
+        f.seek(info.header_offset + 26)
+        name_len, extra_len = np.frombuffer(f.read(4), dtype="<u2")
+        f.seek(info.header_offset + 30 + int(name_len) + int(extra_len))
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape,
+                     order="F" if fortran else "C")
+
+
+def _load_npz(path, mmap):
+    with np.load(path) as data:
+        meta = json.loads(str(data["metadata"]))
+        thickness = data["thickness"]
+        angle = data["angle"] if "angle" in data.files else None
+        columns = {name: data[f"column_{name}"] for name in meta["columns"]}
+        reflectance = None
+        if "reflectance" in data.files:
+            if mmap:
+                with zipfile.ZipFile(path) as zf:
+                    reflectance = _memmap_member(path, zf, "reflectance")
+            if reflectance is None:
+                reflectance = data["reflectance"]
+    return _build_store(meta, thickness, angle, reflectance, columns)
+
+
+# --- HDF5 --------------------------------------------------------------------
+
+def _import_h5py():
+    try:
+        import h5py
+    except ImportError as e:
+        raise ImportError("h5py is required for HDF5 export (pip install h5py)") from e
+    return h5py
+
+
+def _export_hdf5(store, path, meta, chunk_curves):
+    h5py = _import_h5py()
+    with h5py.File(path, "w") as f:
+        f.attrs["metadata"] = json.dumps(meta)
+        f.create_dataset("thickness", data=store.coords["thickness"])
+        if store.coords["angle"] is not None:
+            f.create_dataset("angle", data=store.coords["angle"])
+        for name, column in store.columns.items():
+            f.create_dataset(f"columns/{name}", data=column, compression="gzip", shuffle=True)
+        if store.reflectance is not None:
+            n_curves = int(np.prod(store.shape))
+            n_angles = store.reflectance.shape[-1]
+            dset = f.create_dataset("reflectance", shape=(n_curves, n_angles), dtype="f8",
+                                    chunks=(min(chunk_curves, n_curves), n_angles),
+                                    compression="gzip", shuffle=True)
+            for start, stop, block in _curve_chunks(store, chunk_curves):
+                dset[start:stop] = block
+
+
+def _load_hdf5(path):
+    h5py = _import_h5py()
+    with h5py.File(path, "r") as f:
+        meta = json.loads(f.attrs["metadata"])
+        columns = {name: f[f"columns/{name}"][()] for name in meta["columns"]}
+        angle = f["angle"][()] if "angle" in f else None
+        reflectance = None
+        if "reflectance" in f:
+            shape = tuple(len(meta[dim]) for dim in DIMS[:3]) + (len(f["thickness"]), len(angle))
+            reflectance = f["reflectance"][()].reshape(shape)
+        return _build_store(meta, f["thickness"][()], angle, reflectance, columns)
+
+
+# --- Parquet -----------------------------------------------------------------
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("pyarrow is required for Parquet export (pip install pyarrow)") from e
+    return pa, pq
+
+
+def _export_parquet(store, path, meta, chunk_curves):
+    pa, pq = _import_pyarrow()
+    # Eixos ficam nos metadados; cada linha guarda os rótulos da curva
+    meta = {**meta, "thickness": store.coords["thickness"].tolist(),
+            "angle": None if store.coords["angle"] is None else store.coords["angle"].tolist()}
+    labels = np.indices(store.shape).reshape(len(store.shape), -1)
+    flat_columns = {name: column.reshape(-1) for name, column in store.columns.items()}
+    n_curves = labels.shape[1]
+    n_angles = 0 if store.reflectance is None else store.reflectance.shape[-1]
+    curves = None if store.reflectance is None else store.reflectance.reshape(n_curves, n_angles)
+
+    writer = None
+    try:
+        for start in range(0, n_curves, chunk_curves):
+            stop = min(start + chunk_curves, n_curves)
+            data = {
+                "substrate": np.asarray(store.coords["substrate"])[labels[0, start:stop]],
+                "metal": np.asarray(store.coords["metal"])[labels[1, start:stop]],
+                "analyte": np.asarray(store.coords["analyte"])[labels[2, start:stop]],
+                "thickness_nm": store.coords["thickness"][labels[3, start:stop]],
+            }
+            data.update({name: values[start:stop] for name, values in flat_columns.items()})
+            arrays = {name: pa.array(values) for name, values in data.items()}
+            if curves is not None:
+                arrays["reflectance"] = pa.FixedSizeListArray.from_arrays(
+                    pa.array(curves[start:stop].reshape(-1)), n_angles)
+            table = pa.table(arrays)
+            if writer is None:
+                schema = table.schema.with_metadata({"spr_metadata": json.dumps(meta)})
+                writer = pq.ParquetWriter(path, schema, compression="zstd")
+            writer.write_table(table.replace_schema_metadata(schema.metadata))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _load_parquet(path):
+    pa, pq = _import_pyarrow()
+    table = pq.read_table(path, memory_map=True)
+    meta = json.loads(table.schema.metadata[b"spr_metadata"])
+    shape = tuple(len(meta[dim]) for dim in DIMS[:3]) + (len(meta["thickness"]),)
+    columns = {name: table.column(name).to_numpy().reshape(shape) for name in meta["columns"]}
+    reflectance = None
+    if "reflectance" in table.column_names:
+        values = table.column("reflectance").combine_chunks().flatten().to_numpy()
+        reflectance = values.reshape(shape + (len(meta["angle"]),))
+    return _build_store(meta, np.asarray(meta["thickness"]), meta["angle"], reflectance, columns)
@@ -0,0 +1,114 @@
+import numpy as np
+
+# Dimensões nomeadas, na ordem dos eixos dos arrays
+DIMS = ("substrate", "metal", "analyte", "thickness", "angle")
+
+
+class ResultsStore:
+    """
+    Columnar results of a substrate x metal x analyte x thickness sweep.
+
+    The reflectance curves live in one contiguous (S, M, A, T, N) array and
+    every scalar metric (theta_res, fwhm, q_empirical, ...) is a column of
+    shape (S, M, A, T) in ``columns``. Selections by label return NumPy
+    views, so slicing a substrate, metal or analyte never copies data.
+
+    Parameters:
+        substrates, metals, analytes (list): Labels of the first three axes.
+        thicknesses_nm (array): Metal thicknesses (thickness axis).
+        theta_deg (array): Angles of the curves (angle axis), if any.
+        reflectance (array): (S, M, A, T, N) curves, or None for metric-only runs.
+        **attrs: Run metadata kept alongside the data (lambda0, d_cr, ...).
+    """
+
+    def __init__(self, substrates, metals, analytes, thicknesses_nm, theta_deg=None,
+                 reflectance=None, **attrs):
+        self.coords = {
+            "substrate": list(substrates),
+            "metal": list(metals),
+            "analyte": list(analytes),
+            "thickness": np.asarray(thicknesses_nm),
+            "angle": None if theta_deg is None else np.asarray(theta_deg),
+        }
+        self.shape = tuple(len(self.coords[dim]) for dim in DIMS[:4])
+        if reflectance is not None:
+            reflectance = np.ascontiguousarray(reflectance, dtype=float)
+            expected = self.shape + (len(self.coords["angle"]),)
+            if reflectance.shape != expected:
+                raise ValueError(f"reflectance has shape {reflectance.shape}, expected {expected}")
+        self.reflectance = reflectance
+        self.columns = {}
+        self.attrs = dict(attrs)
+
+    def index(self, dim, label):
+        """Position of ``label`` along ``dim``."""
+        values = self.coords[dim]
+        if dim in ("thickness", "angle"):
+            match = np.flatnonzero(np.isclose(values, label))
+            if not len(match):
+                raise KeyError(f"{label} not in {dim} axis")
+            return int(match[0])
+        try:
+            return values.index(label)
+        except ValueError:
+            raise KeyError(f"{label!r} not in {dim} axis") from None
+
+    def _locate(self, labels):
+        unknown = set(labels) - set(DIMS[:4])
+        if unknown:
+            raise KeyError(f"Unknown dimension(s): {', '.join(sorted(unknown))}")
+        return tuple(
+            self.index(dim, labels[dim]) if labels.get(dim) is not None else slice(None)
+            for dim in DIMS[:4]
+        )
+
+    def curves(self, **labels):
+        """Reflectance view for the given labels (unset dimensions are kept)."""
+        if self.reflectance is None:
+            raise KeyError("No reflectance curves stored (metric-only run)")
+        return self.reflectance[self._locate(labels)]
+
+    def column(self, name, **labels):
+        """View of a metric column for the given labels."""
+        return self.columns[name][self._locate(labels)]
+
+    def set_column(self, name, values, **labels):
+        """
+        Writes ``values`` (broadcast) into a metric column, creating it as
+        NaN-filled on first use.
+        """
+        if name not in self.columns:
+            self.columns[name] = np.full(self.shape, np.nan)
+        self.columns[name][self._locate(labels)] = values
+
+    def substrate_results(self, substrate):
+        """
+        Per-substrate dict in the layout used by the plotting and CSV
+        helpers: every column as {(metal, analyte): view} plus the metadata.
+        """
+        s = self.index("substrate", substrate)
+        results = {
+            "substrate": substrate,
+            "theta_deg": self.coords["angle"],
+            "metal_thicknesses_nm": self.coords["thickness"],
+            **self.attrs,
+        }
+        pairs = [(m, metal, a, analyte)
+                 for m, metal in enumerate(self.coords["metal"])
+                 for a, analyte in enumerate(self.coords["analyte"])]
+        for name, column in self.columns.items():
+            results[name] = {(metal, analyte): column[s, m, a] for m, metal, a, analyte in pairs}
+        if self.reflectance is not None:
+            results["reflectance"] = {(metal, analyte): self.reflectance[s, m, a]
+                                      for m, metal, a, analyte in pairs}
+        return results
+
+    @property
+    def nbytes(self):
+        total = sum(column.nbytes for column in self.columns.values())
+        return total + (0 if self.reflectance is None else self.reflectance.nbytes)
+
+    def __repr__(self):
+        sizes = ", ".join(f"{dim}: {len(self.coords[dim])}" for dim in DIMS
+                          if self.coords[dim] is not None)
+        return f"ResultsStore({sizes}; columns: {', '.join(self.columns)})"
@@ -1,31 +1,38 @@
 import pandas as pd
 
+# Coluna do CSV -> chave de ``results`` (ausente = coluna vazia)
+CSV_COLUMNS = {
+    "Theta_res_deg": "theta_res",
+    "FWHM_deg": "fwhm",
+    "Sensitivity_Theoretical_deg_per_RIU": "sensitivity_theoretical",
+    "Chi_Theoretical": "chi_theoretical",
+    "Q_Theoretical": "q_theoretical",
+    "Sensitivity_Analytic_deg_per_RIU": "sensitivity_analytic",
+    "Chi_Analytic": "chi_analytic",
+    "Penetration_Depth_nm": "penetration_depth_nm",
+    "Hy2_Enhancement": "hy2_enhancement",
+    "E2_Enhancement": "e2_enhancement",
+}
+
 def save_results_to_csv(results, metal_thicknesses_nm, analytes_dict, filename="results_spr.csv"):
     """
     Saves theoretical figures of merit for each metal-analyte pair to a CSV file.
     """
-    all_rows = []
+    columns = {name: [] for name in ("Metal", "Analyte", "Metal_Thickness_nm", *CSV_COLUMNS)}
 
     for metal in ["Ag", "Au", "Cu"]:
         for analyte_key, analyte_value in analytes_dict.items():
             key = (metal, analyte_key)
 
             row_count = len(results["theta_res"].get(key, []))
-            thicknesses = metal_thicknesses_nm[:row_count]
 
-            for i in range(row_count):
-                row = {
-                    "Metal": metal,
-                    "Analyte": analyte_key,
-                    "Metal_Thickness_nm": thicknesses[i],
-                    "Theta_res_deg": results["theta_res"].get(key, [None]*row_count)[i],
-                    "FWHM_deg": results["fwhm"].get(key, [None]*row_count)[i],
-                    "Sensitivity_Theoretical_deg_per_RIU": results.get("sensitivity_theoretical", {}).get(key, [None]*row_count)[i],
-                    "Chi_Theoretical": results.get("chi_theoretical", {}).get(key, [None]*row_count)[i],
-                    "Q_Theoretical": results.get("q_theoretical", {}).get(key, [None]*row_count)[i],
-                }
-                all_rows.append(row)
+            # Colunas inteiras por par metal/analyte, em vez de um dict por linha
+            columns["Metal"] += [metal] * row_count
+            columns["Analyte"] += [analyte_key] * row_count
+            columns["Metal_Thickness_nm"] += list(metal_thicknesses_nm[:row_count])
+            for column, name in CSV_COLUMNS.items():
+                columns[column] += list(results.get(name, {}).get(key, [None] * row_count))[:row_count]
 
-    df = pd.DataFrame(all_rows)
+    df = pd.DataFrame(columns) if columns["Metal"] else pd.DataFrame()
     df.to_csv(filename, index=False)
     print(f"[INFO] Results saved to: {filename}")
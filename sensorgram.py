@@ -0,0 +1,268 @@
+"""
+Streaming sensorgram: angular reflectance frames in, theta_res(t) and the
+estimated analyte index n(t) out, one frame at a time.
+
+Frames come from any iterable of (N,) arrays sampled on a fixed angular
+grid (a line detector): simulated_frames computes them in batches from an
+analyte-index time series, file_frames reads (and optionally follows) a raw
+binary dump written by an acquisition program.
+
+SensorgramTracker keeps every per-frame cost independent of the sweep
+machinery: the argmin is searched only around the previous dip (falling
+back to the whole window when the dip leaves that region), the sub-grid
+refinement reuses the polynomial of find_resonance_batch with its inverse
+Vandermonde matrices precomputed for every pixel
+(performance_metrics.polynomial_window_basis), and the results go into
+preallocated ring buffers. theta_res is converted to n through a
+calibration curve theta_res(n) simulated once on the same grid.
+"""
+import time
+import numpy as np
+from fresnel_backend import getFresnelAIM_batch
+from performance_metrics import (
+    find_resonance_batch, polynomial_window_basis, polynomial_window_minimum_1d,
+    RES_OK, RES_EDGE, RES_NOT_FINITE, RES_FALLBACK
+)
+from instrumentation import stage, count
+from optical_data import materials as default_materials
+from simulation_config import lambda0, d_cr
+
+
+def _stack(substrate, metal, n_analyte, materials):
+    n = np.empty((len(n_analyte), 4), dtype=complex)
+    n[:, 0] = materials[substrate]
+    n[:, 1] = materials["Cr"]
+    n[:, 2] = materials[metal]
+    n[:, 3] = n_analyte
+    return n
+
+
+def calibration_curve(substrate, metal, d_metal_nm, theta_deg, n_range=(1.30, 1.40), points=201,
+                      theta_window=None, materials=None):
+    """
+    theta_res as a function of the analyte index, from one batched Fresnel
+    call on the detector grid (so that the grid error of the tracker cancels).
+
+    Parameters:
+        substrate, metal (str): Keys of ``materials`` (default: optical_data).
+        d_metal_nm (float): Metal thickness (Cr: simulation_config.d_cr).
+        theta_deg (array): Detector angles (deg).
+        n_range (tuple): Analyte indices covered.
+        points (int): Calibration points.
+        theta_window (tuple): Window for theta_res (deg).
+
+    Returns:
+        theta_res, n_analyte: ascending arrays of the unflagged points.
+    """
+    materials = materials or default_materials
+    n_analyte = np.linspace(*n_range, points)
+    Rp = getFresnelAIM_batch(_stack(substrate, metal, n_analyte, materials),
+                             [d_cr, d_metal_nm * 1e-9], np.radians(theta_deg), lambda0)[2]
+    theta_res, _, status = find_resonance_batch(theta_deg, Rp, theta_window)
+    valid = status == RES_OK
+    theta_res, n_analyte = theta_res[valid], n_analyte[valid]
+    if len(theta_res) < 2 or np.any(np.diff(theta_res) <= 0):
+        raise ValueError(f"theta_res is not monotonic in n over {n_range} for {substrate}/{metal}; "
+                         f"narrow the calibration range.")
+    return theta_res, n_analyte
+
+
+def simulated_frames(substrate, metal, n_analyte_series, d_metal_nm, theta_deg, noise=0.0, seed=0,
+                     batch=256, materials=None):
+    """
+    Reflectance frames of a stack whose analyte index follows
+    ``n_analyte_series``, computed ``batch`` frames per Fresnel call, with
+    optional Gaussian read noise of standard deviation ``noise``.
+
+    Yields:
+        (N,) arrays, views into the current batch (copy them to keep them
+        beyond the next ``batch`` frames).
+    """
+    materials = materials or default_materials
+    rng = np.random.default_rng(seed)
+    theta_rad = np.radians(theta_deg)
+    n_analyte_series = np.asarray(n_analyte_series, dtype=float)
+    for start in range(0, len(n_analyte_series), batch):
+        n = _stack(substrate, metal, n_analyte_series[start:start + batch], materials)
+        Rp = getFresnelAIM_batch(n, [d_cr, d_metal_nm * 1e-9], theta_rad, lambda0)[2]
+        if noise:
+            Rp += rng.normal(0.0, noise, Rp.shape)
+        yield from Rp
+
+
+def file_frames(path, n_pixels, dtype="<f8", follow=False, poll_s=0.002, timeout_s=1.0):
+    """
+    Frames from a raw binary file of consecutive frames of ``n_pixels``
+    values. With ``follow`` the file is tailed: the generator waits for
+    frames appended by the acquisition and stops after ``timeout_s``
+    without new data.
+
+    Yields:
+        The same preallocated (n_pixels,) buffer, refilled for every frame.
+    """
+    frame = np.empty(n_pixels, dtype=np.dtype(dtype))
+    raw = frame.view(np.uint8)
+    filled = 0
+    idle = 0.0
+    with open(path, "rb") as f:
+        while True:
+            got = f.readinto(raw[filled:]) or 0
+            filled += got
+            if filled == raw.size:
+                filled = 0
+                idle = 0.0
+                yield frame
+            elif not got:
+                if not follow or idle >= timeout_s:
+                    if filled:
+                        print(f"[WARNING] {path}: trailing partial frame ({filled} bytes) ignored.")
+                    return
+                time.sleep(poll_s)
+                idle += poll_s
+
+
+class SensorgramTracker:
+    """
+    Incremental dip tracker for frames sampled on one angular grid.
+
+    Parameters:
+        theta_deg (array): Detector angles (N,), ascending.
+        calibration (tuple): (theta_res, n_analyte) from calibration_curve;
+            None leaves n_analyte as NaN.
+        theta_window (tuple): Window for theta_res (deg).
+        search_half_width (int): Pixels searched on each side of the
+            previous dip.
+        half_width (int): Refinement half width (as in find_resonance_batch).
+        capacity (int): Sensorgram samples kept (ring buffer).
+
+    update() returns (theta_res, n_analyte, status) with the RES_* flags of
+    performance_metrics (RES_SHALLOW is not checked per frame).
+    """
+
+    def __init__(self, theta_deg, calibration=None, theta_window=None, search_half_width=40,
+                 half_width=3, capacity=65536):
+        self.theta_deg = np.asarray(theta_deg, dtype=float)
+        n = len(self.theta_deg)
+        if theta_window is None:
+            self._lo, self._hi = 0, n
+        else:
+            self._lo = int(np.searchsorted(self.theta_deg, theta_window[0]))
+            self._hi = int(np.searchsorted(self.theta_deg, theta_window[1], side="right"))
+        self.search_half_width = search_half_width
+        self.half_width = half_width
+        self.calibration = calibration
+
+        # Matrizes do ajuste polinomial pré-calculadas para todos os pixels
+        centers = np.arange(half_width, n - half_width)
+        size = 2 * half_width + 1
+        self._basis = np.zeros((n, size, size))
+        self._span = np.zeros(n)
+        self._basis[centers], self._span[centers] = polynomial_window_basis(self.theta_deg, centers, half_width)
+        self._coeffs = np.empty(size)
+
+        self.capacity = capacity
+        self.time = np.empty(capacity)
+        self.theta_res = np.empty(capacity)
+        self.n_analyte = np.empty(capacity)
+        self.status = np.empty(capacity, dtype=np.uint8)
+        self.latency_s = np.empty(capacity)
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.reacquired = 0
+        self._previous = None
+
+    def update(self, frame, timestamp=None):
+        """Tracks the dip of one frame and appends it to the sensorgram."""
+        start = time.perf_counter()
+        lo, hi, h = self._lo, self._hi, self.half_width
+        status = RES_OK
+
+        if self._previous is None:
+            a, b = lo, hi
+        else:
+            a = max(lo, self._previous - self.search_half_width)
+            b = min(hi, self._previous + self.search_half_width + 1)
+        j = a + int(np.argmin(frame[a:b]))
+        if self._previous is not None and ((j == a and a > lo) or (j == b - 1 and b < hi)):
+            # Vale saiu da região de busca: nova busca na janela inteira
+            j = lo + int(np.argmin(frame[lo:hi]))
+            self.reacquired += 1
+
+        if j < lo + h or j > hi - 1 - h:
+            status |= RES_EDGE
+            theta = self.theta_deg[j]
+        else:
+            samples = frame[j - h:j + h + 1]
+            np.dot(self._basis[j], samples, out=self._coeffs)
+            t, _, ok = polynomial_window_minimum_1d(self._coeffs, h)
+            if ok:
+                theta = self.theta_deg[j] + t * self._span[j]
+            else:
+                status |= RES_FALLBACK
+                theta = self.theta_deg[j]
+
+        if not np.isfinite(frame[j]) or not np.isfinite(theta):
+            status, theta = RES_NOT_FINITE, np.nan
+            self._previous = None
+        else:
+            self._previous = j
+
+        if self.calibration is None or np.isnan(theta):
+            n = np.nan
+        else:
+            n = np.interp(theta, *self.calibration, left=np.nan, right=np.nan)
+
+        k = self.frames % self.capacity
+        self.time[k] = start if timestamp is None else timestamp
+        self.theta_res[k] = theta
+        self.n_analyte[k] = n
+        self.status[k] = status
+        self.frames += 1
+        self.latency_s[k] = time.perf_counter() - start
+        return theta, n, status
+
+    def sensorgram(self):
+        """
+        Samples kept in the ring buffer, oldest first (copies): time,
+        theta_res, n_analyte, delta_n (relative to the first valid n kept),
+        status and per-frame latency_s.
+        """
+        kept = min(self.frames, self.capacity)
+        order = (np.arange(kept) + self.frames - kept) % self.capacity
+        data = {name: getattr(self, name)[order] for name in
+                ("time", "theta_res", "n_analyte", "status", "latency_s")}
+        valid = np.flatnonzero(np.isfinite(data["n_analyte"]))
+        baseline = data["n_analyte"][valid[0]] if len(valid) else np.nan
+        data["delta_n"] = data["n_analyte"] - baseline
+        return data
+
+    def latency_summary(self):
+        """Median, 99th percentile and maximum per-frame latency (microseconds)."""
+        latency = self.latency_s[:min(self.frames, self.capacity)] * 1e6
+        if not len(latency):
+            return {"median_us": np.nan, "p99_us": np.nan, "max_us": np.nan}
+        median, p99 = np.percentile(latency, [50, 99])
+        return {"median_us": median, "p99_us": p99, "max_us": latency.max()}
+
+
+def track_frames(frames, tracker, frame_period_s=None):
+    """
+    Feeds ``frames`` to ``tracker`` as they arrive.
+
+    Parameters:
+        frames (iterable): (N,) reflectance frames on tracker.theta_deg.
+        tracker (SensorgramTracker): Tracker (its buffers receive the sensorgram).
+        frame_period_s (float): Time base of the frames; None stamps each
+            frame with its arrival time (time.perf_counter).
+
+    Yields:
+        (time, theta_res, n_analyte, status) per frame, for live consumers.
+    """
+    with stage("sensorgram"):
+        for i, frame in enumerate(frames):
+            timestamp = None if frame_period_s is None else i * frame_period_s
+            theta, n, status = tracker.update(frame, timestamp)
+            yield tracker.time[(tracker.frames - 1) % tracker.capacity], theta, n, status
+    count("sensorgram_frames", tracker.frames)
@@ -28,3 +28,68 @@ config = {
     "analytes": analytes,
     "metal": "Au"  # default metal
 }
+
+# WIM: varredura espectral em ângulo fixo. O ângulo padrão depende do
+# substrato para que a ressonância caia dentro da janela espectral
+# (em 66° o PMMA não tem ressonância entre 500 e 1200 nm)
+theta_wim_deg = {"PMMA": 70.0, "PC": 63.0, "TOPAS": 64.0}
+wavelengths_wim = np.linspace(500e-9, 1200e-9, 3501)  # in meters
+
+# Figuras: com display_figures = False são renderizadas em segundo plano
+# (backend Agg) enquanto a simulação continua
+display_figures = False
+figure_formats = ("png", "eps")
+# Curvas rasterizadas em PDF/SVG (o EPS fica sempre vetorial) e teto de
+# pontos por curva (None = largura do eixo, ~1100 pontos)
+figure_rasterize = False
+figure_max_points = None
+
+# Exportação binária das curvas + métricas (results_export): None, "npz",
+# "hdf5" ou "parquet"; arquivos em outputs/results/
+results_export = None
+
+# Relatório de cada execução (tempos por etapa, contadores, memória) em JSON;
+# profile_runs anexa um cProfile do processo principal
+report_dir = "outputs/reports"
+profile_runs = False
+
+# Processos usados pelos modos 1-3 (sweep_scheduler); None = todos os núcleos
+sweep_workers = None
+
+# Modo 6 (tolerâncias de fabricação, Monte Carlo): desvios em torno do projeto
+# nominal (metal no meio de metal_thicknesses_nm, d_cr, lambda0, índices de
+# optical_data). ("uniform", a) -> U(-a, a); ("normal", s) -> N(0, s)
+fabrication_tolerances = {
+    "metal_thickness_nm": ("uniform", 2.0),
+    "cr_thickness_nm": ("normal", 0.3),
+    "substrate_n": ("normal", 1e-3),
+}
+tolerance_samples = 100000
+tolerance_seed = 0
+# Grade angular do Monte Carlo: 4x mais grossa que theta_deg (erro em θres
+# ~1e-5°, FWHM ~1e-4°, S ~1e-2 deg/RIU) para 4x menos custo por amostra
+tolerance_theta_deg = np.linspace(40, 80, 1001)
+
+# Modo 7 (Sobol): entradas uniformes em nominal ± meia-largura; parâmetros
+# ausentes ficam no valor nominal. N linhas base -> N(2k + 2) avaliações
+sobol_ranges = {
+    "metal_thickness_nm": 2.0,
+    "cr_thickness_nm": 0.5,
+    "metal_n": 0.02,
+    "metal_k": 0.1,
+    "substrate_n": 2e-3,
+    "wavelength_nm": 2.0,
+}
+sobol_base_samples = 512
+sobol_seed = 0
+sobol_bootstrap = 1000
+
+# Modo 8 (sensorgrama): grade angular de um detector linear, série simulada
+# de n_analyte (degrau de analyte_02 para analyte_01 com ruído de leitura em
+# Rp) e faixa de índices da calibração θres -> n_analyte
+sensorgram_theta_deg = np.linspace(40, 80, 1024)
+sensorgram_frames = 20000
+sensorgram_frame_period_s = 1e-3
+sensorgram_noise = 5e-4
+sensorgram_metal_nm = 50.0
+sensorgram_calibration_range = (1.30, 1.40)
@@ -0,0 +1,211 @@
+"""
+Variance-based (Sobol) global sensitivity analysis of one substrate/metal
+stack: which of metal thickness, Cr thickness, metal n and k, substrate
+index and wavelength drive the variance of theta_res, FWHM, S and chi.
+
+The inputs are uniform within ``nominal ± half-width`` (sobol_ranges in
+simulation_config, around tolerance_analysis.nominal_design). A scrambled
+Sobol sequence (scipy.stats.qmc) gives the two base matrices A and B of N
+rows; with the k matrices AB_i (A with column i from B) and the k matrices
+BA_i (B with column i from A) this is the Saltelli design of N(2k + 2)
+rows, evaluated in one pass of tolerance_analysis.evaluate_designs.
+
+Estimators (f centered on the mean of f(A) and f(B), V their variance),
+each averaged over the A- and B-based forms so that every block is used:
+
+    S1_i = [mean(f_B (f_ABi - f_A)) + mean(f_A (f_BAi - f_B))] / 2V   (Saltelli 2010)
+    ST_i = [mean((f_A - f_ABi)^2) + mean((f_B - f_BAi)^2)] / 4V       (Jansen)
+    S2_ij = [mean(f_BAi f_ABj) - mean(f_A f_B)] / V - S1_i - S1_j     (Saltelli 2002)
+
+Confidence intervals of S1 and ST come from a bootstrap over the N base
+rows; S2 is a point estimate.
+"""
+import numpy as np
+from scipy.stats import qmc
+from tolerance_analysis import (
+    PARAMETERS, TOLERANCE_METRICS, nominal_design, evaluate_designs
+)
+from performance_metrics import RES_OK
+from instrumentation import stage, count
+from optical_data import materials as default_materials
+from simulation_config import (
+    analytes as default_analytes, tolerance_theta_deg,
+    sobol_ranges, sobol_base_samples, sobol_seed, sobol_bootstrap
+)
+
+
+def saltelli_design(bounds, n_base, seed=0):
+    """
+    Saltelli design matrix.
+
+    Parameters:
+        bounds (array): (k, 2) lower/upper bound of every input.
+        n_base (int): Rows N of A and B (a power of two keeps the Sobol
+            sequence balanced).
+        seed (int): Scrambling seed.
+
+    Returns:
+        array (N(2k + 2), k): blocks A, B, AB_1..AB_k, BA_1..BA_k.
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    k = len(bounds)
+    base = qmc.Sobol(d=2 * k, scramble=True, seed=seed).random(n_base)
+    base = qmc.scale(base, np.tile(bounds[:, 0], 2), np.tile(bounds[:, 1], 2))
+    A, B = base[:, :k], base[:, k:]
+
+    design = np.empty((2 * k + 2, n_base, k))
+    design[0] = A
+    design[1] = B
+    for i in range(k):
+        design[2 + i] = A
+        design[2 + i, :, i] = B[:, i]
+        design[2 + k + i] = B
+        design[2 + k + i, :, i] = A[:, i]
+    return design.reshape(-1, k)
+
+
+def _first_and_total(fA, fB, fAB, fBA):
+    # Eixo das amostras base por último; funciona com eixos de bootstrap à frente
+    variance = np.concatenate([fA, fB], axis=-1).var(axis=-1)
+    first = (np.mean(fB * (fAB - fA), axis=-1) + np.mean(fA * (fBA - fB), axis=-1)) / (2 * variance)
+    total = (np.mean((fA - fAB) ** 2, axis=-1) + np.mean((fB - fBA) ** 2, axis=-1)) / (4 * variance)
+    return first, total
+
+
+def sobol_indices(outputs, k, n_bootstrap=1000, confidence=0.95, seed=0):
+    """
+    First-order, total and second-order Sobol indices of one output.
+
+    Parameters:
+        outputs (array): Model output on saltelli_design, N(2k + 2) values.
+        k (int): Number of inputs.
+        n_bootstrap (int): Bootstrap resamples of the N base rows.
+        confidence (float): Level of the percentile intervals.
+        seed (int): Bootstrap seed.
+
+    Returns:
+        dict with "first", "total" (k,), "first_ci", "total_ci" (k, 2),
+        "second" (k, k, NaN on the diagonal), "variance" and "n" (base rows
+        used: rows where any block is not finite are dropped).
+    """
+    f = np.asarray(outputs, dtype=float).reshape(2 * k + 2, -1)
+    f = f[:, np.all(np.isfinite(f), axis=0)]
+    n = f.shape[1]
+    if n < 2:
+        nan = np.full(k, np.nan)
+        return {"first": nan, "total": nan, "first_ci": np.full((k, 2), np.nan),
+                "total_ci": np.full((k, 2), np.nan), "second": np.full((k, k), np.nan),
+                "variance": np.nan, "n": n}
+
+    f = f - f[:2].mean()
+    fA, fB, fAB, fBA = f[0], f[1], f[2:2 + k], f[2 + k:]
+    first, total = _first_and_total(fA, fB, fAB, fBA)
+    variance = np.concatenate([fA, fB]).var()
+
+    second = np.full((k, k), np.nan)
+    f0_sq = np.mean(fA * fB)
+    for i in range(k):
+        for j in range(i + 1, k):
+            closed = (np.mean(fBA[i] * fAB[j]) - f0_sq) / variance
+            second[i, j] = second[j, i] = closed - first[i] - first[j]
+
+    # Reamostragens em blocos: memória ~ (2k + 2) x bloco x N
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, n, size=(n_bootstrap, n))
+    boot = [_first_and_total(fA[block], fB[block], fAB[:, block], fBA[:, block])
+            for block in np.array_split(idx, max(1, n_bootstrap // 100))]
+    boot_first = np.concatenate([b[0] for b in boot], axis=-1)
+    boot_total = np.concatenate([b[1] for b in boot], axis=-1)
+    tail = 100 * (1 - confidence) / 2
+    return {
+        "first": first,
+        "total": total,
+        "first_ci": np.percentile(boot_first, [tail, 100 - tail], axis=-1).T,
+        "total_ci": np.percentile(boot_total, [tail, 100 - tail], axis=-1).T,
+        "second": second,
+        "variance": variance,
+        "n": n,
+    }
+
+
+def run_sobol_analysis(substrate, metal, n_base=None, ranges=None, seed=None, nominal=None,
+                       materials=None, analytes=None, theta_deg=None, theta_window=(40, 80),
+                       n_bootstrap=None, confidence=0.95, chunk_size=256, workers=None, pool=None):
+    """
+    Sobol analysis of theta_res, FWHM, R_min, S and chi of one stack.
+
+    Parameters:
+        substrate, metal (str): Keys of ``materials``.
+        n_base (int): Base rows N (default: sobol_base_samples); the model
+            is evaluated on N(2k + 2) designs.
+        ranges (dict): {parameter: half-width} of the uniform inputs around
+            the nominal design (default: simulation_config.sobol_ranges);
+            parameters left out are held at their nominal value.
+        seed (int): Seed of the design and of the bootstrap (default: sobol_seed).
+        nominal (dict): Nominal design (default: nominal_design).
+        materials (dict): Refractive index table (default: optical_data).
+        analytes (dict): Analyte indices; the first two are used.
+        theta_deg (array): Angular grid (default: tolerance_theta_deg).
+        theta_window (tuple): Window for theta_res (deg).
+        n_bootstrap (int): Bootstrap resamples (default: sobol_bootstrap).
+        confidence (float): Level of the confidence intervals.
+        chunk_size, workers, pool: As in tolerance_analysis.evaluate_designs.
+
+    Returns:
+        dict with "parameters" (varied inputs, in order), "bounds" (k, 2),
+        "nominal", "samples" ({parameter: array}), "metrics" (outputs on the
+        design, TOLERANCE_METRICS + "status"), "indices" ({metric:
+        sobol_indices result}), "dropped" (base rows left out because one of
+        their designs has a flagged theta_res), "seed" and "n_base".
+    """
+    materials = materials or default_materials
+    n_base = sobol_base_samples if n_base is None else int(n_base)
+    ranges = sobol_ranges if ranges is None else ranges
+    seed = sobol_seed if seed is None else seed
+    n_bootstrap = sobol_bootstrap if n_bootstrap is None else n_bootstrap
+    nominal = nominal or nominal_design(substrate, metal, materials)
+    analyte_indices = np.array(list((analytes or default_analytes).values())[:2], dtype=complex)
+    theta_deg = tolerance_theta_deg if theta_deg is None else np.asarray(theta_deg)
+
+    unknown = set(ranges) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown Sobol parameter(s): {', '.join(sorted(unknown))}.")
+    parameters = [name for name in PARAMETERS if ranges.get(name)]
+    k = len(parameters)
+    if k < 2:
+        raise ValueError("At least two parameters must vary for a Sobol analysis.")
+    bounds = np.array([[nominal[name] - ranges[name], nominal[name] + ranges[name]] for name in parameters])
+    for name, (low, _) in zip(parameters, bounds):
+        if low < 0 and name in ("metal_thickness_nm", "cr_thickness_nm", "metal_k"):
+            raise ValueError(f"The range of {name} reaches negative values ({low:g}).")
+
+    with stage("sobol_design"):
+        design = saltelli_design(bounds, n_base, seed)
+    samples = {name: np.full(len(design), float(nominal[name])) for name in PARAMETERS}
+    for i, name in enumerate(parameters):
+        samples[name] = design[:, i]
+
+    with stage("sobol_evaluation"):
+        metrics = evaluate_designs(samples, analyte_indices, complex(materials["Cr"]), theta_deg,
+                                   theta_window, chunk_size, workers, pool)
+    count("sobol_designs", len(design))
+
+    # Linhas base com alguma ressonância sinalizada saem de todos os blocos
+    flagged = np.any(metrics["status"].reshape(2 * k + 2, n_base) != RES_OK, axis=0)
+    masked = {name: np.where(np.tile(flagged, 2 * k + 2), np.nan, metrics[name]) for name in TOLERANCE_METRICS}
+
+    with stage("sobol_indices"):
+        indices = {name: sobol_indices(masked[name], k, n_bootstrap, confidence, seed)
+                   for name in TOLERANCE_METRICS}
+
+    return {
+        "parameters": parameters,
+        "bounds": bounds,
+        "nominal": nominal,
+        "samples": samples,
+        "metrics": metrics,
+        "indices": indices,
+        "dropped": int(np.count_nonzero(flagged)),
+        "seed": seed,
+        "n_base": n_base,
+    }
@@ -0,0 +1,167 @@
+import os
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from fresnel_backend import getFresnelAIM_batch
+from reflectance_simulator import calculate_curve_metrics_batch, CURVE_METRICS
+from result_cache import make_cache_key
+from results_store import ResultsStore
+from instrumentation import collect_call, merge, count
+
+
+def split_sweep(substrates, metals, analytes, n_thicknesses, chunk_size=None):
+    """
+    Splits a substrate x metal x analyte x thickness sweep into independent
+    jobs. Each job is (substrate_idx, metal_idx, analyte_idx, start, stop)
+    over the thickness axis; the list order is deterministic.
+    """
+    chunk_size = chunk_size or n_thicknesses
+    jobs = []
+    for s in range(len(substrates)):
+        for m in range(len(metals)):
+            for a in range(len(analytes)):
+                for start in range(0, n_thicknesses, chunk_size):
+                    jobs.append((s, m, a, start, min(start + chunk_size, n_thicknesses)))
+    return jobs
+
+
+def default_chunk_size(outer_shape, n_thicknesses, n_workers):
+    """
+    Thicknesses per job so that the sweep yields at least ``n_workers``
+    jobs (when there are enough thicknesses): the substrate x metal x
+    analyte combinations alone (6 in mode 1) cannot fill a large machine.
+    """
+    n_outer = int(np.prod(outer_shape))
+    splits = -(-n_workers // n_outer)  # ceil
+    return max(1, -(-n_thicknesses // splits))
+
+
+def _run_job(job, shm_name, shape, n_stack, d_cr, thicknesses_nm, lambda0,
+             theta_deg, theta_rad, theta_window):
+    """
+    Worker: computes the curves of one job straight into the shared
+    reflectance block and returns only the per-curve metrics.
+    """
+    s, m, a, start, stop = job
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        reflectance = np.ndarray(shape, dtype=float, buffer=shm.buf)
+        d = np.column_stack([
+            np.full(stop - start, d_cr),
+            np.asarray(thicknesses_nm[start:stop]) * 1e-9
+        ])
+        Rp = getFresnelAIM_batch(n_stack, d, theta_rad, lambda0)[2]
+        reflectance[s, m, a, start:stop] = Rp
+
+        metrics = calculate_curve_metrics_batch(theta_deg, Rp, theta_window)
+        del reflectance
+    finally:
+        shm.close()
+    return job, metrics
+
+
+def run_sweep_parallel(substrates, metals, analytes, materials, lambda0,
+                       theta_deg, theta_rad, d_cr, metal_thicknesses_nm,
+                       theta_window=(40, 80), workers=None, chunk_size=None, pool=None,
+                       cache=None):
+    """
+    Runs a multi-substrate/metal/analyte/thickness sweep on a process pool.
+
+    Curves are written by the workers into one shared-memory block instead
+    of being pickled back; only the per-curve metrics travel through the pool.
+
+    Parameters:
+        substrates, metals (list): Names (keys of ``materials``).
+        analytes (list | dict): Analyte names (keys of ``materials``).
+        materials (dict): Refractive index table.
+        lambda0, theta_deg, theta_rad, d_cr, metal_thicknesses_nm:
+            as in simulation_config.
+        theta_window (tuple): Window for theta_res (deg).
+        workers (int): Process count (default: os.cpu_count()).
+        chunk_size (int): Thicknesses per job (default: default_chunk_size,
+            i.e. at least one job per worker).
+        pool (ProcessPoolExecutor): Reuse an existing pool (e.g. across a
+            batch) instead of creating one; ``workers`` is then ignored.
+        cache (ReflectanceCache): Optional result cache. Jobs found in it are
+            filled in by the parent without being submitted; computed jobs
+            are stored once their curves are in the shared block.
+
+    Returns:
+        results_store.ResultsStore with the curves and one column per
+        reflectance_simulator.CURVE_METRICS entry (theta_res, its RES_*
+        status and the dip shape: fwhm, r_min, depth, contrast, ...).
+    """
+    analytes = list(analytes)
+    thicknesses = np.asarray(metal_thicknesses_nm)
+    shape = (len(substrates), len(metals), len(analytes), len(thicknesses), len(theta_rad))
+    if chunk_size is None:
+        n_workers = getattr(pool, "_max_workers", None) or workers or os.cpu_count()
+        chunk_size = default_chunk_size(shape[:3], len(thicknesses), n_workers)
+    jobs = split_sweep(substrates, metals, analytes, len(thicknesses), chunk_size)
+
+    metrics = {name: np.empty(shape[:4]) for name in CURVE_METRICS}
+
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+    block = None
+    try:
+        with ExitStack() as stack:
+            if pool is None:
+                pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers or os.cpu_count()))
+            block = np.ndarray(shape, dtype=float, buffer=shm.buf)
+            futures = []
+            keys = {}
+            for job in jobs:
+                s, m, a, start, stop = job
+                n_stack = np.array([
+                    materials[substrates[s]],
+                    materials["Cr"],
+                    materials[metals[m]],
+                    materials[analytes[a]]
+                ], dtype=complex)
+
+                if cache is not None:
+                    key = make_cache_key("sweep_job", n_stack, d_cr, thicknesses[start:stop],
+                                         lambda0, theta_deg, theta_window)
+                    entry = cache.get(key)
+                    if entry is not None:
+                        block[s, m, a, start:stop] = entry["reflectance"]
+                        for name in CURVE_METRICS:
+                            metrics[name][s, m, a, start:stop] = entry[name]
+                        continue
+                    keys[job] = key
+
+                futures.append(pool.submit(
+                    collect_call, _run_job, job, shm.name, shape, n_stack, d_cr, thicknesses,
+                    lambda0, theta_deg, theta_rad, theta_window
+                ))
+
+            count("sweep_jobs", len(jobs))
+            count("sweep_jobs_cached", len(jobs) - len(futures))
+            for future in futures:
+                (job, job_metrics), stats = future.result()
+                merge(stats)
+                s, m, a, start, stop = job
+                for name in CURVE_METRICS:
+                    metrics[name][s, m, a, start:stop] = job_metrics[name]
+                if job in keys:
+                    cache.put(keys[job], {
+                        "reflectance": block[s, m, a, start:stop],
+                        **{name: metrics[name][s, m, a, start:stop] for name in CURVE_METRICS},
+                    })
+
+            reflectance = block.copy()
+    finally:
+        block = None  # libera a view antes de fechar o bloco compartilhado
+        shm.close()
+        shm.unlink()
+
+    store = ResultsStore(substrates, metals, analytes, metal_thicknesses_nm, theta_deg,
+                         reflectance, lambda0=lambda0, d_cr=d_cr)
+    for name in CURVE_METRICS:
+        store.set_column(name, metrics[name])
+    n_flagged = np.count_nonzero(metrics["theta_res_status"])
+    if n_flagged:
+        print(f"[WARNING] {n_flagged} of {store.columns['theta_res_status'].size} curves have a flagged theta_res "
+              f"(dip at the window edge, too shallow or not finite); see the theta_res_status column.")
+    return store
@@ -0,0 +1,274 @@
+"""
+Monte Carlo fabrication-tolerance analysis of one substrate/metal stack.
+
+Perturbed stacks are drawn around the nominal design of simulation_config
+(metal thickness at the middle of metal_thicknesses_nm, d_cr, lambda0 and
+the optical_data indices) and evaluated chunk by chunk: each chunk is one
+getFresnelAIM_batch call over (samples, analytes, angles) followed by the
+batched resonance/dip-shape extraction, so memory is bounded by the chunk
+size and not by the sample count. Every sample gives theta_res, FWHM and
+R_min of the first analyte, the empirical sensitivity of the analyte pair
+and chi = S / FWHM.
+
+All deviations are drawn up front from one seeded generator, so the same
+seed gives the same designs whatever the chunk size or the number of
+workers (the figures of merit then agree to rounding).
+"""
+import os
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from fresnel_backend import getFresnelAIM_batch
+from reflectance_simulator import calculate_curve_metrics_batch
+from performance_metrics import calculate_chi, RES_OK
+from instrumentation import collect_call, merge, count
+from optical_data import materials as default_materials
+from simulation_config import (
+    lambda0, d_cr, analytes as default_analytes, metal_thicknesses_nm,
+    fabrication_tolerances, tolerance_samples, tolerance_seed, tolerance_theta_deg
+)
+
+PARAMETERS = ("metal_thickness_nm", "cr_thickness_nm", "metal_n", "metal_k",
+              "substrate_n", "wavelength_nm")
+DISTRIBUTIONS = ("uniform", "normal")
+TOLERANCE_METRICS = ("theta_res", "fwhm", "r_min", "sensitivity", "chi")
+METRIC_UNITS = {"theta_res": "deg", "fwhm": "deg", "r_min": "", "sensitivity": "deg/RIU", "chi": "1/RIU"}
+
+
+def nominal_design(substrate, metal, materials=None):
+    """
+    Nominal value of every entry of PARAMETERS: metal thickness at the
+    middle of simulation_config.metal_thicknesses_nm, Cr thickness d_cr,
+    wavelength lambda0 and the metal/substrate indices of ``materials``
+    (default: optical_data).
+    """
+    materials = materials or default_materials
+    n_metal = complex(materials[metal])
+    return {
+        "metal_thickness_nm": float(np.median(metal_thicknesses_nm)),
+        "cr_thickness_nm": d_cr * 1e9,
+        "metal_n": n_metal.real,
+        "metal_k": n_metal.imag,
+        "substrate_n": complex(materials[substrate]).real,
+        "wavelength_nm": lambda0 * 1e9,
+    }
+
+
+def sample_tolerances(nominal, tolerances, n_samples, seed=0):
+    """
+    Perturbed designs around ``nominal``.
+
+    Parameters:
+        nominal (dict): Value of every entry of PARAMETERS.
+        tolerances (dict): {parameter: (distribution, width)} with
+            ("uniform", a) -> U(-a, a) and ("normal", s) -> N(0, s);
+            parameters left out keep their nominal value.
+        n_samples (int): Number of designs.
+        seed (int): Seed of numpy.random.default_rng.
+
+    Returns:
+        dict {parameter: array (n_samples,)}; thicknesses and k are
+        truncated at zero.
+    """
+    unknown = set(tolerances) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown tolerance parameter(s): {', '.join(sorted(unknown))}.")
+
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for name in PARAMETERS:
+        values = np.full(n_samples, float(nominal[name]))
+        if name in tolerances:
+            kind, width = tolerances[name]
+            if kind == "uniform":
+                values += rng.uniform(-width, width, n_samples)
+            elif kind == "normal":
+                values += rng.normal(0.0, width, n_samples)
+            else:
+                raise ValueError(f"Unknown distribution '{kind}' for {name} (use {', '.join(DISTRIBUTIONS)}).")
+        samples[name] = values
+
+    for name in ("metal_thickness_nm", "cr_thickness_nm", "metal_k"):
+        np.maximum(samples[name], 0.0, out=samples[name])
+    return samples
+
+
+def build_stacks(samples, analyte_indices, cr_index):
+    """
+    Substrate/Cr/metal/analyte stacks of a set of designs.
+
+    Returns:
+        n (S, A, 4), d (S, 1, 2) in m and wavelength (S, 1) in m, with S
+        designs and A analytes, as taken by getFresnelAIM_batch.
+    """
+    analyte_indices = np.asarray(analyte_indices, dtype=complex)
+    n_designs = len(samples["metal_thickness_nm"])
+    n = np.empty((n_designs, len(analyte_indices), 4), dtype=complex)
+    n[..., 0] = samples["substrate_n"][:, np.newaxis]
+    n[..., 1] = cr_index
+    n[..., 2] = (samples["metal_n"] + 1j * samples["metal_k"])[:, np.newaxis]
+    n[..., 3] = analyte_indices
+    d = np.column_stack([samples["cr_thickness_nm"], samples["metal_thickness_nm"]])[:, np.newaxis, :] * 1e-9
+    wavelength = samples["wavelength_nm"][:, np.newaxis] * 1e-9
+    return n, d, wavelength
+
+
+def evaluate_samples(samples, analyte_indices, cr_index, theta_deg, theta_window=(40, 80)):
+    """
+    Figures of merit of a set of designs in one batched Fresnel call.
+
+    Parameters:
+        samples (dict): {parameter: array (S,)} for every entry of PARAMETERS.
+        analyte_indices (array): Two analyte indices; the sensitivity is
+            (theta_res[0] - theta_res[1]) / (n[0] - n[1]).
+        cr_index (complex): Cr index (not perturbed).
+        theta_deg (array): Angular grid (deg).
+        theta_window (tuple): Window for theta_res (deg).
+
+    Returns:
+        dict of arrays (S,): TOLERANCE_METRICS of the first analyte plus
+        "status", the RES_* flags of both analytes OR-ed together.
+    """
+    n, d, wavelength = build_stacks(samples, analyte_indices, cr_index)
+    Rp = getFresnelAIM_batch(n, d, np.radians(theta_deg), wavelength)[2]
+    metrics = calculate_curve_metrics_batch(theta_deg, Rp, theta_window)
+    del Rp
+
+    theta_res = metrics["theta_res"]
+    sensitivity = (theta_res[:, 0] - theta_res[:, 1]) / (analyte_indices[0] - analyte_indices[1]).real
+    fwhm = metrics["fwhm"][:, 0]
+    return {
+        "theta_res": theta_res[:, 0],
+        "fwhm": fwhm,
+        "r_min": metrics["r_min"][:, 0],
+        "sensitivity": sensitivity,
+        "chi": calculate_chi(sensitivity, fwhm),
+        "status": np.bitwise_or.reduce(metrics["theta_res_status"].astype(int), axis=1),
+    }
+
+
+def _evaluate_chunk(start, samples, analyte_indices, cr_index, theta_deg, theta_window):
+    return start, evaluate_samples(samples, analyte_indices, cr_index, theta_deg, theta_window)
+
+
+def evaluate_designs(samples, analyte_indices, cr_index, theta_deg, theta_window=(40, 80),
+                     chunk_size=256, workers=None, pool=None):
+    """
+    evaluate_samples over any number of designs, ``chunk_size`` designs per
+    Fresnel call so that memory does not grow with the design count.
+
+    Parameters:
+        samples, analyte_indices, cr_index, theta_deg, theta_window:
+            as in evaluate_samples.
+        chunk_size (int): Designs per Fresnel call; peak memory grows
+            linearly with it (about 0.3 MB per design on 1001 angles).
+        workers (int): Processes (default: os.cpu_count(); 1 = in-process).
+        pool (ProcessPoolExecutor): Reuse an existing pool.
+
+    Returns:
+        dict of arrays (S,) as evaluate_samples.
+    """
+    n_designs = len(samples["metal_thickness_nm"])
+    metrics = {name: np.empty(n_designs) for name in TOLERANCE_METRICS}
+    metrics["status"] = np.empty(n_designs, dtype=int)
+    starts = range(0, n_designs, chunk_size)
+
+    def chunk(start):
+        return {name: values[start:start + chunk_size] for name, values in samples.items()}
+
+    def store(start, chunk_metrics):
+        for name, values in chunk_metrics.items():
+            metrics[name][start:start + len(values)] = values
+
+    n_workers = getattr(pool, "_max_workers", None) or workers or os.cpu_count()
+    if pool is None and n_workers == 1:
+        for start in starts:
+            store(*_evaluate_chunk(start, chunk(start), analyte_indices, cr_index, theta_deg, theta_window))
+    else:
+        with ExitStack() as stack:
+            if pool is None:
+                pool = stack.enter_context(ProcessPoolExecutor(max_workers=n_workers))
+            futures = [pool.submit(collect_call, _evaluate_chunk, start, chunk(start), analyte_indices,
+                                   cr_index, theta_deg, theta_window) for start in starts]
+            for future in futures:
+                result, stats = future.result()
+                merge(stats)
+                store(*result)
+    count("design_chunks", len(starts))
+    return metrics
+
+
+def summarize_distribution(values):
+    """
+    Mean, standard deviation, 2.5/50/97.5 % percentiles and range of the
+    finite entries of ``values`` (NaN everywhere when there are none).
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if not values.size:
+        stats = dict.fromkeys(("mean", "std", "p2_5", "p50", "p97_5", "min", "max"), np.nan)
+    else:
+        p2_5, p50, p97_5 = np.percentile(values, [2.5, 50, 97.5])
+        stats = {"mean": values.mean(), "std": values.std(ddof=1) if values.size > 1 else 0.0,
+                 "p2_5": p2_5, "p50": p50, "p97_5": p97_5, "min": values.min(), "max": values.max()}
+    stats["n"] = int(values.size)
+    return stats
+
+
+def run_tolerance_analysis(substrate, metal, n_samples=None, tolerances=None, seed=None,
+                           nominal=None, materials=None, analytes=None, theta_deg=None,
+                           theta_window=(40, 80), chunk_size=256, workers=None, pool=None):
+    """
+    Monte Carlo tolerance analysis of one substrate/metal stack.
+
+    Parameters:
+        substrate, metal (str): Keys of ``materials``.
+        n_samples (int): Perturbed designs (default: tolerance_samples).
+        tolerances (dict): As in sample_tolerances (default:
+            simulation_config.fabrication_tolerances).
+        seed (int): RNG seed (default: tolerance_seed).
+        nominal (dict): Nominal design (default: nominal_design).
+        materials (dict): Refractive index table (default: optical_data).
+        analytes (dict): Analyte indices; the first two are used
+            (default: simulation_config.analytes).
+        theta_deg (array): Angular grid (default: tolerance_theta_deg).
+        theta_window (tuple): Window for theta_res (deg).
+        chunk_size, workers, pool: As in evaluate_designs.
+
+    Returns:
+        dict with "nominal" (design), "nominal_metrics", "samples"
+        ({parameter: array}), "metrics" ({TOLERANCE_METRICS + "status":
+        array}), "summary" ({metric: summarize_distribution over the
+        unflagged designs}), "flagged" (count of designs with a RES_* flag),
+        "seed" and "n_samples".
+    """
+    materials = materials or default_materials
+    n_samples = tolerance_samples if n_samples is None else int(n_samples)
+    tolerances = fabrication_tolerances if tolerances is None else tolerances
+    seed = tolerance_seed if seed is None else seed
+    nominal = nominal or nominal_design(substrate, metal, materials)
+    analyte_indices = np.array(list((analytes or default_analytes).values())[:2], dtype=complex)
+    theta_deg = tolerance_theta_deg if theta_deg is None else np.asarray(theta_deg)
+    cr_index = complex(materials["Cr"])
+
+    samples = sample_tolerances(nominal, tolerances, n_samples, seed)
+    nominal_samples = {name: np.array([float(nominal[name])]) for name in PARAMETERS}
+    nominal_metrics = {name: value[0].item() for name, value in
+                       evaluate_samples(nominal_samples, analyte_indices, cr_index,
+                                        theta_deg, theta_window).items()}
+
+    metrics = evaluate_designs(samples, analyte_indices, cr_index, theta_deg, theta_window,
+                               chunk_size, workers, pool)
+    count("tolerance_samples", n_samples)
+
+    valid = metrics["status"] == RES_OK
+    return {
+        "nominal": nominal,
+        "nominal_metrics": nominal_metrics,
+        "samples": samples,
+        "metrics": metrics,
+        "summary": {name: summarize_distribution(metrics[name][valid]) for name in TOLERANCE_METRICS},
+        "flagged": int(n_samples - np.count_nonzero(valid)),
+        "seed": seed,
+        "n_samples": n_samples,
+    }
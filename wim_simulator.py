@@ -0,0 +1,118 @@
+import numpy as np
+from getFresnelWIM import getFresnelWIM_batch
+from performance_metrics import (
+    find_resonance_batch,
+    RES_EDGE,
+    calculate_curve_shape_batch,
+    calculate_sensitivity_empirical,
+    calculate_chi,
+    calculate_q
+)
+
+
+def evaluate_index(value, wavelengths):
+    """
+    Refractive index of one material over ``wavelengths`` (m). ``value`` is
+    either a constant index or a callable n(wavelength).
+    """
+    wavelengths = np.asarray(wavelengths, dtype=float)
+    if callable(value):
+        return np.asarray(value(wavelengths), dtype=complex)
+    return np.full(wavelengths.shape, value, dtype=complex)
+
+
+def run_wim_simulation(substrate, metal, analytes, materials, theta_deg,
+                       wavelengths, d_cr, metal_thicknesses_nm):
+    """
+    Wavelength interrogation: reflectance versus wavelength at a fixed
+    angle for every metal thickness and analyte, computed in one vectorized
+    call with a wavelength-dependent index per layer.
+
+    Parameters:
+        substrate, metal (str): Keys of ``materials``.
+        analytes (list | dict): Analyte names (keys of ``materials``).
+        materials (dict): Constant indices or callables n(wavelength).
+        theta_deg (float): Fixed incidence angle in degrees.
+        wavelengths (array): Wavelengths in meters.
+        d_cr (float): Cr thickness in meters.
+        metal_thicknesses_nm (array): Metal thicknesses in nanometers.
+
+    Returns:
+        dict shaped like the AIM results, with "lambda_res" (nm) in place
+        of "theta_res" and FWHM in nm.
+    """
+    analytes = list(analytes)
+    wavelengths = np.asarray(wavelengths, dtype=float)
+    wavelength_nm = wavelengths * 1e9
+
+    # Índices (N, W, 4): um conjunto de camadas por analyte e comprimento de onda
+    n = np.empty((len(analytes), len(wavelengths), 4), dtype=complex)
+    n[..., 0] = evaluate_index(materials[substrate], wavelengths)
+    n[..., 1] = evaluate_index(materials["Cr"], wavelengths)
+    n[..., 2] = evaluate_index(materials[metal], wavelengths)
+    for j, analyte in enumerate(analytes):
+        n[j, :, 3] = evaluate_index(materials[analyte], wavelengths)
+
+    d = np.column_stack([
+        np.full(len(metal_thicknesses_nm), d_cr),
+        np.asarray(metal_thicknesses_nm) * 1e-9
+    ])[:, np.newaxis, :]
+
+    Rp_grid = getFresnelWIM_batch(n, d, np.radians(theta_deg), wavelengths)[2]  # (T, N, W)
+
+    results = {
+        "lambda_res": {},
+        "fwhm": {},
+        "substrate": substrate,
+        "theta_deg": theta_deg,
+        "wavelength_nm": wavelength_nm,
+        "reflectance": {},
+        "metal_thicknesses_nm": metal_thicknesses_nm
+    }
+    lambda_res_grid, R_res, status = find_resonance_batch(wavelength_nm, Rp_grid)
+    fwhm_grid = calculate_curve_shape_batch(wavelength_nm, Rp_grid, lambda_res_grid, R_res)["fwhm"]
+    for j, analyte in enumerate(analytes):
+        key = (metal, analyte)
+        curves = Rp_grid[:, j, :]
+        lambda_res = lambda_res_grid[:, j].tolist()
+        fwhm = fwhm_grid[:, j].tolist()
+
+        # Mínimo na borda da janela: a ressonância está fora do espectro
+        at_edge = (status[:, j] & RES_EDGE) != 0
+        for i in np.flatnonzero(at_edge):
+            lambda_res[i] = np.nan
+            fwhm[i] = np.nan
+        if at_edge.any():
+            print(f"[WARNING] WIM: no resonance inside {wavelength_nm[0]:.0f}-{wavelength_nm[-1]:.0f} nm "
+                  f"for {metal}/{analyte} at θ = {theta_deg}° ({at_edge.sum()} of {len(curves)} "
+                  f"thicknesses); lambda_res set to NaN.")
+
+        results["lambda_res"][key] = lambda_res
+        results["fwhm"][key] = fwhm
+        results["reflectance"][key] = list(curves)
+
+    return results
+
+
+def calculate_wim_figures_of_merit(results, materials, metal):
+    """
+    Spectral sensitivity (nm/RIU), chi and Q from the analyte_01/analyte_02
+    pair, stored with the same keys as the AIM figures of merit.
+    """
+    lambda_neg = results["lambda_res"][(metal, "analyte_01")]
+    lambda_pos = results["lambda_res"][(metal, "analyte_02")]
+
+    sensitivity = []
+    for lp, ln in zip(lambda_pos, lambda_neg):
+        n_pos = evaluate_index(materials["analyte_02"], lp * 1e-9).real
+        n_neg = evaluate_index(materials["analyte_01"], ln * 1e-9).real
+        sensitivity.append(calculate_sensitivity_empirical(lp, ln, n_pos, n_neg))
+    results.setdefault("sensitivity_empirical", {})[metal] = sensitivity
+
+    for analyte in ["analyte_01", "analyte_02"]:
+        key = (metal, analyte)
+        fwhm = results["fwhm"][key]
+        results.setdefault("chi_empirical", {})[key] = [calculate_chi(s, f) for s, f in zip(sensitivity, fwhm)]
+        results.setdefault("q_empirical", {})[key] = [
+            calculate_q(lr, f) for lr, f in zip(results["lambda_res"][key], fwhm)
+        ]